@@ -0,0 +1,451 @@
+"""
+Normalizes captured raw HTTP/1.1 requests offline, the way the proxy would, spread across a process pool.
+
+Inputs are files of back-to-back raw requests, directories of such files, or corpus files in the format of
+valid_form_data.py (one bytes literal per request). The normalized requests are written as one stream, in input
+order, and a verdict for each request can be written as JSON lines.
+Chunked bodies are decoded and normalized chunk by chunk, then framed again, either with chunked encoding (keeping their
+chunk extensions and trailer fields, in canonical form) or with a Content-Length, as --framing says.
+The proxy's limit and JSON options (--max-body-size, --json-max-depth, and so on) are taken too, with the same defaults.
+
+Usage: python batch.py INPUT [INPUT ...] [--output FILE] [--verdicts FILE] [--workers N] [--batch-size N] [--framing FRAMING] [LIMIT OPTIONS]
+"""
+
+import argparse
+import ast
+import collections
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import IO, Final, Iterable, Iterator
+
+from chunked import ChunkedDecoder, ChunkedEncoder
+from json_body import JsonBodyNormalizer, normalize_json_body
+from limits import LimitExceeded, Limits
+from media_type import (
+    MULTIPART_SUBTYPES,
+    MediaType,
+    MultipartBodyNormalizer,
+    UrlencodedBodyNormalizer,
+    normalize_multipart_body,
+    normalize_urlencoded_body,
+    parse_header,
+    parse_media_type,
+)
+from offload import BodyNormalizer
+from server import ServerConfig
+
+# The proxy's options that change what it accepts and how it normalizes, which batch takes as well
+_CONFIG_OPTIONS: Final[tuple[str, ...]] = (
+    "json_max_depth",
+    "json_max_string_length",
+    "json_max_tokens",
+    "multipart_max_depth",
+    "multipart_max_parts",
+    "multipart_max_header_bytes",
+    "multipart_max_part_header_fields",
+    "multipart_max_part_header_bytes",
+    "max_body_size",
+    "max_content_type_parameters",
+    "max_boundary_length",
+)
+_DEFAULT_CONFIG: Final[ServerConfig] = ServerConfig()
+
+# Requests handed to a pool worker at a time, so that per-task overhead is spread over many requests
+_BATCH_SIZE: Final[int] = 256
+# Bytes of requests handed to a pool worker at a time, so that big bodies don't make for huge batches
+_BATCH_BYTES: Final[int] = 2**22
+# Batches queued per pool worker; past that, reading input waits for results to be written
+_PENDING_BATCHES_PER_WORKER: Final[int] = 4
+
+_CORPUS_SUFFIX: Final[str] = ".py"
+
+# How normalized requests with a body are framed: "preserve" keeps chunked requests chunked and the rest with a
+# Content-Length, while "chunked" and "content-length" frame every such request that way.
+_FRAMINGS: Final[tuple[str, ...]] = ("preserve", "chunked", "content-length")
+_FRAMING: Final[str] = "preserve"
+# Bytes of a capture handed to the chunked decoder at a time, when looking for where a chunked request ends
+_CAPTURE_CHUNK_SIZE: Final[int] = 2**16
+
+# Just enough to find where each request in a capture ends. The real parsing happens in the workers.
+_CONTENT_LENGTH_PAT: Final[re.Pattern[bytes]] = re.compile(rb"\r\ncontent-length:[ \t]*([0-9]+)[ \t]*\r\n", re.IGNORECASE)
+_TRANSFER_ENCODING_PAT: Final[re.Pattern[bytes]] = re.compile(rb"\r\ntransfer-encoding:[ \t]*(chunked[ \t]*\r\n)?", re.IGNORECASE)
+
+# RFC 9112
+# request-line = method SP request-target SP HTTP-version
+_REQUEST_LINE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"[!#$%&'*+\-.^_`|~0-9A-Za-z]+ [\x21-\x7e]+ HTTP/1\.[01]")
+
+# Bytes allowed in a request header field's name, and in its value, as by the proxy's HTTP server (aiohttp's defaults)
+_MAX_HEADER_FIELD_SIZE: Final[int] = 8190
+
+# Framing headers, which get recomputed for the normalized body
+_FRAMING_HEADERS: Final[tuple[bytes, ...]] = (b"content-length", b"transfer-encoding", b"trailer")
+
+# What to say about a body its normalizer rejects, by body_kind
+_MALFORMED_REASONS: Final[dict[str, str]] = {
+    "multipart": "Malformed multipart body.",
+    "urlencoded": "Malformed urlencoded body.",
+    "json": "Malformed JSON body.",
+}
+
+
+@dataclass
+class RequestResult:
+    source: str  # Where the request came from, e.g. "capture.http#3" or "valid_form_data.py:9"
+    normalized: bytes | None  # None if the request was rejected
+    reason: str | None  # Why the request was rejected
+
+
+def read_capture(path: str) -> Iterator[tuple[str, bytes]]:
+    """
+    Splits a file of back-to-back raw requests into (source, raw request) pairs, using their Content-Length or chunked framing.
+    A request whose end can't be found (no end of headers, another Transfer-Encoding, or bad chunks) takes the rest of the file.
+    The file is mapped rather than read, so only the request being split off is ever copied into memory.
+    """
+    with open(path, "rb") as f:
+        # An empty file can't be mapped, and has no requests anyway.
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from split_capture(path, data)
+
+
+def split_capture(path: str, data: bytes | mmap.mmap) -> Iterator[tuple[str, bytes]]:
+    pos: int = 0
+    for index in itertools.count():
+        if pos >= len(data):
+            return
+        headers_end: int = data.find(b"\r\n\r\n", pos)
+        end: int = len(data)
+        if headers_end != -1:
+            headers_end += len(b"\r\n\r\n")
+            # Searching from the request line's CRLF, so the patterns' leading CRLF can match the first header.
+            line_end: int = data.find(b"\r\n", pos)
+            m: re.Match[bytes] | None = _CONTENT_LENGTH_PAT.search(data, line_end, headers_end)
+            te_m: re.Match[bytes] | None = _TRANSFER_ENCODING_PAT.search(data, line_end, headers_end)
+            if te_m is None:
+                end = min(end, headers_end + (0 if m is None else int(m[1])))
+            elif te_m[1] is not None:
+                end = min(end, find_chunked_body_end(data, headers_end))
+        yield f"{path}#{index}", data[pos:end]
+        pos = end
+
+
+def find_chunked_body_end(data: bytes | mmap.mmap, start: int) -> int:
+    """
+    Returns the index just past the chunked body beginning at data[start], or len(data) if it doesn't end properly.
+    """
+    decoder: ChunkedDecoder = ChunkedDecoder()
+    try:
+        for pos in range(start, len(data), _CAPTURE_CHUNK_SIZE):
+            decoder.feed(data[pos : pos + _CAPTURE_CHUNK_SIZE])
+            if decoder.done:
+                return start + decoder.consumed
+    except ValueError:
+        pass
+    return len(data)
+
+
+def read_corpus(path: str) -> Iterator[tuple[str, bytes]]:
+    """
+    Reads a corpus file in the format of valid_form_data.py, where each line holding a bytes literal is a request.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.startswith(("b'", 'b"')):
+                yield f"{path}:{line_number}", ast.literal_eval(line)
+
+
+def read_inputs(paths: Iterable[str]) -> Iterator[tuple[str, bytes]]:
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, file_names in os.walk(path):
+                subdirectories.sort()
+                yield from read_inputs(os.path.join(directory, file_name) for file_name in sorted(file_names))
+        elif path.endswith(_CORPUS_SUFFIX):
+            yield from read_corpus(path)
+        else:
+            yield from read_capture(path)
+
+
+def body_kind(media_type: MediaType, raw_boundary: bytes | None) -> str | None:
+    """
+    Says which normalizer a body of this media type goes through: "multipart", "urlencoded", "json", or none.
+    """
+    if media_type.type_ == b"multipart" and media_type.subtype in MULTIPART_SUBTYPES and raw_boundary is not None:
+        return "multipart"
+    if media_type.type_ == b"application" and media_type.subtype == b"x-www-form-urlencoded":
+        return "urlencoded"
+    if media_type.type_ == b"application" and (media_type.subtype == b"json" or media_type.subtype.endswith(b"+json")):
+        return "json"
+    return None
+
+
+def normalize_body(kind: str, media_type: MediaType, boundary: str, body: bytes, config: ServerConfig, limits: Limits) -> bytes:
+    if kind == "multipart":
+        return normalize_multipart_body(boundary, body, media_type.subtype, limits)
+    if kind == "urlencoded":
+        return normalize_urlencoded_body(body)
+    return normalize_json_body(body, config.json_max_depth, config.json_max_string_length, config.json_max_tokens)
+
+
+def make_body_normalizer(kind: str, media_type: MediaType, boundary: str, config: ServerConfig, limits: Limits) -> BodyNormalizer:
+    if kind == "multipart":
+        return MultipartBodyNormalizer(boundary, media_type.subtype, limits)
+    if kind == "urlencoded":
+        return UrlencodedBodyNormalizer()
+    return JsonBodyNormalizer(config.json_max_depth, config.json_max_string_length, config.json_max_tokens)
+
+
+def decode_chunked_body(raw: bytes, start: int, limits: Limits) -> tuple[list[tuple[bytes, bytes]], ChunkedDecoder]:
+    """
+    Decodes the chunked body at raw[start:], returning (extensions, data) for each chunk, and the decoder that holds
+    the last chunk's extensions and the trailer fields.
+    """
+    decoder: ChunkedDecoder = ChunkedDecoder()
+    try:
+        chunks: list[tuple[bytes, bytes]] = decoder.feed(raw[start:])
+        decoder.finish()
+    except LimitExceeded:
+        raise
+    except ValueError:
+        raise ValueError("Bad message body.")
+    limits.check_body_size(sum(len(data) for _, data in chunks))
+    return chunks, decoder
+
+
+def parse_request_headers(raw: bytes, pos: int) -> tuple[list[tuple[bytes, bytes]], int]:
+    """
+    Parses the header section starting at raw[pos] the way the proxy's HTTP server does, returning its (name, value)
+    fields in order, with the names lowercased, and the index just past the CRLF that ends the section.
+    Unlike in a multipart part, a field may repeat, and the multipart limits on header blocks don't apply.
+    """
+    fields: list[tuple[bytes, bytes]] = []
+    while not raw.startswith(b"\r\n", pos):
+        (name, value), pos = parse_header(raw, pos)
+        if len(name) > _MAX_HEADER_FIELD_SIZE or len(value) > _MAX_HEADER_FIELD_SIZE:
+            raise ValueError("Header field too long!")
+        if not raw.startswith(b"\r\n", pos):
+            raise ValueError("Header missing CRLF!")
+        pos += len(b"\r\n")
+        fields.append((name.lower(), value))
+    return fields, pos + len(b"\r\n")
+
+
+def normalize_request(raw: bytes, framing: str = _FRAMING, config: ServerConfig = _DEFAULT_CONFIG) -> bytes:
+    """
+    Normalizes one raw request the way the proxy does when run with config, returning it re-serialized with fresh framing.
+    Raises ValueError, with the reason the proxy would give, if it would be rejected.
+    """
+    limits: Limits = config.limits()
+    line_end: int = raw.find(b"\r\n")
+    if line_end == -1 or _REQUEST_LINE_PAT.fullmatch(raw, 0, line_end) is None:
+        raise ValueError("Bad request line.")
+    try:
+        fields, body_start = parse_request_headers(raw, line_end + len(b"\r\n"))
+    except ValueError:
+        raise ValueError("Bad headers.")
+    # The values of each field, in order. Like the proxy, only the first Content-Type counts.
+    headers: dict[bytes, list[bytes]] = {}
+    for name, value in fields:
+        headers.setdefault(name, []).append(value)
+
+    # The body as (extensions, data) chunks; one chunk without extensions if it isn't chunked
+    chunks: list[tuple[bytes, bytes]]
+    last_chunk_extensions: bytes = b""
+    trailers: dict[bytes, bytes] = {}
+    chunked: bool = b"transfer-encoding" in headers
+    if chunked:
+        # Repeated fields make up one list (RFC 9110, section 5.3).
+        if b", ".join(headers[b"transfer-encoding"]).lower() != b"chunked":
+            raise ValueError("Unsupported Transfer-Encoding.")
+        if b"content-length" in headers:
+            raise ValueError("Content-Length with Transfer-Encoding.")
+        chunks, decoder = decode_chunked_body(raw, body_start, limits)
+        last_chunk_extensions = decoder.last_chunk_extensions
+        trailers = decoder.trailers
+        if any(name in headers for name in trailers):
+            raise ValueError("Trailer field repeats a header field.")
+    else:
+        # Without a Content-Length, a request has no body (RFC 9112, section 6.3).
+        content_length: int = 0
+        if b"content-length" in headers:
+            if len(headers[b"content-length"]) > 1 or not headers[b"content-length"][0].isdigit():
+                raise ValueError("Bad Content-Length.")
+            content_length = int(headers[b"content-length"][0])
+        limits.check_body_size(content_length)
+        body: bytes = raw[body_start : body_start + content_length]
+        if len(body) < content_length:
+            raise ValueError("Bad message body.")
+        chunks = [(b"", body)]
+
+    if b"content-type" in headers:
+        orig_ct: bytes = headers[b"content-type"][0]
+        if not orig_ct.isascii():
+            raise ValueError("Non-ASCII bytes in Content-Type.")
+        try:
+            media_type: MediaType = parse_media_type(orig_ct, limits)
+        except LimitExceeded:
+            raise
+        except ValueError:
+            raise ValueError("Bad Content-Type.")
+
+        raw_boundary: bytes | None = media_type.parameters.get(b"boundary")
+        if media_type.type_ == b"multipart":
+            if raw_boundary is None:
+                raise ValueError("Missing boundary parameter!")
+            if not raw_boundary.isascii():
+                raise ValueError("Boundary is not ASCII!")
+
+        # The first Content-Type is replaced in place, and any others are dropped.
+        first: int = next(i for i, (name, _) in enumerate(fields) if name == b"content-type")
+        fields = [
+            (name, media_type.boundary_only if i == first else value)
+            for i, (name, value) in enumerate(fields)
+            if name != b"content-type" or i == first
+        ]
+
+        kind: str | None = body_kind(media_type, raw_boundary)
+        if kind is not None:
+            boundary: str = "" if raw_boundary is None else raw_boundary.decode("ascii")
+            try:
+                if chunked:
+                    # Fed a chunk at a time, so that each chunk's extensions stay with the output its data produced
+                    normalizer: BodyNormalizer = make_body_normalizer(kind, media_type, boundary, config, limits)
+                    chunks = [(extensions, b"".join(normalizer.feed(data))) for extensions, data in chunks]
+                    chunks.append((b"", b"".join(normalizer.finish())))
+                else:
+                    chunks = [(b"", normalize_body(kind, media_type, boundary, chunks[0][1], config, limits))]
+            except LimitExceeded:
+                raise
+            except ValueError:
+                raise ValueError(_MALFORMED_REASONS[kind])
+
+    pieces: list[bytes] = [raw[:line_end], b"\r\n"]
+    for name, value in fields:
+        if name not in _FRAMING_HEADERS:
+            pieces += [name, b": ", value, b"\r\n"]
+    if not chunked and b"content-length" not in headers:
+        pieces.append(b"\r\n")
+    elif framing == "chunked" or (framing == "preserve" and chunked):
+        if len(trailers) > 0:
+            pieces += [b"trailer: ", b", ".join(trailers), b"\r\n"]
+        pieces += [b"transfer-encoding: chunked\r\n", b"\r\n"]
+        encoder: ChunkedEncoder = ChunkedEncoder()
+        pieces += [encoder.encode(data, extensions) for extensions, data in chunks]
+        pieces.append(encoder.finish(last_chunk_extensions, trailers))
+    else:
+        if last_chunk_extensions != b"" or any(extensions != b"" for extensions, _ in chunks):
+            raise ValueError("Chunk extensions need chunked framing.")
+        # Trailer fields can't be sent without chunked framing, so they join the header section (RFC 9112, section 7.1.2).
+        for name, value in trailers.items():
+            pieces += [name, b": ", value, b"\r\n"]
+        body = b"".join(data for _, data in chunks)
+        pieces += [b"content-length: ", str(len(body)).encode("ascii"), b"\r\n", b"\r\n", body]
+    return b"".join(pieces)
+
+
+def normalize_batch(batch: list[tuple[str, bytes]], framing: str = _FRAMING, config: ServerConfig = _DEFAULT_CONFIG) -> list[RequestResult]:
+    results: list[RequestResult] = []
+    for source, raw in batch:
+        try:
+            results.append(RequestResult(source, normalize_request(raw, framing, config), None))
+        except ValueError as e:
+            results.append(RequestResult(source, None, str(e)))
+    return results
+
+
+def make_batches(requests: Iterable[tuple[str, bytes]], batch_size: int) -> Iterator[list[tuple[str, bytes]]]:
+    batch: list[tuple[str, bytes]] = []
+    batch_bytes: int = 0
+    for source, raw in requests:
+        batch.append((source, raw))
+        batch_bytes += len(raw)
+        if len(batch) >= batch_size or batch_bytes >= _BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if len(batch) > 0:
+        yield batch
+
+
+def normalize_requests(
+    requests: Iterable[tuple[str, bytes]],
+    workers: int,
+    batch_size: int = _BATCH_SIZE,
+    framing: str = _FRAMING,
+    config: ServerConfig = _DEFAULT_CONFIG,
+) -> Iterator[RequestResult]:
+    """
+    Normalizes (source, raw request) pairs, yielding the results in input order.
+    With more than one worker, batches go to a process pool, with a bounded number in flight.
+    """
+    if workers <= 1:
+        for batch in make_batches(requests, batch_size):
+            yield from normalize_batch(batch, framing, config)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending: collections.deque[concurrent.futures.Future[list[RequestResult]]] = collections.deque()
+        for batch in make_batches(requests, batch_size):
+            if len(pending) >= workers * _PENDING_BATCHES_PER_WORKER:
+                yield from pending.popleft().result()
+            pending.append(pool.submit(normalize_batch, batch, framing, config))
+        while len(pending) > 0:
+            yield from pending.popleft().result()
+
+
+def write_results(results: Iterable[RequestResult], output: IO[bytes], verdicts: IO[str] | None) -> tuple[int, int]:
+    """
+    Writes the accepted requests to output, and a JSON line per request to verdicts.
+    Returns the number of accepted and rejected requests.
+    """
+    counts: collections.Counter[bool] = collections.Counter()
+    for result in results:
+        accepted: bool = result.normalized is not None
+        counts[accepted] += 1
+        if result.normalized is not None:
+            output.write(result.normalized)
+        if verdicts is not None:
+            verdict: dict[str, str | None] = {"source": result.source, "verdict": "accept" if accepted else "reject", "reason": result.reason}
+            verdicts.write(json.dumps(verdict) + "\n")
+    return counts[True], counts[False]
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Normalize captured raw HTTP requests.")
+    parser.add_argument("inputs", nargs="+", metavar="INPUT", help="capture files, directories of them, or .py corpus files")
+    parser.add_argument("--output", help="file for the normalized requests (default: stdout)")
+    parser.add_argument("--verdicts", help="file for a JSON line per request, saying whether it was accepted and why not")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=_BATCH_SIZE, help=f"requests per unit of work (default: {_BATCH_SIZE})")
+    parser.add_argument("--framing", choices=_FRAMINGS, default=_FRAMING, help=f"how to frame normalized bodies (default: {_FRAMING})")
+    for f in dataclasses.fields(ServerConfig):
+        if f.name in _CONFIG_OPTIONS:
+            parser.add_argument("--" + f.name.replace("_", "-"), type=f.type, default=f.default, help=f"{f.metadata['help']} (default: {f.default})")
+    args: argparse.Namespace = parser.parse_args()
+    config: ServerConfig = ServerConfig(**{name: getattr(args, name) for name in _CONFIG_OPTIONS})
+
+    output: IO[bytes] = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    verdicts: IO[str] | None = None if args.verdicts is None else open(args.verdicts, "w")
+    try:
+        accepted, rejected = write_results(normalize_requests(read_inputs(args.inputs), args.workers, args.batch_size, args.framing, config), output, verdicts)
+    finally:
+        if output is sys.stdout.buffer:
+            output.flush()
+        else:
+            output.close()
+        if verdicts is not None:
+            verdicts.close()
+    print(f"{accepted} accepted, {rejected} rejected.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,633 @@
+"""
+Benchmark and regression suite for the normalizer hot paths.
+
+Each microbenchmark runs in a fresh process, so that its peak RSS is its own.
+The proxy benchmark runs server.py against a local stub upstream, and drives it with a local load generator.
+Before the load, a few requests check how the proxy relays headers; a failed check fails the run.
+Results are written as JSON. Pass a previous run as --baseline to fail on throughput regressions.
+
+Usage: python bench.py [--filter SUBSTRING] [--max-body-size SIZE] [--no-proxy] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import ast
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Final, Iterator
+
+import aiohttp
+import aiohttp.web
+
+from chunked import ChunkedDecoder
+from json_body import JsonBodyNormalizer, normalize_json_body
+from limits import DEFAULT_LIMITS
+from media_type import (
+    _MAX_CONTINUATION_INDEX,
+    _parse_media_type,
+    MultipartBodyNormalizer,
+    UrlencodedBodyNormalizer,
+    normalize_multipart_body,
+    normalize_urlencoded_body,
+    parse_header,
+    parse_headers,
+    parse_media_type,
+    parse_media_type_parameters,
+)
+
+_CORPUS_PATH: Final[str] = "valid_form_data.py"
+
+_KIB: Final[int] = 2**10
+_MIB: Final[int] = 2**20
+_GIB: Final[int] = 2**30
+
+_PART_COUNTS: Final[tuple[int, ...]] = (1, 10, 100, 1_000, 10_000)
+_BODY_SIZES: Final[tuple[int, ...]] = (_KIB, 64 * _KIB, _MIB, 64 * _MIB, _GIB)
+_BOUNDARY_LENGTHS: Final[tuple[int, ...]] = (70, 1_000)  # RFC 2046 caps boundaries at 70 characters; clients don't always listen.
+_PARAMETER_COUNTS: Final[tuple[int, ...]] = (1, 10, 100)
+_HEADER_COUNTS: Final[tuple[int, ...]] = (1, 10, 100)
+_NESTING_DEPTHS: Final[tuple[int, ...]] = (2, 8)
+_CHUNK_SIZES: Final[tuple[int, ...]] = (256, 8 * _KIB, 64 * _KIB)  # Sizes of the chunks in chunked bodies
+_WORST_CASE_SIZES: Final[tuple[int, ...]] = (256, 4 * _KIB, 64 * _KIB)  # Sizes of the adversarial header values
+
+_STREAM_CHUNK_SIZE: Final[int] = 64 * _KIB
+
+# Array elements for generated JSON bodies: canonical, as a client would usually send, and in need of normalization
+_JSON_ELEMENTS: Final[dict[str, bytes]] = {
+    "numbers": b"123456",
+    "objects": b'{"id":12345,"name":"some name","ok":true,"score":1.25}',
+    "pretty": b'\n  {\n    "id": 12345,\n    "name": "some name",\n    "ok": true\n  }',
+    "escaped": b'"caf\\u00e9 \\"x\\""',
+}
+
+_MIN_ITERATIONS: Final[int] = 5
+_MIN_SECONDS: Final[float] = 0.5
+
+# Ports for the proxy benchmark, picked to stay out of the way of a real deployment's defaults.
+_UPSTREAM_PORT: Final[int] = 18000
+_PROXY_PORT: Final[int] = 18999
+
+
+def parse_size(size: str) -> int:
+    for suffix, multiplier in (("K", _KIB), ("M", _MIB), ("G", _GIB)):
+        if size.upper().endswith(suffix):
+            return int(size[:-1]) * multiplier
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    for suffix, multiplier in (("G", _GIB), ("M", _MIB), ("K", _KIB)):
+        if size >= multiplier and size % multiplier == 0:
+            return f"{size // multiplier}{suffix}"
+    return str(size)
+
+
+def load_corpus() -> list[tuple[bytes, bytes, bytes]]:
+    """
+    Reads the raw requests in valid_form_data.py.
+    Returns (header block, Content-Type, body) for each one with a Content-Type, with chunked bodies decoded.
+    """
+    result: list[tuple[bytes, bytes, bytes]] = []
+    with open(_CORPUS_PATH) as f:
+        for line in f:
+            if not line.startswith("b'"):
+                continue
+            raw: bytes = ast.literal_eval(line)
+            headers_start: int = raw.index(b"\r\n") + len(b"\r\n")
+            headers_end: int = raw.index(b"\r\n\r\n") + len(b"\r\n\r\n")
+            # parse_headers lowercases values, which would mangle boundaries, so pull Content-Type out by hand.
+            pos: int = headers_start
+            content_type: bytes | None = None
+            chunked: bool = False
+            while pos < headers_end - len(b"\r\n"):
+                (name, value), pos = parse_header(raw, pos)
+                if name.lower() == b"content-type":
+                    content_type = value
+                elif name.lower() == b"transfer-encoding":
+                    chunked = value.lower() == b"chunked"
+                pos += len(b"\r\n")
+            body: bytes = raw[headers_end:]
+            if chunked:
+                body = b"".join(data for _, data in ChunkedDecoder().feed(body))
+            if content_type is not None:
+                result.append((raw[headers_start:headers_end], content_type, body))
+    return result
+
+
+def corpus_multipart_requests() -> list[tuple[bytes, str, bytes]]:
+    """
+    Returns (Content-Type, boundary, body) for each corpus request that normalizes cleanly.
+    """
+    result: list[tuple[bytes, str, bytes]] = []
+    for _, content_type, body in load_corpus():
+        try:
+            boundary: str = parse_media_type(content_type).parameters[b"boundary"].decode("ascii")
+            normalize_multipart_body(boundary, body)
+        except ValueError:
+            continue
+        result.append((content_type, boundary, body))
+    return result
+
+
+def make_chunked_body(size: int, chunk_size: int) -> bytes:
+    pieces: list[bytes] = [b"%x\r\n%s\r\n" % (min(chunk_size, size - i), b"x" * min(chunk_size, size - i)) for i in range(0, size, chunk_size)]
+    return b"".join(pieces) + b"0\r\n\r\n"
+
+
+def make_multipart_body(boundary: str, part_count: int, part_size: int) -> bytes:
+    pieces: list[bytes] = []
+    for i in range(part_count):
+        pieces.append(f'--{boundary}\r\nContent-Disposition: form-data; name="field{i}"; filename="file{i}.bin"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode("ascii"))
+        pieces.append(b"x" * part_size)
+        pieces.append(b"\r\n")
+    pieces.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(pieces)
+
+
+def make_nested_multipart_body(boundary: str, depth: int, part_count: int, part_size: int) -> bytes:
+    """
+    Returns a multipart/mixed body whose first part is a multipart/mixed body like it, depth levels deep.
+    """
+    pieces: list[bytes] = []
+    for level in reversed(range(depth)):
+        level_boundary: str = f"{level}-{boundary}"
+        parts: list[bytes] = [b"--%s\r\nContent-Type: application/octet-stream\r\n\r\n%s\r\n" % (level_boundary.encode("ascii"), b"x" * part_size)] * part_count
+        if len(pieces) > 0:
+            nested_boundary: bytes = f"{level + 1}-{boundary}".encode("ascii")
+            parts.insert(0, b'--%s\r\nContent-Type: multipart/mixed; boundary="%s"\r\n\r\n%s\r\n' % (level_boundary.encode("ascii"), nested_boundary, pieces.pop()))
+        pieces.append(b"".join(parts) + f"--{level_boundary}--".encode("ascii"))
+    return pieces[0]
+
+
+def make_urlencoded_body(pair_count: int, value_size: int) -> bytes:
+    return b"&".join(b"field%d=" % i + b"x+%2F" * (value_size // 5) for i in range(pair_count))
+
+
+def make_json_body(element_count: int, element: bytes) -> bytes:
+    return b"".join((b"[", (element + b",") * (element_count - 1), element, b"]"))
+
+
+def make_worst_case_input(grammar: str, size: int) -> bytes:
+    """
+    Returns about size bytes that almost match the grammar, and are rejected only at the very end.
+    Matching these with the grammar regexes backtracks: exponentially for media types, quadratically for chunk lines.
+    """
+    if grammar == "media_type":
+        return b"text/plain" + b"; " * (size // 2) + b"\x00"
+    if grammar == "header":
+        return b"X-Worst-Case:" + b" a\t" * (size // 6) + b" \t" * (size // 4) + b"\x00\r\n\r\n"
+    return b"1" + b" ;a" * (size // 3) + b" =\r\n"
+
+
+def make_boundary(length: int) -> str:
+    return "".join(itertools.islice(itertools.cycle("0123456789abcdefghijklmnopqrstuvwxyz'()+_,-./:=? "), length)).rstrip(" ") + "x"
+
+
+# Each builder takes the case parameters and returns (operation, bytes processed per operation).
+Operation = Callable[[], object]
+
+
+def cycle_operation(f: Callable[[Any], object], inputs: list[Any]) -> Operation:
+    it: Iterator[Any] = itertools.cycle(inputs)
+    return lambda: f(next(it))
+
+
+def build_parse_media_type(params: dict[str, Any]) -> tuple[Operation, int]:
+    values: list[bytes]
+    if params["input"] == "corpus":
+        values = [content_type for _, content_type, _ in load_corpus()]
+    else:
+        values = [f'multipart/form-data; boundary="{make_boundary(params["boundary_length"])}"'.encode("ascii")]
+    if params.get("cached", True):
+        return cycle_operation(parse_media_type, values), sum(map(len, values)) // len(values)
+    return cycle_operation(lambda value: _parse_media_type(value, DEFAULT_LIMITS), values), sum(map(len, values)) // len(values)
+
+
+def build_parse_media_type_parameters(params: dict[str, Any]) -> tuple[Operation, int]:
+    data: bytes
+    if params["input"] == "continuations":
+        # RFC 2231: name*0=...; name*1=...; up to the largest index we accept
+        data = b"".join(b'; title*%d="part %d of the title"' % (i, i) for i in range(_MAX_CONTINUATION_INDEX + 1))
+    else:
+        data = b"".join(b"; param%d=value%d" % (i, i) for i in range(params["count"]))
+    return lambda: parse_media_type_parameters(data), len(data)
+
+
+def build_parse_headers(params: dict[str, Any]) -> tuple[Operation, int]:
+    blocks: list[bytes]
+    if params["input"] == "corpus":
+        blocks = [header_block for header_block, _, _ in load_corpus()]
+    else:
+        blocks = [b"".join(b"X-Header-%d: some header value %d\r\n" % (i, i) for i in range(params["count"])) + b"\r\n"]
+    return cycle_operation(parse_headers, blocks), sum(map(len, blocks)) // len(blocks)
+
+
+def build_normalize_multipart_body(params: dict[str, Any]) -> tuple[Operation, int]:
+    bodies: list[tuple[str, bytes]]
+    boundary: str
+    if params["input"] == "corpus":
+        bodies = [(boundary, body) for _, boundary, body in corpus_multipart_requests()]
+    elif params["input"] == "nested":
+        boundary = make_boundary(40)
+        bodies = [(f"0-{boundary}", make_nested_multipart_body(boundary, params["depth"], params["parts"], params["part_size"]))]
+    else:
+        boundary = make_boundary(params.get("boundary_length", 40))
+        bodies = [(boundary, make_multipart_body(boundary, params["parts"], params["part_size"]))]
+    subtype: bytes = b"mixed" if params["input"] == "nested" else b"form-data"
+    if params.get("canonical", False):
+        bodies = [(boundary, normalize_multipart_body(boundary, body, subtype)) for boundary, body in bodies]
+
+    if params.get("streaming", False):
+        def normalize(boundary_and_body: tuple[str, bytes]) -> object:
+            boundary, body = boundary_and_body
+            normalizer: MultipartBodyNormalizer = MultipartBodyNormalizer(boundary, subtype)
+            view: memoryview = memoryview(body)
+            for i in range(0, len(body), _STREAM_CHUNK_SIZE):
+                normalizer.feed(bytes(view[i : i + _STREAM_CHUNK_SIZE]))
+            return normalizer.finish()
+        return cycle_operation(normalize, bodies), sum(len(body) for _, body in bodies) // len(bodies)
+
+    return cycle_operation(lambda b: normalize_multipart_body(*b, subtype), bodies), sum(len(body) for _, body in bodies) // len(bodies)
+
+
+def build_normalize_urlencoded_body(params: dict[str, Any]) -> tuple[Operation, int]:
+    body: bytes = make_urlencoded_body(params["pairs"], params["value_size"])
+
+    if params.get("streaming", False):
+        def normalize(body: bytes) -> object:
+            normalizer: UrlencodedBodyNormalizer = UrlencodedBodyNormalizer()
+            view: memoryview = memoryview(body)
+            for i in range(0, len(body), _STREAM_CHUNK_SIZE):
+                normalizer.feed(bytes(view[i : i + _STREAM_CHUNK_SIZE]))
+            return normalizer.finish()
+        return cycle_operation(normalize, [body]), len(body)
+
+    return cycle_operation(normalize_urlencoded_body, [body]), len(body)
+
+
+def build_normalize_json_body(params: dict[str, Any]) -> tuple[Operation, int]:
+    element: bytes = _JSON_ELEMENTS[params["element"]]
+    body: bytes = make_json_body(max(1, params["size"] // (len(element) + 1)), element)
+
+    if params.get("streaming", False):
+        def normalize(body: bytes) -> object:
+            normalizer: JsonBodyNormalizer = JsonBodyNormalizer()
+            view: memoryview = memoryview(body)
+            for i in range(0, len(body), _STREAM_CHUNK_SIZE):
+                normalizer.feed(bytes(view[i : i + _STREAM_CHUNK_SIZE]))
+            return normalizer.finish()
+        return cycle_operation(normalize, [body]), len(body)
+
+    return cycle_operation(normalize_json_body, [body]), len(body)
+
+
+def build_decode_chunked_body(params: dict[str, Any]) -> tuple[Operation, int]:
+    body: bytes = make_chunked_body(params["size"], params["chunk_size"])
+
+    def decode(body: bytes) -> object:
+        decoder: ChunkedDecoder = ChunkedDecoder()
+        view: memoryview = memoryview(body)
+        for i in range(0, len(body), _STREAM_CHUNK_SIZE):
+            decoder.feed(bytes(view[i : i + _STREAM_CHUNK_SIZE]))
+        return decoder.finish()
+    return cycle_operation(decode, [body]), len(body)
+
+
+def build_worst_case(params: dict[str, Any]) -> tuple[Operation, int]:
+    data: bytes = make_worst_case_input(params["grammar"], params["size"])
+    parse: Callable[[bytes], object]
+    if params["grammar"] == "media_type":
+        parse = parse_media_type
+    elif params["grammar"] == "header":
+        parse = parse_headers
+    else:
+        parse = ChunkedDecoder(max_line_length=len(data)).feed
+
+    def reject(data: bytes) -> object:
+        try:
+            return parse(data)
+        except ValueError as e:
+            return e
+    return cycle_operation(reject, [data]), len(data)
+
+
+_BUILDERS: Final[dict[str, Callable[[dict[str, Any]], tuple[Operation, int]]]] = {
+    "parse_media_type": build_parse_media_type,
+    "parse_media_type_parameters": build_parse_media_type_parameters,
+    "parse_headers": build_parse_headers,
+    "normalize_multipart_body": build_normalize_multipart_body,
+    "normalize_urlencoded_body": build_normalize_urlencoded_body,
+    "normalize_json_body": build_normalize_json_body,
+    "decode_chunked_body": build_decode_chunked_body,
+    "worst_case": build_worst_case,
+}
+
+
+def list_cases(max_body_size: int) -> list[tuple[str, str, dict[str, Any]]]:
+    """
+    Returns (name, builder, parameters) for every microbenchmark.
+    """
+    cases: list[tuple[str, str, dict[str, Any]]] = [
+        ("parse_media_type/corpus", "parse_media_type", {"input": "corpus"}),
+        *((f"parse_media_type/boundary={n}", "parse_media_type", {"input": "generated", "boundary_length": n}) for n in _BOUNDARY_LENGTHS),
+        # The parser itself, as it runs the first time a Content-Type value is seen
+        ("parse_media_type/uncached/corpus", "parse_media_type", {"input": "corpus", "cached": False}),
+        *((f"parse_media_type/uncached/boundary={n}", "parse_media_type", {"input": "generated", "boundary_length": n, "cached": False}) for n in _BOUNDARY_LENGTHS),
+        *((f"parse_media_type_parameters/params={n}", "parse_media_type_parameters", {"input": "generated", "count": n}) for n in _PARAMETER_COUNTS),
+        (f"parse_media_type_parameters/continuations={_MAX_CONTINUATION_INDEX + 1}", "parse_media_type_parameters", {"input": "continuations"}),
+        ("parse_headers/corpus", "parse_headers", {"input": "corpus"}),
+        *((f"parse_headers/headers={n}", "parse_headers", {"input": "generated", "count": n}) for n in _HEADER_COUNTS),
+        ("normalize_multipart_body/corpus", "normalize_multipart_body", {"input": "corpus"}),
+    ]
+    for n in _PART_COUNTS:
+        cases.append((f"normalize_multipart_body/parts={n}", "normalize_multipart_body", {"input": "generated", "parts": n, "part_size": 100}))
+    # Bodies that are canonical already only get checked, and come back as they are.
+    cases.append(("normalize_multipart_body/canonical/corpus", "normalize_multipart_body", {"input": "corpus", "canonical": True}))
+    for n in _PART_COUNTS:
+        cases.append((f"normalize_multipart_body/canonical/parts={n}", "normalize_multipart_body", {"input": "generated", "parts": n, "part_size": 100, "canonical": True}))
+    for n in _BOUNDARY_LENGTHS:
+        cases.append((f"normalize_multipart_body/boundary={n}", "normalize_multipart_body", {"input": "generated", "parts": 100, "part_size": 100, "boundary_length": n}))
+    for depth in _NESTING_DEPTHS:
+        cases.append((f"normalize_multipart_body/depth={depth}", "normalize_multipart_body", {"input": "nested", "depth": depth, "parts": 100, "part_size": 100}))
+    for size in _BODY_SIZES:
+        if size > max_body_size:
+            continue
+        for streaming in (False, True):
+            name: str = f"normalize_multipart_body/{'streaming/' if streaming else ''}body={format_size(size)}"
+            cases.append((name, "normalize_multipart_body", {"input": "generated", "parts": 1, "part_size": size, "streaming": streaming}))
+    for n in _PART_COUNTS:
+        cases.append((f"normalize_urlencoded_body/pairs={n}", "normalize_urlencoded_body", {"pairs": n, "value_size": 20}))
+    for size in _BODY_SIZES:
+        if size > max_body_size:
+            continue
+        for streaming in (False, True):
+            name = f"normalize_urlencoded_body/{'streaming/' if streaming else ''}body={format_size(size)}"
+            cases.append((name, "normalize_urlencoded_body", {"pairs": 1, "value_size": size, "streaming": streaming}))
+    for element in _JSON_ELEMENTS:
+        cases.append((f"normalize_json_body/{element}/body=1M", "normalize_json_body", {"element": element, "size": _MIB}))
+    for size in _BODY_SIZES:
+        if size > max_body_size:
+            continue
+        cases.append((f"normalize_json_body/streaming/body={format_size(size)}", "normalize_json_body", {"element": "objects", "size": size, "streaming": True}))
+    for chunk_size in _CHUNK_SIZES:
+        size = min(max_body_size, 64 * _MIB)
+        cases.append((f"decode_chunked_body/chunk={format_size(chunk_size)}/body={format_size(size)}", "decode_chunked_body", {"size": size, "chunk_size": chunk_size}))
+    # Throughput should stay flat as these grow; a drop means matching one of them has gone superlinear.
+    for grammar in ("media_type", "header", "chunk_line"):
+        for size in _WORST_CASE_SIZES:
+            cases.append((f"worst_case/{grammar}/size={format_size(size)}", "worst_case", {"grammar": grammar, "size": size}))
+    return cases
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    ordered: list[float] = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in (50, 90, 99)} | {"max": ordered[-1]}
+
+
+def run_case(name: str, builder: str, params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Runs one microbenchmark. Meant to be called in a fresh process.
+    """
+    operation, bytes_per_op = _BUILDERS[builder](params)
+    operation()  # Warm up, and fill any caches the way a long-running server would have them.
+
+    latencies: list[float] = []
+    start: float = time.perf_counter()
+    while len(latencies) < _MIN_ITERATIONS or time.perf_counter() - start < _MIN_SECONDS:
+        op_start: int = time.perf_counter_ns()
+        operation()
+        latencies.append((time.perf_counter_ns() - op_start) / 1e3)
+    elapsed: float = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "params": params,
+        "iterations": len(latencies),
+        "ops_per_s": len(latencies) / elapsed,
+        "bytes_per_s": len(latencies) * bytes_per_op / elapsed,
+        "latency_us": percentiles(latencies),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_stub_upstream(port: int) -> None:
+    async def handle(request: aiohttp.web.Request) -> aiohttp.web.Response:
+        async for _ in request.content.iter_any():
+            pass
+        response: aiohttp.web.Response = aiohttp.web.Response(body=b"OK")
+        # Like a real upstream, compress whenever the request's Accept-Encoding allows it.
+        response.enable_compression()
+        return response
+
+    app: aiohttp.web.Application = aiohttp.web.Application()
+    app.add_routes([aiohttp.web.route("*", "/{unused_required_name:.*}", handle)])
+    aiohttp.web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def wait_for_port(port: int, timeout: float) -> None:
+    deadline: float = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def peak_rss_kib(pid: int) -> int | None:
+    """
+    Returns the summed peak RSS of a process and its children (i.e. the proxy's workers). Linux only.
+    """
+    pids: list[int] = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += map(int, f.read().split())
+    except OSError:
+        pass
+
+    total: int | None = None
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total = (total or 0) + int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+async def generate_load(requests: int, concurrency: int, payloads: list[tuple[bytes, bytes]]) -> tuple[list[float], int, int]:
+    """
+    Sends requests to the proxy from `concurrency` concurrent clients.
+    Returns the latency of each request in microseconds, the number of bytes sent, and the number of failed requests.
+    """
+    latencies: list[float] = []
+    failures: int = 0
+    bytes_sent: int = 0
+    next_payload: Iterator[tuple[bytes, bytes]] = itertools.cycle(payloads)
+    remaining: Iterator[int] = iter(range(requests))
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        nonlocal failures, bytes_sent
+        for _ in remaining:
+            content_type, body = next(next_payload)
+            start: int = time.perf_counter_ns()
+            async with session.post(f"http://127.0.0.1:{_PROXY_PORT}/", data=body, headers={"Content-Type": content_type.decode("ascii")}) as response:
+                await response.read()
+                if response.status != 200:
+                    failures += 1
+            latencies.append((time.perf_counter_ns() - start) / 1e3)
+            bytes_sent += len(body)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    return latencies, bytes_sent, failures
+
+
+async def check_proxy() -> list[str]:
+    """
+    Returns a description of each way the proxy relayed a request or response differently from how it should.
+    """
+    failures: list[str] = []
+    async with aiohttp.ClientSession(auto_decompress=False, skip_auto_headers=("Accept-Encoding",)) as session:
+        for accept_encoding, content_encoding in ((None, None), ("gzip", "gzip")):
+            headers: dict[str, str] = {} if accept_encoding is None else {"Accept-Encoding": accept_encoding}
+            async with session.post(f"http://127.0.0.1:{_PROXY_PORT}/", data=b"", headers=headers) as response:
+                await response.read()
+                if response.headers.get("Content-Encoding") != content_encoding:
+                    failures.append(
+                        f"Accept-Encoding {accept_encoding!r} got a response with Content-Encoding "
+                        f"{response.headers.get('Content-Encoding')!r}, not {content_encoding!r}"
+                    )
+    return failures
+
+
+def run_proxy_benchmark(requests: int, concurrency: int, workers: int, body_size: int) -> dict[str, Any]:
+    payloads: list[tuple[bytes, bytes]] = [(content_type, body) for content_type, _, body in corpus_multipart_requests()]
+    boundary: str = make_boundary(40)
+    payloads.append((f'multipart/form-data; boundary="{boundary}"'.encode("ascii"), make_multipart_body(boundary, 1, body_size)))
+
+    upstream: multiprocessing.Process = multiprocessing.get_context("spawn").Process(target=run_stub_upstream, args=(_UPSTREAM_PORT,), daemon=True)
+    upstream.start()
+    proxy: subprocess.Popen = subprocess.Popen(
+        [
+            sys.executable,
+            "server.py",
+            "--listen-host", "127.0.0.1",
+            "--listen-port", str(_PROXY_PORT),
+            "--upstream-host", "127.0.0.1",
+            "--upstream-port", str(_UPSTREAM_PORT),
+            "--workers", str(workers),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(_UPSTREAM_PORT, timeout=10)
+        wait_for_port(_PROXY_PORT, timeout=10)
+        check_failures: list[str] = asyncio.run(check_proxy())
+        start: float = time.perf_counter()
+        latencies, bytes_sent, failures = asyncio.run(generate_load(requests, concurrency, payloads))
+        elapsed: float = time.perf_counter() - start
+        proxy_peak_rss: int | None = peak_rss_kib(proxy.pid)
+    finally:
+        proxy.terminate()
+        proxy.wait()
+        upstream.terminate()
+        upstream.join()
+
+    return {
+        "name": f"proxy/workers={workers}/concurrency={concurrency}",
+        "params": {"requests": requests, "concurrency": concurrency, "workers": workers, "body_size": body_size},
+        "iterations": len(latencies),
+        "failures": failures,
+        "check_failures": check_failures,
+        "ops_per_s": len(latencies) / elapsed,
+        "bytes_per_s": bytes_sent / elapsed,
+        "latency_us": percentiles(latencies),
+        "peak_rss_kib": proxy_peak_rss,
+    }
+
+
+def compare_to_baseline(results: list[dict[str, Any]], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Returns a description of each benchmark whose throughput fell by more than `tolerance` since the baseline.
+    """
+    baseline_results: dict[str, dict[str, Any]] = {result["name"]: result for result in baseline["results"]}
+    regressions: list[str] = []
+    for result in results:
+        old: dict[str, Any] | None = baseline_results.get(result["name"])
+        if old is None:
+            continue
+        if result["ops_per_s"] < old["ops_per_s"] * (1 - tolerance):
+            regressions.append(f"{result['name']}: {old['ops_per_s']:.1f} -> {result['ops_per_s']:.1f} ops/s")
+    return regressions
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Benchmark the normalizer hot paths.")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--max-body-size", type=parse_size, default=64 * _MIB, help="largest generated body, e.g. 1G (default: 64M)")
+    parser.add_argument("--no-proxy", action="store_true", help="skip the end-to-end proxy benchmark")
+    parser.add_argument("--proxy-requests", type=int, default=2_000)
+    parser.add_argument("--proxy-concurrency", type=int, default=32)
+    parser.add_argument("--proxy-workers", type=int, default=1, help="worker processes for the proxy under test")
+    parser.add_argument("--proxy-body-size", type=parse_size, default=_MIB, help="size of the large upload mixed into the proxy load")
+    parser.add_argument("--output", help="write JSON results here instead of to stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed throughput drop relative to the baseline (default: 0.1)")
+    args: argparse.Namespace = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    # One process per benchmark, so that ru_maxrss is per benchmark.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), max_tasks_per_child=1) as pool:
+        for name, builder, params in list_cases(args.max_body_size):
+            if args.filter not in name:
+                continue
+            result: dict[str, Any] = pool.submit(run_case, name, builder, params).result()
+            print(f"{name:<60} {result['ops_per_s']:12.1f} ops/s {result['bytes_per_s'] / _MIB:10.1f} MiB/s", file=sys.stderr)
+            results.append(result)
+
+    proxy_name: str = f"proxy/workers={args.proxy_workers}/concurrency={args.proxy_concurrency}"
+    if not args.no_proxy and args.filter in proxy_name:
+        result = run_proxy_benchmark(args.proxy_requests, args.proxy_concurrency, args.proxy_workers, args.proxy_body_size)
+        print(f"{proxy_name:<60} {result['ops_per_s']:12.1f} req/s {result['bytes_per_s'] / _MIB:10.1f} MiB/s", file=sys.stderr)
+        results.append(result)
+        for failure in result["check_failures"]:
+            print(f"CHECK FAILED {failure}", file=sys.stderr)
+
+    report: dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    report_json: str = json.dumps(report, indent=2)
+    if args.output is None:
+        print(report_json)
+    else:
+        with open(args.output, "w") as f:
+            f.write(report_json + "\n")
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions: list[str] = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if len(regressions) > 0:
+            sys.exit(1)
+    if any(len(result.get("check_failures", ())) > 0 for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
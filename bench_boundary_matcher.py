@@ -0,0 +1,77 @@
+"""
+Microbenchmark for multipart prefix/delimiter matching.
+Compares building a regex from each request's boundary (what parse_multipart_body used to do) with BoundaryMatcher.
+
+Usage: python bench_boundary_matcher.py [requests]
+"""
+
+import re
+import secrets
+import sys
+import time
+from typing import Callable, Final
+
+from media_type import _CRLF_RE, _PREAMBLE_RE, _TRANSPORT_PADDING_RE, BoundaryMatcher, get_boundary_matcher
+
+_DEFAULT_REQUESTS: Final[int] = 20_000
+
+
+def regex_prefix_end(boundary: str, data: bytes) -> int:
+    # The regex-per-request approach, as it was before BoundaryMatcher.
+    prefix_re: bytes = rf"(?:(?:{_PREAMBLE_RE}{_CRLF_RE})?(?:--{boundary}){_TRANSPORT_PADDING_RE}{_CRLF_RE})".encode("ascii")
+    m: re.Match[bytes] | None = re.match(prefix_re, data)
+    assert m is not None
+    return len(data[m.end() :].split(b"\r\n--" + boundary.encode("ascii")))
+
+
+def fresh_matcher_prefix_end(boundary: str, data: bytes) -> int:
+    matcher: BoundaryMatcher = BoundaryMatcher(boundary)
+    return len(data[matcher.match_prefix(data) :].split(matcher.delimiter))
+
+
+def cached_matcher_prefix_end(boundary: str, data: bytes) -> int:
+    matcher: BoundaryMatcher = get_boundary_matcher(boundary)
+    return len(data[matcher.match_prefix(data) :].split(matcher.delimiter))
+
+
+def make_body(boundary: str) -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="field"\r\n'
+        "\r\n"
+        "value\r\n"
+        f"--{boundary}--\r\n"
+    ).encode("ascii")
+
+
+def bench(name: str, f: Callable[[str, bytes], int], workload: list[tuple[str, bytes]]) -> None:
+    start: float = time.perf_counter()
+    for boundary, body in workload:
+        f(boundary, body)
+    elapsed: float = time.perf_counter() - start
+    print(f"{name:<36} {elapsed / len(workload) * 1e6:8.2f} us/request")
+
+
+def main() -> None:
+    requests: int = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_REQUESTS
+
+    # Browsers pick a fresh random boundary for every request.
+    unique: list[tuple[str, bytes]] = []
+    for _ in range(requests):
+        boundary: str = "----WebKitFormBoundary" + secrets.token_hex(8)
+        unique.append((boundary, make_body(boundary)))
+    # Retries and replays reuse a boundary.
+    repeated: list[tuple[str, bytes]] = [unique[0]] * requests
+
+    print(f"{requests} requests, unique boundaries:")
+    bench("regex per request", regex_prefix_end, unique)
+    bench("BoundaryMatcher per request", fresh_matcher_prefix_end, unique)
+    bench("cached BoundaryMatcher", cached_matcher_prefix_end, unique)
+    print(f"{requests} requests, one repeated boundary:")
+    bench("regex per request", regex_prefix_end, repeated)
+    bench("BoundaryMatcher per request", fresh_matcher_prefix_end, repeated)
+    bench("cached BoundaryMatcher", cached_matcher_prefix_end, repeated)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+A cache of normalized bodies, keyed by a hash of the normalized Content-Type and the raw body, so that retried and
+replayed requests don't get normalized all over again. Keys also cover the code that produced the result, so workers
+started by a reload never serve what the old code normalized.
+Entries hold either the normalized body or the reason it was rejected. They live in an SQLite file that every worker
+process opens, and the least recently used ones are evicted once the entries add up to more than the size budget.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Final
+
+from mime_type import REGISTRY_PATH
+
+# Seconds to wait for another worker's write to finish before giving up on a store
+_LOCK_TIMEOUT: Final[float] = 0.05
+# Hits whose recency is held back before it's written on its own, rather than along with the next store
+_MAX_PENDING_USES: Final[int] = 256
+# Bytes in a cache key
+_KEY_SIZE: Final[int] = 16
+# Journal and shared-memory files SQLite keeps next to the database in WAL mode
+_SIDE_FILE_SUFFIXES: Final[tuple[str, ...]] = ("-wal", "-shm")
+
+_SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, normalized BLOB, reason TEXT, size INTEGER NOT NULL, used INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL);
+INSERT OR IGNORE INTO total VALUES (0, 0);
+"""
+
+
+@dataclass
+class CachedResult:
+    normalized: bytes | None  # None if the body was rejected
+    reason: str | None  # Why the body was rejected
+
+
+def create_cache_file(path: str) -> str:
+    """
+    Creates an empty cache at path, dropping whatever an earlier run left there, and returns the path.
+    An empty path means a new temporary file.
+    """
+    if path == "":
+        fd, path = tempfile.mkstemp(prefix="normalizer-cache-", suffix=".sqlite3")
+        os.close(fd)
+    db: sqlite3.Connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("DROP TABLE IF EXISTS entries")
+        db.execute("DROP TABLE IF EXISTS total")
+        db.executescript(_SCHEMA)
+    finally:
+        db.close()
+    return path
+
+
+def code_version() -> bytes:
+    """
+    Returns a hash of the source of every module loaded from this directory, and of the MIME type registry.
+    """
+    directory: str = os.path.dirname(os.path.abspath(__file__))
+    paths: set[str] = {REGISTRY_PATH}
+    for module in list(sys.modules.values()):
+        path: str | None = getattr(module, "__file__", None)
+        if path is not None and os.path.dirname(os.path.abspath(path)) == directory:
+            paths.add(os.path.abspath(path))
+    h: hashlib.blake2b = hashlib.blake2b(digest_size=_KEY_SIZE)
+    for path in sorted(paths):
+        with open(path, "rb") as f:
+            h.update(os.fsencode(path) + b"\n" + hashlib.blake2b(f.read()).digest())
+    return h.digest()
+
+
+def remove_cache_file(path: str) -> None:
+    for suffix in ("", *_SIDE_FILE_SUFFIXES):
+        try:
+            os.unlink(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class BodyCache:
+    """
+    One process's handle on the shared cache. Only meant to be used from the event loop thread.
+    SQLite is only ever touched from a thread of the cache's own, so the event loop never waits on the disk or on
+    another process's lock. The cache is an optimization, so a store that can't get the lock in time is skipped.
+    Lookups don't write: when entries were last used is written along with the next store, which is the only place
+    that reads it, or on its own once enough hits have piled up.
+    """
+
+    def __init__(self, path: str, max_size: int, max_entry_size: int) -> None:
+        self.max_size: int = max_size
+        self.max_entry_size: int = max_entry_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._executor: concurrent.futures.ThreadPoolExecutor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="body-cache")
+        # Only used from the executor's one thread, but created on this one
+        self._db: sqlite3.Connection = sqlite3.connect(path, timeout=_LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._uses: dict[bytes, int] = {}  # When each entry hit since the last write was last used
+        self.version: bytes = code_version()
+
+    def key(self, content_type: bytes, body: bytes) -> bytes:
+        """
+        Content-Type values can't hold a newline, so it separates the two unambiguously. The hash is keyed with the
+        code version, so the same request run through different code gets a different key.
+        """
+        h: hashlib.blake2b = hashlib.blake2b(content_type, digest_size=_KEY_SIZE, key=self.version)
+        h.update(b"\n")
+        h.update(body)
+        return h.digest()
+
+    async def get(self, key: bytes) -> CachedResult | None:
+        row: tuple[bytes | None, str | None] | None = await asyncio.get_running_loop().run_in_executor(self._executor, self._get, key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResult(row[0], row[1])
+
+    def put(self, key: bytes, result: CachedResult) -> None:
+        """
+        Stores a result, unless it's bigger than max_entry_size, evicting the least recently used entries to make room.
+        The store happens in the background, so this returns straight away.
+        """
+        size: int = len(key) + (len(result.normalized) if result.normalized is not None else len(result.reason or ""))
+        if size > self.max_entry_size or size > self.max_size:
+            return
+        self._executor.submit(self._put, key, result, size)
+
+    def close(self) -> None:
+        """
+        Waits for pending stores, then closes the database.
+        """
+        self._executor.submit(self._db.close)
+        self._executor.shutdown()
+
+    def _get(self, key: bytes) -> tuple[bytes | None, str | None] | None:
+        try:
+            row: tuple[bytes | None, str | None] | None = self._db.execute("SELECT normalized, reason FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is not None:
+            self._uses[key] = time.time_ns()
+            if len(self._uses) >= _MAX_PENDING_USES:
+                try:
+                    self._write(self._write_uses)
+                except sqlite3.OperationalError:
+                    pass
+                # Recency is only a hint for eviction, so what couldn't be written is dropped rather than retried.
+                self._uses.clear()
+        return row
+
+    def _put(self, key: bytes, result: CachedResult, size: int) -> None:
+        def store() -> None:
+            self._write_uses()
+            old: tuple[int] | None = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, result.normalized, result.reason, size, time.time_ns()),
+            )
+            total: int = self._db.execute("SELECT size FROM total").fetchone()[0] + size - (0 if old is None else old[0])
+            while total > self.max_size:
+                oldest_key, oldest_size = self._db.execute("SELECT key, size FROM entries ORDER BY used LIMIT 1").fetchone()
+                self._db.execute("DELETE FROM entries WHERE key = ?", (oldest_key,))
+                total -= oldest_size
+            self._db.execute("UPDATE total SET size = ?", (total,))
+
+        try:
+            self._write(store)
+        except sqlite3.OperationalError:
+            return
+        self._uses.clear()
+
+    def _write(self, f: Callable[[], None]) -> None:
+        """
+        Runs f in a write transaction, rolling back if it raises.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            f()
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _write_uses(self) -> None:
+        self._db.executemany("UPDATE entries SET used = ? WHERE key = ?", [(used, key) for key, used in self._uses.items()])
@@ -0,0 +1,270 @@
+"""
+Incremental decoding and canonical re-encoding of the chunked transfer coding (RFC 9112, section 7.1).
+
+Chunk data is handed back as it arrives, so a body can be normalized (and forwarded) long before its last chunk.
+Chunk extensions and trailer fields are checked against the grammar and kept in a canonical form, rather than dropped.
+Bare LFs, chunk sizes with signs or "0x" prefixes, and trailer fields that would change how the message is framed,
+routed, or authenticated are rejected.
+"""
+
+import re
+from typing import Final
+
+from limits import LimitExceeded
+from media_type import OWS_RE, QUOTED_STRING_RE, QUOTED_STRING_UNROLLED_RE, TOKEN_RE, parse_header
+
+# Bytes in a chunk-size line or trailer line, CRLF included
+_MAX_LINE_LENGTH: Final[int] = 2**12
+# Hex digits in a chunk size, leading zeros included, so that sizes stay well below what fits in 64 bits
+_MAX_CHUNK_SIZE_DIGITS: Final[int] = 15
+# Bytes of canonical chunk extensions in the whole body
+_MAX_EXTENSION_BYTES: Final[int] = 2**16
+# Bytes of the trailer section, the final CRLF included
+_MAX_TRAILER_BYTES: Final[int] = 2**16
+
+# RFC 9112
+# chunk-ext      = *( BWS ";" BWS chunk-ext-name [ BWS "=" BWS chunk-ext-val ] )
+# chunk-ext-name = token
+# chunk-ext-val  = token / quoted-string
+_CHUNK_EXT_RE: Final[str] = rf"(?:{OWS_RE};{OWS_RE}({TOKEN_RE})(?:{OWS_RE}={OWS_RE}({TOKEN_RE}|{QUOTED_STRING_RE}))?)"
+
+# RFC 9112
+# chunk          = chunk-size [ chunk-ext ] CRLF
+#                  chunk-data CRLF
+# chunk-size     = 1*HEXDIG
+# last-chunk     = 1*("0") [ chunk-ext ] CRLF
+_CHUNK_LINE_RE: Final[str] = rf"([0-9A-Fa-f]+)((?:{_CHUNK_EXT_RE})*)\r\n"
+# Like the media type grammar, these are only documentation: with an OWS on either side of each ";", matching a whole
+# line against them backtracks superlinearly. _match_chunk_line steps through the line an extension at a time instead.
+_CHUNK_SIZE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"[0-9A-Fa-f]+")
+_CHUNK_EXT_PAT: Final[re.Pattern[bytes]] = re.compile(
+    rf"{OWS_RE};{OWS_RE}({TOKEN_RE})(?:{OWS_RE}={OWS_RE}({TOKEN_RE}|{QUOTED_STRING_UNROLLED_RE}))?".encode("ascii")
+)
+_TOKEN_PAT: Final[re.Pattern[bytes]] = re.compile(TOKEN_RE.encode("ascii"))
+_QUOTED_PAIR_PAT: Final[re.Pattern[bytes]] = re.compile(rb"\\(.)")
+_QUOTED_CHARS_PAT: Final[re.Pattern[bytes]] = re.compile(rb'(["\\])')
+
+# Fields that can't be sent in a trailer, because they control framing, routing, request modifiers, authentication,
+# or how the content is to be processed (RFC 9110, section 6.5.1)
+PROHIBITED_TRAILER_FIELDS: Final[frozenset[bytes]] = frozenset(
+    (
+        b"transfer-encoding",
+        b"content-length",
+        b"trailer",
+        b"host",
+        b"te",
+        b"connection",
+        b"keep-alive",
+        b"upgrade",
+        b"expect",
+        b"max-forwards",
+        b"range",
+        b"if-match",
+        b"if-none-match",
+        b"if-modified-since",
+        b"if-unmodified-since",
+        b"if-range",
+        b"cache-control",
+        b"pragma",
+        b"authorization",
+        b"proxy-authorization",
+        b"cookie",
+        b"content-type",
+        b"content-encoding",
+        b"content-range",
+    )
+)
+
+# Decoder states
+_SIZE_LINE: Final[int] = 0
+_DATA: Final[int] = 1
+_DATA_CRLF: Final[int] = 2
+_TRAILERS: Final[int] = 3
+_DONE: Final[int] = 4
+
+
+def _match_chunk_line(line: bytes) -> tuple[bytes, list[tuple[bytes, bytes | None]]] | None:
+    """
+    Matches all of a chunk-size line, CRLF included, against _CHUNK_LINE_RE.
+    Returns the chunk size's hex digits and the (name, raw value) of each chunk extension, or None if it doesn't match.
+    """
+    m: re.Match[bytes] | None = _CHUNK_SIZE_PAT.match(line)
+    if m is None or not line.endswith(b"\r\n"):
+        return None
+    end: int = len(line) - len(b"\r\n")
+    extensions: list[tuple[bytes, bytes | None]] = []
+    pos: int = m.end()
+    while pos < end:
+        ext_m: re.Match[bytes] | None = _CHUNK_EXT_PAT.match(line, pos, end)
+        if ext_m is None:
+            return None
+        extensions.append((ext_m[1], ext_m[2]))
+        pos = ext_m.end()
+    return m[0], extensions
+
+
+def canonicalize_chunk_extension(name: bytes, value: bytes | None) -> bytes:
+    """
+    Serializes one chunk extension with no whitespace, and its value as a token unless it has to be quoted.
+    """
+    if value is None:
+        return b";" + name
+    if value.startswith(b'"'):
+        value = _QUOTED_PAIR_PAT.sub(rb"\1", value[1:-1])
+    if _TOKEN_PAT.fullmatch(value) is None:
+        value = b'"' + _QUOTED_CHARS_PAT.sub(rb"\\\1", value) + b'"'
+    return b";" + name + b"=" + value
+
+
+class ChunkedDecoder:
+    """
+    Incremental decoder for a chunked message body.
+    Only a chunk-size or trailer line cut off by the end of a feed is ever buffered; chunk data is passed straight through.
+    Once the body is done, consumed says how many of the bytes fed belonged to it, so the rest can be told apart.
+    """
+
+    def __init__(
+        self,
+        max_line_length: int = _MAX_LINE_LENGTH,
+        max_extension_bytes: int = _MAX_EXTENSION_BYTES,
+        max_trailer_bytes: int = _MAX_TRAILER_BYTES,
+    ) -> None:
+        self.max_line_length: int = max_line_length
+        self.max_extension_bytes: int = max_extension_bytes
+        self.max_trailer_bytes: int = max_trailer_bytes
+        self.consumed: int = 0
+        self.chunk_count: int = 0  # Not counting the last chunk
+        self.extension_bytes: int = 0
+        self.last_chunk_extensions: bytes = b""  # Canonical, like the extensions handed back with chunk data
+        self.trailers: dict[bytes, bytes] = {}  # Names are lowercased
+        self.trailer_bytes: int = 0
+        self._state: int = _SIZE_LINE
+        self._buf: bytes = b""
+        self._remaining: int = 0  # Bytes of the current chunk's data not yet seen
+        self._extensions: bytes = b""  # Extensions of the current chunk, until they're handed back
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, data: bytes) -> list[tuple[bytes, bytes]]:
+        """
+        Takes as input the next piece of the chunked body. Anything fed past the end of the body is left unconsumed.
+        Returns (extensions, data) for the chunk data made available: a chunk split across feeds comes back in pieces,
+        with its canonical extensions on the first piece only.
+        """
+        result: list[tuple[bytes, bytes]] = []
+        pos: int = 0
+        while pos < len(data) and self._state != _DONE:
+            if self._state == _DATA:
+                size: int = min(self._remaining, len(data) - pos)
+                result.append((self._extensions, data[pos : pos + size]))
+                self._extensions = b""
+                self._remaining -= size
+                pos += size
+                if self._remaining == 0:
+                    self._state = _DATA_CRLF
+            elif self._state == _DATA_CRLF:
+                crlf: bytes = data[pos : pos + len(b"\r\n") - len(self._buf)]
+                pos += len(crlf)
+                self._buf += crlf
+                if not b"\r\n".startswith(self._buf):
+                    raise ValueError("Chunk data missing CRLF!")
+                if self._buf == b"\r\n":
+                    self._buf = b""
+                    self._state = _SIZE_LINE
+            else:
+                line_end: int = data.find(b"\n", pos)
+                if line_end == -1:
+                    self._buf += data[pos:]
+                    pos = len(data)
+                    if len(self._buf) > self.max_line_length:
+                        raise LimitExceeded("Line too long!")
+                    break
+                line: bytes = self._buf + data[pos : line_end + 1]
+                self._buf = b""
+                pos = line_end + 1
+                if len(line) > self.max_line_length:
+                    raise LimitExceeded("Line too long!")
+                if self._state == _SIZE_LINE:
+                    self._parse_chunk_line(line)
+                else:
+                    self._parse_trailer_line(line)
+        self.consumed += pos
+        return result
+
+    def finish(self) -> None:
+        """
+        Signals the end of the input, which has to have held the whole body.
+        """
+        if self._state != _DONE:
+            raise ValueError("Chunked body ended early!")
+
+    def _parse_chunk_line(self, line: bytes) -> None:
+        m: tuple[bytes, list[tuple[bytes, bytes | None]]] | None = _match_chunk_line(line)
+        if m is None:
+            raise ValueError("Invalid chunk line!")
+        digits, raw_extensions = m
+        if len(digits) > _MAX_CHUNK_SIZE_DIGITS:
+            raise LimitExceeded("Chunk size too large!")
+        extensions: bytes = b"".join(canonicalize_chunk_extension(name, value) for name, value in raw_extensions)
+        self.extension_bytes += len(extensions)
+        if self.extension_bytes > self.max_extension_bytes:
+            raise LimitExceeded("Too many chunk extensions!")
+        size: int = int(digits, 16)
+        if size == 0:
+            self.last_chunk_extensions = extensions
+            self._state = _TRAILERS
+        else:
+            self.chunk_count += 1
+            self._extensions = extensions
+            self._remaining = size
+            self._state = _DATA
+
+    def _parse_trailer_line(self, line: bytes) -> None:
+        self.trailer_bytes += len(line)
+        if self.trailer_bytes > self.max_trailer_bytes:
+            raise LimitExceeded("Trailer section too large!")
+        if line == b"\r\n":
+            self._state = _DONE
+            return
+        (name, value), end = parse_header(line)
+        if end != len(line) - len(b"\r\n"):
+            raise ValueError("Invalid trailer field!")
+        name = name.lower()
+        if name in PROHIBITED_TRAILER_FIELDS:
+            raise ValueError("Prohibited trailer field!")
+        if name in self.trailers:
+            raise ValueError("Duplicate trailer field!")
+        self.trailers[name] = value
+
+
+class ChunkedEncoder:
+    """
+    Frames a body as canonical chunked encoding: lowercase hex sizes without leading zeros, and canonical extensions.
+    Extensions handed in with data that produced no output are carried over to the next chunk sent.
+    """
+
+    def __init__(self) -> None:
+        self._extensions: bytes = b""
+
+    def encode(self, data: bytes, extensions: bytes = b"") -> bytes:
+        """
+        Returns data framed as one chunk, or nothing if there's no data (an empty chunk would end the body).
+        """
+        self._extensions += extensions
+        if len(data) == 0:
+            return b""
+        extensions, self._extensions = self._extensions, b""
+        return b"%x%s\r\n%s\r\n" % (len(data), extensions, data)
+
+    def finish(self, extensions: bytes = b"", trailers: dict[bytes, bytes] | None = None) -> bytes:
+        """
+        Returns the last chunk and the trailer section.
+        """
+        pieces: list[bytes] = [b"0", self._extensions, extensions, b"\r\n"]
+        self._extensions = b""
+        for name, value in (trailers or {}).items():
+            pieces += [name, b": ", value, b"\r\n"]
+        pieces.append(b"\r\n")
+        return b"".join(pieces)
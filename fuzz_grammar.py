@@ -0,0 +1,119 @@
+"""
+Differential fuzzer for the grammar scanners.
+Checks that the scanners that stand in for the media type, header field, and chunk line grammar regexes (which can
+backtrack superlinearly) match exactly what the regexes do, on random strings that almost follow the grammar.
+Inputs are kept short, so that the regexes finish even on the strings that make them backtrack.
+
+Usage: python fuzz_grammar.py [--iterations N] [--seed N]
+"""
+
+import argparse
+import random
+import re
+import sys
+from typing import Final
+
+from chunked import _CHUNK_LINE_RE, _CHUNK_EXT_RE, _match_chunk_line
+from media_type import (
+    _FIELD_LINE_RE,
+    _MEDIA_TYPE_RE,
+    _PARAMETER_RE,
+    _PARAMETERS_RE,
+    _PARAMETER_PAT,
+    _match_media_type,
+    _scan_parameters,
+    parse_header,
+)
+
+_ITERATIONS: Final[int] = 100_000
+_MAX_PARAMETERS: Final[int] = 4
+_MAX_MUTATIONS: Final[int] = 2
+
+# Inputs are a prefix, then parameters (or chunk extensions, or a field value), with a few random bytes changed.
+# The prefix is what comes before the parameters of a media type, the extensions of a chunk line, or the value of a
+# header field; or nothing at all.
+_PREFIXES: Final[list[bytes]] = [b"text/plain", b"1", b"X-A:", b""]
+_OWS: Final[list[bytes]] = [b"", b"", b" ", b"\t", b" \t "]
+_NAMES: Final[list[bytes]] = [b"a", b"Z9", b"a*0", b"", b"(", b"\x80"]
+_VALUES: Final[list[bytes]] = [b"b", b"*~", b'"x"', b'""', b'"a b\\"c"', b'"\\\x7f"', b'"\\\x80"', b'"a', b'"a\\"', b'"\x80"', b"", b"\x7f"]
+# Delimiters, whitespace, and bytes from each character class of the grammar and from outside of it
+_NOISE: Final[list[bytes]] = [bytes([c]) for c in b' \t;="\\a/:\x00\x7f\x80\xff'] + [b"\r\n"]
+
+_REFERENCE_MEDIA_TYPE_PAT: Final[re.Pattern[bytes]] = re.compile(_MEDIA_TYPE_RE.encode("ascii"))
+_REFERENCE_PARAMETER_PAT: Final[re.Pattern[bytes]] = re.compile(_PARAMETER_RE.encode("ascii"))
+_REFERENCE_PARAMETERS_PAT: Final[re.Pattern[bytes]] = re.compile(_PARAMETERS_RE.encode("ascii"))
+_REFERENCE_FIELD_LINE_PAT: Final[re.Pattern[bytes]] = re.compile(_FIELD_LINE_RE.encode("ascii"))
+_REFERENCE_CHUNK_LINE_PAT: Final[re.Pattern[bytes]] = re.compile(_CHUNK_LINE_RE.encode("ascii"))
+_REFERENCE_CHUNK_EXT_PAT: Final[re.Pattern[bytes]] = re.compile(_CHUNK_EXT_RE.encode("ascii"))
+
+
+def make_input(rng: random.Random) -> bytes:
+    pieces: list[bytes] = [rng.choice(_PREFIXES)]
+    for _ in range(rng.randrange(_MAX_PARAMETERS + 1)):
+        pieces += [rng.choice(_OWS), b";", rng.choice(_OWS)]
+        if rng.random() < 0.8:
+            pieces += [rng.choice(_NAMES), rng.choice(_OWS), b"=", rng.choice(_OWS), rng.choice(_VALUES)]
+    if rng.random() < 0.5:
+        pieces.append(b"\r\n")
+    data: bytearray = bytearray(b"".join(pieces))
+    for _ in range(rng.randrange(_MAX_MUTATIONS + 1)):
+        pos: int = rng.randrange(len(data) + 1)
+        data[pos : pos + rng.randrange(2)] = rng.choice(_NOISE)
+    return bytes(data)
+
+
+def check(data: bytes, pos: int, end: int) -> list[str]:
+    """
+    Returns the name of each scanner that disagrees with its regex on data (or on data[pos:end]).
+    """
+    failures: list[str] = []
+
+    m: re.Match[bytes] | None = _REFERENCE_MEDIA_TYPE_PAT.fullmatch(data)
+    if _match_media_type(data) != (None if m is None else m.end("subtype")):
+        failures.append("media type")
+
+    if _scan_parameters(data, pos, end) != _REFERENCE_PARAMETERS_PAT.match(data, pos, end).end():  # type: ignore[union-attr]
+        failures.append("parameters")
+    m = _REFERENCE_PARAMETER_PAT.match(data, pos, end)
+    step_m: re.Match[bytes] | None = _PARAMETER_PAT.match(data, pos, end)
+    if (m is None) != (step_m is None) or (m is not None and step_m is not None and (m[1], m[2], m.end()) != (step_m[1], step_m[2], step_m.end())):
+        failures.append("parameter")
+
+    m = _REFERENCE_FIELD_LINE_PAT.match(data, pos, end)
+    try:
+        if parse_header(data, pos, end) != (None if m is None else ((m["name"], m["value"]), m.end())):
+            failures.append("header")
+    except ValueError:
+        if m is not None:
+            failures.append("header")
+
+    m = _REFERENCE_CHUNK_LINE_PAT.fullmatch(data)
+    expected: tuple[bytes, list[tuple[bytes, bytes | None]]] | None = None
+    if m is not None:
+        expected = m[1], [(ext[1], ext[2]) for ext in _REFERENCE_CHUNK_EXT_PAT.finditer(m[2])]
+    if _match_chunk_line(data) != expected:
+        failures.append("chunk line")
+
+    return failures
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Compare the grammar scanners against the grammar regexes.")
+    parser.add_argument("--iterations", type=int, default=_ITERATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args: argparse.Namespace = parser.parse_args()
+
+    rng: random.Random = random.Random(args.seed)
+    for _ in range(args.iterations):
+        data: bytes = make_input(rng)
+        pos: int = rng.randrange(len(data) + 1)
+        end: int = rng.randrange(pos, len(data) + 1)
+        failures: list[str] = check(data, pos, end)
+        if len(failures) > 0:
+            print(f"Mismatch ({', '.join(failures)}) on {data!r}, pos={pos}, end={end}")
+            sys.exit(1)
+    print(f"{args.iterations} inputs, no mismatches.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Regenerates mime_types.txt, the registry mime_type.py looks media types up in, and checks it.
+
+Usage:
+    python gen_mime_registry.py CSV [CSV ...]       rebuild mime_types.txt from the IANA registry's per-type CSV files
+    python gen_mime_registry.py --check [--legacy MODULE]
+        check that mime_types.txt is well-formed, that lookups through mime_type.py agree with it, and that it
+        holds exactly the types of the old MIME_TOP_LEVEL_TYPES and MIME_SUBTYPES sets, which is_registered_type and
+        is_registered_subtype must agree with too; the sets are read from legacy_mime_type.py unless --legacy
+        names another Python file defining them ("" to skip the comparison)
+
+The CSV files are at https://www.iana.org/assignments/media-types/<type>.csv, one for each top-level type.
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+from typing import Final
+
+from mime_type import REGISTRY_PATH, MediaTypeRegistry, is_registered_subtype, is_registered_type
+
+# The registry from before mime_types.txt (git show f09d4a9:mime_type.py), which it has to keep agreeing with
+_LEGACY_PATH: Final[str] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legacy_mime_type.py")
+
+# Types and subtypes are restricted-names (RFC 6838, section 4.2), lowercased, since that's how the registry is matched.
+_ENTRY_PAT: Final[re.Pattern[bytes]] = re.compile(rb"[a-z0-9][a-z0-9!#$&\-^_.+]{0,126}/[a-z0-9][a-z0-9!#$&\-^_.+]{0,126}")
+
+
+def read_iana_csv(path: str) -> set[bytes]:
+    """
+    Reads the entries of one of the registry's CSV files, which has a Name, Template, and Reference column.
+    The top-level type is taken from the file name, for the rows without a template.
+    """
+    top_level_type: str = os.path.splitext(os.path.basename(path))[0].lower()
+    entries: set[bytes] = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            template: str = row["Template"].strip()
+            # Deprecated and obsoleted entries have a note after the name, like "vnd.foo - DEPRECATED in favor of ...".
+            entry: str = template if template != "" else f"{top_level_type}/{row['Name'].split()[0]}"
+            entries.add(entry.lower().encode("ascii"))
+    return entries
+
+
+def write_registry(entries: set[bytes], path: str) -> None:
+    for entry in entries:
+        if _ENTRY_PAT.fullmatch(entry) is None:
+            raise ValueError(f"Malformed registry entry: {entry!r}!")
+    with open(path, "wb") as f:
+        f.write(b"".join(entry + b"\n" for entry in sorted(entries)))
+
+
+def read_registry(path: str) -> list[bytes]:
+    with open(path, "rb") as f:
+        data: bytes = f.read()
+    if not data.endswith(b"\n"):
+        raise ValueError("Registry doesn't end in a newline!")
+    return data[: -len(b"\n")].split(b"\n")
+
+
+def read_legacy_module(path: str) -> set[bytes]:
+    namespace: dict[str, object] = {}
+    with open(path, encoding="utf-8") as f:
+        exec(f.read(), namespace)
+    top_level_types: set[bytes] = namespace["MIME_TOP_LEVEL_TYPES"]  # type: ignore[assignment]
+    subtypes: dict[bytes, set[bytes]] = namespace["MIME_SUBTYPES"]  # type: ignore[assignment]
+    if set(subtypes) != top_level_types:
+        raise ValueError("MIME_SUBTYPES and MIME_TOP_LEVEL_TYPES disagree on the top-level types!")
+    return {type_ + b"/" + subtype for type_, type_subtypes in subtypes.items() for subtype in type_subtypes}
+
+
+def check(path: str, legacy_path: str | None) -> list[str]:
+    """
+    Returns a description of each problem found.
+    """
+    problems: list[str] = []
+    entries: list[bytes] = read_registry(path)
+    if entries != sorted(set(entries)):
+        problems.append("entries are not sorted and unique")
+    problems += [f"malformed entry {entry!r}" for entry in entries if _ENTRY_PAT.fullmatch(entry) is None]
+
+    registry: MediaTypeRegistry = MediaTypeRegistry(path)
+    registered: set[bytes] = set(entries)
+    top_level_types: set[bytes] = {entry.split(b"/")[0] for entry in entries}
+    subtypes: set[bytes] = {entry.split(b"/")[1] for entry in entries}
+    for type_ in top_level_types:
+        if not registry.has_type(type_):
+            problems.append(f"top-level type {type_!r} not found")
+        # Every subtype under every type, so that lookups are checked both ways.
+        for subtype in subtypes:
+            if registry.has_subtype(type_, subtype) != (type_ + b"/" + subtype in registered):
+                problems.append(f"wrong answer for {type_!r}/{subtype!r}")
+    for type_ in (b"", b"a", b"zzz", b"applicatio", b"applications", b"text/plain", b"text\nplain"):
+        if registry.has_type(type_):
+            problems.append(f"unregistered top-level type {type_!r} found")
+    for type_, subtype in ((b"text", b""), (b"text", b"plai"), (b"text", b"plain\ntext/html"), (b"", b"plain")):
+        if registry.has_subtype(type_, subtype):
+            problems.append(f"unregistered subtype {type_!r}/{subtype!r} found")
+
+    if legacy_path is not None:
+        legacy: set[bytes] = read_legacy_module(legacy_path)
+        problems += [f"{entry!r} missing" for entry in sorted(legacy - registered)]
+        problems += [f"{entry!r} not in {legacy_path}" for entry in sorted(registered - legacy)]
+        if os.path.abspath(path) == os.path.abspath(REGISTRY_PATH):
+            # The lookups everything else goes through, caches and all, answering as the old sets would
+            legacy_types: set[bytes] = {entry.split(b"/")[0] for entry in legacy}
+            legacy_subtypes: set[bytes] = {entry.split(b"/")[1] for entry in legacy}
+            for type_ in legacy_types | {b"", b"zzz", b"applications"}:
+                if is_registered_type(type_) != (type_ in legacy_types):
+                    problems.append(f"is_registered_type disagrees with the old sets on {type_!r}")
+                for subtype in legacy_subtypes:
+                    if is_registered_subtype(type_, subtype) != (type_ + b"/" + subtype in legacy):
+                        problems.append(f"is_registered_subtype disagrees with the old sets on {type_!r}/{subtype!r}")
+    return problems
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Regenerate or check the media type registry.")
+    parser.add_argument("csv_files", nargs="*", metavar="CSV", help="the IANA registry's per-type CSV files")
+    parser.add_argument("--check", action="store_true", help="check the registry instead of regenerating it")
+    parser.add_argument(
+        "--legacy", metavar="MODULE", default=_LEGACY_PATH, help="with --check, a Python file defining the old registry sets to compare with (default: %(default)s)"
+    )
+    parser.add_argument("--registry", default=REGISTRY_PATH, help=f"registry file to write or check (default: {REGISTRY_PATH})")
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.check:
+        problems: list[str] = check(args.registry, args.legacy or None)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        if len(problems) > 0:
+            sys.exit(1)
+        print(f"{args.registry} is OK.")
+        return
+
+    if len(args.csv_files) == 0:
+        parser.error("no CSV files given")
+    entries: set[bytes] = set()
+    for path in args.csv_files:
+        entries |= read_iana_csv(path)
+    write_registry(entries, args.registry)
+    print(f"Wrote {len(entries)} media types to {args.registry}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Streaming normalization of application/json bodies (RFC 8259).
+
+Bodies are tokenized as they arrive and re-emitted without insignificant whitespace, with strings escaped the way
+json.dumps(ensure_ascii=False) escapes them, and exponents spelled without "+" or leading zeros.
+No object tree is built: the only state kept is the stack of open containers, with the keys seen so far in each open object.
+Duplicate keys, invalid UTF-8, lone surrogates, and anything outside the RFC 8259 grammar (NaN, Infinity, leading zeros,
+hexadecimal numbers, trailing commas, comments) are rejected.
+"""
+
+import functools
+import itertools
+import json
+import re
+from typing import Final
+
+from limits import LimitExceeded
+
+_MAX_DEPTH: Final[int] = 64
+# Bytes between the quotes of a string, escapes and all
+_MAX_STRING_LENGTH: Final[int] = 2**20
+# Values and keys, counting each container once
+_MAX_TOKENS: Final[int] = 2**24
+# Far longer than a number needs to be to round-trip a double, so longer ones are rejected outright.
+_MAX_NUMBER_LENGTH: Final[int] = 256
+
+# RFC 8259
+# ws = *( %x20 / %x09 / %x0A / %x0D )
+_WHITESPACE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"[ \t\n\r]*")
+# number = [ minus ] int [ frac ] [ exp ]
+# The exponent's sign and digits are captured separately, so that "+" and leading zeros can be dropped.
+_NUMBER_PAT: Final[re.Pattern[bytes]] = re.compile(rb"(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?)(?:[eE]([+-]?)0*([0-9]+))?")
+# Every byte that can continue a number, so that its end can be found before checking it against the grammar
+_NUMBER_CHARS_PAT: Final[re.Pattern[bytes]] = re.compile(rb"[-+0-9.eE]*")
+_NUMBER_CONTINUATION_BYTES: Final[bytes] = b"0123456789.eE+-"
+# The inside of a string, up to the closing quote. Control characters have to be escaped.
+_STRING_BODY_PAT: Final[re.Pattern[bytes]] = re.compile(rb'(?:[^"\\\x00-\x1f]+|\\["\\/bfnrt]|\\u[0-9A-Fa-f]{4})*')
+# An escape cut off by the end of a chunk
+_PARTIAL_ESCAPE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"\\(?:u[0-9A-Fa-f]{0,3})?")
+_LITERALS: Final[dict[int, bytes]] = {ord("t"): b"true", ord("f"): b"false", ord("n"): b"null"}
+
+# Most large bodies are long arrays of scalars or of flat objects, or big flat objects, so runs of those are checked and
+# copied in one go. Strings in a run have no escapes, so are already canonical, and have no commas or braces, so that
+# every comma in a run is a separator, and every brace belongs to an object.
+_FAST_NUMBER_RE: Final[str] = r"-?(?:0|[1-9][0-9]{0,63})(?:\.[0-9]{1,64})?(?:e(?:0|-?[1-9][0-9]{0,7}))?"
+_FAST_WHITESPACE_RE: Final[str] = r"[ \t\n\r]*"
+_WHITESPACE_BYTES: Final[bytes] = b" \t\n\r"
+# The regex engine keeps state for every value in a run until the match is done, so runs are matched a piece at a time.
+_MAX_RUN_LENGTH: Final[int] = 2**16
+# In a run of members with the whitespace taken out, the keys are the strings at the start or after a comma, before a colon.
+_RUN_KEY_PAT: Final[re.Pattern[bytes]] = re.compile(rb'(?:\A|,)"([^"]*)":')
+# In a run of elements with the whitespace taken out, each member's key, along with the "{" or "," before it
+_RUN_MEMBER_PAT: Final[re.Pattern[bytes]] = re.compile(rb'[{,]"[^"]*":')
+
+_VALUE: Final[int] = 0  # A value must come next: at the start, or after ":", or after "," in an array
+_VALUE_OR_END: Final[int] = 1  # Just after "["
+_KEY: Final[int] = 2  # After "," in an object
+_KEY_OR_END: Final[int] = 3  # Just after "{"
+_COLON: Final[int] = 4
+_COMMA_OR_END: Final[int] = 5  # After a value in a container
+_DONE: Final[int] = 6  # After the top-level value
+
+
+@functools.cache
+def _fast_run_patterns(max_string_length: int) -> tuple[re.Pattern[bytes], re.Pattern[bytes]]:
+    """
+    Returns the patterns for a run of array elements and a run of object members, with strings up to max_string_length.
+    """
+    ws: str = _FAST_WHITESPACE_RE
+    string_re: str = rf'"[^"\\,{{}}\x00-\x1f]{{0,{max_string_length}}}"'
+    scalar_re: str = rf"(?:{_FAST_NUMBER_RE}|{string_re}|true|false|null)"
+    member_re: str = rf"(?:{string_re}{ws}:{ws}{scalar_re})"
+    members_re: str = rf"{member_re}(?:{ws},{ws}{member_re})*"
+    element_re: str = rf"(?:{scalar_re}|\{{{ws}(?:{members_re}{ws})?\}})"
+    return re.compile(rf"{element_re}(?:{ws},{ws}{element_re})*".encode("ascii")), re.compile(members_re.encode("ascii"))
+
+
+def _match_run(pat: re.Pattern[bytes], buf: bytes, pos: int, eof: bool) -> tuple[bytes, int]:
+    """
+    Returns the run of values matching pat at buf[pos], with the whitespace taken out, and where it ends.
+    A number at the end of the run could be the start of a longer one, so it's left for the slow path.
+    """
+    endpos: int = min(len(buf), pos + _MAX_RUN_LENGTH)
+    m: re.Match[bytes] | None = pat.match(buf, pos, endpos)
+    if m is None:
+        return b"", pos
+    run: bytes = m[0]
+    end: int = m.end()
+    cut_off: bool = end == endpos and (endpos < len(buf) or not eof)
+    if run[-1] in b"0123456789" and (cut_off or (end < len(buf) and buf[end] in _NUMBER_CONTINUATION_BYTES)):
+        # The number follows the run's last comma, which is between two of its values.
+        run = run[: max(0, run.rfind(b","))]
+        end = pos + len(run)
+    if len(run.translate(None, _WHITESPACE_BYTES)) != len(run):
+        # Quotes only delimit strings here, so every other piece is outside of one.
+        pieces: list[bytes] = run.split(b'"')
+        pieces[::2] = [piece.translate(None, _WHITESPACE_BYTES) for piece in pieces[::2]]
+        run = b'"'.join(pieces)
+    return run, end
+
+
+def _check_object_keys(run: bytes) -> int:
+    """
+    Checks the objects in a run of array elements for duplicate keys, and returns how many keys there are.
+    """
+    members: list[bytes] = _RUN_MEMBER_PAT.findall(run)
+    if len(members) == 0:
+        return 0
+    # Objects in a big array usually all have the keys of the first one, in the same order, which is quick to check.
+    first: list[bytes] = [members[0]]
+    for member in itertools.islice(members, 1, None):
+        if member.startswith(b"{"):
+            break
+        first.append(member)
+    if len({member[1:] for member in first}) == len(first) and b"".join(members) == b"".join(first) * run.count(b'{"'):
+        return len(members)
+    for piece in run.split(b"{")[1:]:
+        keys: list[bytes] = _RUN_KEY_PAT.findall(piece)
+        if len(set(keys)) != len(keys):
+            raise ValueError("Duplicate key in JSON body!")
+    return len(members)
+
+
+def _check_utf8(data: bytes) -> None:
+    if not data.isascii():
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError("Invalid UTF-8 in JSON string!")
+
+
+def canonicalize_json_string(raw: bytes) -> bytes:
+    """
+    Takes the inside of a string token, and re-escapes it canonically.
+    Only quotes, backslashes, and control characters end up escaped, as json.dumps(ensure_ascii=False) escapes them;
+    everything else is raw UTF-8.
+    """
+    _check_utf8(raw)
+    if b"\\" not in raw:
+        return raw
+    # These are what json.loads and json.dumps use for strings, minus the overhead of going through them.
+    value, _ = json.decoder.scanstring(raw.decode("utf-8") + '"', 0)
+    try:
+        return json.encoder.encode_basestring(value).encode("utf-8")[1:-1]
+    except UnicodeEncodeError:
+        raise ValueError("Lone surrogate in JSON string!")
+
+
+def canonicalize_json_number(m: re.Match[bytes]) -> bytes:
+    mantissa, sign, exponent = m.groups()
+    if exponent is None:
+        return mantissa
+    return mantissa + (b"e-" if sign == b"-" and exponent != b"0" else b"e") + exponent
+
+
+def normalize_json_body(data: bytes, max_depth: int = _MAX_DEPTH, max_string_length: int = _MAX_STRING_LENGTH, max_tokens: int = _MAX_TOKENS) -> bytes:
+    """
+    Normalizes an application/json body.
+    Raises ValueError if it isn't valid JSON, has duplicate keys, or goes past one of the limits.
+    """
+    normalizer: JsonBodyNormalizer = JsonBodyNormalizer(max_depth, max_string_length, max_tokens)
+    return b"".join(normalizer.feed(data) + normalizer.finish())
+
+
+class JsonBodyNormalizer:
+    """
+    Incremental version of normalize_json_body.
+    Only a token cut off by the end of a chunk is ever buffered, so memory is bounded by the limits, not the body.
+    """
+
+    def __init__(self, max_depth: int = _MAX_DEPTH, max_string_length: int = _MAX_STRING_LENGTH, max_tokens: int = _MAX_TOKENS) -> None:
+        self.max_depth: int = max_depth
+        self.max_string_length: int = max_string_length
+        self.max_tokens: int = max_tokens
+        self.token_count: int = 0
+        # For each open container, the keys seen so far if it's an object, or None if it's an array
+        self._stack: list[set[bytes] | None] = []
+        self._state: int = _VALUE
+        self._buf: bytes = b""
+        self._string_scanned: int = 0  # How much of the string cut off at the start of the buffer has already been checked
+        self._finished: bool = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Takes as input the next chunk of the body.
+        Returns the normalized output that this chunk made available.
+        """
+        if self._finished:
+            raise ValueError("Data fed after end of body!")
+        self._buf += data
+        return self._advance(eof=False)
+
+    def finish(self) -> list[bytes]:
+        """
+        Signals the end of the body, and returns the rest of the normalized output.
+        """
+        if self._finished:
+            raise ValueError("Body already finished!")
+        self._finished = True
+        result: list[bytes] = self._advance(eof=True)
+        if self._state != _DONE:
+            raise ValueError("JSON body ended early!")
+        return result
+
+    def _advance(self, eof: bool) -> list[bytes]:
+        buf: bytes = self._buf
+        end: int = len(buf)
+        pos: int = 0
+        out: list[bytes] = []
+        stack: list[set[bytes] | None] = self._stack
+        state: int = self._state
+        tokens: int = self.token_count
+        array_run_pat, member_run_pat = _fast_run_patterns(self.max_string_length)
+        # Only good for the token at the start of the buffer
+        string_scanned: int = self._string_scanned
+        self._string_scanned = 0
+        while True:
+            pos = _WHITESPACE_PAT.match(buf, pos).end()  # type: ignore[union-attr]
+            if pos == end:
+                break
+            c: int = buf[pos]
+
+            if state == _COMMA_OR_END:
+                if c == ord(","):
+                    out.append(b",")
+                    pos += 1
+                    state = _VALUE if stack[-1] is None else _KEY
+                elif c == (ord("]") if stack[-1] is None else ord("}")):
+                    out.append(buf[pos : pos + 1])
+                    pos += 1
+                    stack.pop()
+                    state = _COMMA_OR_END if len(stack) > 0 else _DONE
+                else:
+                    raise ValueError("Expected a comma or the end of a container in JSON body!")
+                continue
+
+            if state == _COLON:
+                if c != ord(":"):
+                    raise ValueError("Expected a colon in JSON body!")
+                out.append(b":")
+                pos += 1
+                state = _VALUE
+                continue
+
+            if state == _DONE:
+                raise ValueError("Data after the end of JSON body!")
+
+            if state == _KEY or state == _KEY_OR_END:
+                if state == _KEY_OR_END and c == ord("}"):
+                    out.append(b"}")
+                    pos += 1
+                    stack.pop()
+                    state = _COMMA_OR_END if len(stack) > 0 else _DONE
+                    continue
+                if c != ord('"'):
+                    raise ValueError("Expected a key in JSON body!")
+                keys: set[bytes] = stack[-1]  # type: ignore[assignment]
+                run, run_end = _match_run(member_run_pat, buf, pos, eof)
+                if run_end > pos:
+                    _check_utf8(run)
+                    run_keys: list[bytes] = _RUN_KEY_PAT.findall(run)
+                    key_count: int = len(keys)
+                    keys.update(run_keys)
+                    if len(keys) != key_count + len(run_keys):
+                        raise ValueError("Duplicate key in JSON body!")
+                    tokens += 2 * len(run_keys)
+                    if tokens > self.max_tokens:
+                        raise LimitExceeded("Too many tokens in JSON body!")
+                    out.append(run)
+                    pos = run_end
+                    state = _COMMA_OR_END
+                    continue
+                string_end: int = self._scan_string(buf, pos, string_scanned if pos == 0 else 0, eof)
+                if string_end == -1:
+                    break
+                key: bytes = canonicalize_json_string(buf[pos + 1 : string_end - 1])
+                if key in keys:
+                    raise ValueError("Duplicate key in JSON body!")
+                keys.add(key)
+                tokens += 1
+                if tokens > self.max_tokens:
+                    raise LimitExceeded("Too many tokens in JSON body!")
+                out += (b'"', key, b'"')
+                pos = string_end
+                state = _COLON
+                continue
+
+            # Otherwise, a value comes next.
+            if state == _VALUE_OR_END and c == ord("]"):
+                out.append(b"]")
+                pos += 1
+                stack.pop()
+                state = _COMMA_OR_END if len(stack) > 0 else _DONE
+                continue
+            if len(stack) > 0 and stack[-1] is None:
+                run, run_end = _match_run(array_run_pat, buf, pos, eof)
+                # Objects in the run are one level deeper, so if that's too deep, the slow path will say so.
+                if run_end > pos and (len(stack) < self.max_depth or b"{" not in run):
+                    _check_utf8(run)
+                    key_count = 0
+                    if b"{" in run:
+                        key_count = _check_object_keys(run)
+                    # Commas separate elements, and members of an object, so they undercount elements by one, and
+                    # members by one per non-empty object. Each member is a key and a value.
+                    tokens += run.count(b",") + 1 + key_count + run.count(b'{"')
+                    if tokens > self.max_tokens:
+                        raise LimitExceeded("Too many tokens in JSON body!")
+                    out.append(run)
+                    pos = run_end
+                    state = _COMMA_OR_END
+                    continue
+
+            if c == ord('"'):
+                string_end = self._scan_string(buf, pos, string_scanned if pos == 0 else 0, eof)
+                if string_end == -1:
+                    break
+                out += (b'"', canonicalize_json_string(buf[pos + 1 : string_end - 1]), b'"')
+                pos = string_end
+            elif c == ord("-") or ord("0") <= c <= ord("9"):
+                number_end: int = _NUMBER_CHARS_PAT.match(buf, pos).end()  # type: ignore[union-attr]
+                if number_end - pos > _MAX_NUMBER_LENGTH:
+                    raise LimitExceeded("JSON number too long!")
+                if number_end == end and not eof:
+                    break
+                m = _NUMBER_PAT.fullmatch(buf, pos, number_end)
+                if m is None:
+                    raise ValueError("Malformed JSON number!")
+                out.append(canonicalize_json_number(m))
+                pos = number_end
+            elif c in _LITERALS:
+                literal: bytes = _LITERALS[c]
+                if not buf.startswith(literal, pos):
+                    if not eof and end - pos < len(literal) and literal.startswith(buf[pos:]):
+                        break
+                    raise ValueError("Malformed JSON literal!")
+                out.append(literal)
+                pos += len(literal)
+            elif c == ord("[") or c == ord("{"):
+                if len(stack) >= self.max_depth:
+                    raise LimitExceeded("JSON body nested too deeply!")
+                stack.append(None if c == ord("[") else set())
+                out.append(buf[pos : pos + 1])
+                pos += 1
+                tokens += 1
+                if tokens > self.max_tokens:
+                    raise LimitExceeded("Too many tokens in JSON body!")
+                state = _VALUE_OR_END if c == ord("[") else _KEY_OR_END
+                continue
+            else:
+                raise ValueError("Expected a value in JSON body!")
+            tokens += 1
+            if tokens > self.max_tokens:
+                raise LimitExceeded("Too many tokens in JSON body!")
+            state = _COMMA_OR_END if len(stack) > 0 else _DONE
+
+        self._buf = buf[pos:]
+        self._state = state
+        self.token_count = tokens
+        return [b"".join(out)] if len(out) > 0 else []
+
+    def _scan_string(self, buf: bytes, pos: int, scanned: int, eof: bool) -> int:
+        """
+        Returns the index just past the closing quote of the string starting at buf[pos], or -1 if it's cut off.
+        The first scanned bytes of the string are known to be good already.
+        """
+        body_end: int = _STRING_BODY_PAT.match(buf, pos + max(1, scanned)).end()  # type: ignore[union-attr]
+        if body_end - (pos + 1) > self.max_string_length:
+            raise LimitExceeded("JSON string too long!")
+        if body_end < len(buf) and buf[body_end] == ord('"'):
+            return body_end + 1
+        if eof or (body_end < len(buf) and _PARTIAL_ESCAPE_PAT.fullmatch(buf, body_end) is None):
+            raise ValueError("Malformed JSON string!")
+        # The string continues into the next chunk, and will be at the start of the buffer by then.
+        self._string_scanned = body_end - pos
+        return -1
@@ -0,0 +1,105 @@
+"""
+Runs a fixed number of server worker processes, and keeps them running.
+The workers either share one listening socket that the supervisor binds and hands down, or each bind with SO_REUSEPORT.
+
+Signals to the supervisor:
+    SIGHUP           start a fresh set of workers (picking up code changes), then gracefully retire the old ones
+    SIGTERM, SIGINT  gracefully shut every worker down, then exit
+"""
+
+import signal
+import socket
+import subprocess
+import sys
+import time
+from types import FrameType
+from typing import Final
+
+_POLL_INTERVAL: Final[float] = 0.2  # Seconds between checks on the workers
+_RESPAWN_DELAY: Final[float] = 1.0  # Minimum seconds between starts of the same worker slot, so a crashing worker can't spin
+_KILL_GRACE: Final[float] = 5.0  # Seconds past the shutdown timeout before a worker that won't exit gets SIGKILL
+
+
+def bind_listen_socket(host: str, port: int) -> socket.socket:
+    """
+    Binds a listening socket that worker processes can inherit.
+    """
+    sock: socket.socket = socket.create_server((host, port), backlog=socket.SOMAXCONN)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    def __init__(self, worker_command: list[str], worker_count: int, shutdown_timeout: float, sock: socket.socket | None) -> None:
+        self.worker_command: list[str] = worker_command
+        self.worker_count: int = worker_count
+        self.shutdown_timeout: float = shutdown_timeout
+        self.sock: socket.socket | None = sock
+        self._workers: list[tuple[subprocess.Popen, float]] = []  # (process, start time) for each slot
+        self._retiring: list[tuple[subprocess.Popen, float]] = []  # (process, kill deadline)
+        self._reload_requested: bool = False
+        self._stop_requested: bool = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        self._workers = [(self._spawn(), time.monotonic()) for _ in range(self.worker_count)]
+        while not self._stop_requested:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            self._respawn_dead_workers()
+            self._reap_retiring()
+            time.sleep(_POLL_INTERVAL)
+
+        for process, _ in self._workers:
+            self._retire(process)
+        self._workers = []
+        while len(self._retiring) > 0:
+            self._reap_retiring()
+            time.sleep(_POLL_INTERVAL)
+
+    def _spawn(self) -> subprocess.Popen:
+        pass_fds: tuple[int, ...] = () if self.sock is None else (self.sock.fileno(),)
+        return subprocess.Popen(self.worker_command, pass_fds=pass_fds)
+
+    def _reload(self) -> None:
+        # With a shared socket, connections that arrive in between just wait in its backlog.
+        old_workers: list[tuple[subprocess.Popen, float]] = self._workers
+        self._workers = [(self._spawn(), time.monotonic()) for _ in range(self.worker_count)]
+        for process, _ in old_workers:
+            self._retire(process)
+        print(f"Reloaded {self.worker_count} workers.", file=sys.stderr)
+
+    def _respawn_dead_workers(self) -> None:
+        now: float = time.monotonic()
+        for i, (process, started) in enumerate(self._workers):
+            if process.poll() is None or now - started < _RESPAWN_DELAY:
+                continue
+            print(f"Worker {process.pid} exited with status {process.returncode}; restarting it.", file=sys.stderr)
+            self._workers[i] = (self._spawn(), now)
+
+    def _retire(self, process: subprocess.Popen) -> None:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+        self._retiring.append((process, time.monotonic() + self.shutdown_timeout + _KILL_GRACE))
+
+    def _reap_retiring(self) -> None:
+        still_retiring: list[tuple[subprocess.Popen, float]] = []
+        for process, deadline in self._retiring:
+            if process.poll() is not None:
+                continue
+            if time.monotonic() > deadline:
+                process.kill()
+                process.wait()
+                continue
+            still_retiring.append((process, deadline))
+        self._retiring = still_retiring
+
+    def _request_reload(self, signum: int, frame: FrameType | None) -> None:
+        self._reload_requested = True
+
+    def _request_stop(self, signum: int, frame: FrameType | None) -> None:
+        self._stop_requested = True
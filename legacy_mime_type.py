@@ -0,0 +1,17 @@
+# The registry as mime_type.py held it before mime_types.txt replaced it, kept for gen_mime_registry.py --check to compare with.
+# All data pulled from https://www.iana.org/assignments/media-types/media-types.xhtml on June 18, 2024
+
+
+MIME_TOP_LEVEL_TYPES: set[bytes] = {b"application", b"audio", b"font", b"image", b"message", b"model", b"multipart", b"text", b"video"}
+
+MIME_SUBTYPES: dict[bytes, set[bytes]] = {
+    b"application": {b'vnd.yamaha.openscoreformat.osfpvg+xml', b'ipfix', b'vnd.openxmlformats-officedocument.spreadsheetml.chartsheet+xml', b'vnd.wap.sic', b'vnd.openxmlformats-officedocument.spreadsheetml.volatiledependencies+xml', b'vnd.ms-excel', b'vnd.innopath.wamp.notification', b'vnd.3gpp.mcvideo-service-config+xml', b'vnd.apple.numbers', b'vnd.llamagraphics.life-balance.exchange+xml', b'vnd.apache.parquet', b'vnd.wfa.dpp', b'vnd.cncf.helm.chart.content.v1.tar+gzip', b'edi-x12', b'vnd.uplanet.listcmd-wbxml', b'vnd.3gpp.bsf+xml', b'vnd.powerbuilder75', b'vnd.adobe.partial-upload', b'vnd.nokia.n-gage.data', b'vnd.snesdev-page-table', b'vnd.ms-printschematicket+xml', b'vnd.marlin.drm.mdcf', b'vnd.fut-misnet', b'vnd.mozilla.xul+xml', b'media_control+xml', b'vnd.tcpdump.pcap', b'oebps-package+xml', b'vnd.informedcontrol.rms+xml', b'vnd.openxmlformats-officedocument.spreadsheetml.sheetmetadata+xml', b'vnd.patentdive', b'vnd.mynfc', b'vnd.fujixerox.docuworks.container', b'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml', b'vnd.novadigm.ext', b'alto-updatestreamparams+json', b'vnd.openxmlformats-officedocument.wordprocessingml.fonttable+xml', b'vnd.oasis.opendocument.spreadsheet-template', b'p21+zip', b'vnd.poc.group-advertisement+xml', b'vnd.muvee.style', b'pdf', b'vnd.ntt-local.sip-ta_tcp_stream', b'tamp-sequence-adjust-confirm', b'vnd.sealed.csf', b'dit', b'vnd.oracle.resource+json', b'vnd.iptc.g2.knowledgeitem+xml', b'link-format', b'vnd.chemdraw+xml', b'vnd.afpc.modca-pagesegment', b'vnd.cendio.thinlinc.clientconf', b'vnd.openxmlformats-officedocument.presentationml.slideupdateinfo+xml', b'vnd.nokia.radio-presets', b'vnd.microsoft.portable-executable', b'vnd.3gpp.seal-mbms-usage-info+xml', b'vnd.seis+json', b'vnd.oasis.opendocument.presentation-template', b'senml-etch+json', b'vnd.zzazz.deck+xml', b'wsdl+xml', b'srgs+xml', b'vnd.3gpp.mcvideo-user-profile+xml', b'vnd.oma.bcast.simple-symbol-container', b'vnd.cyan.dean.root+xml', b'vnd.ves.encrypted', b'vnd.smaf', b'vnd.onvif.metadata', b'sgml-open-catalog', b'vnd.micro+json', b'mathematica', b'vnd.avistar+xml', b'vnd.simtech-mindmapper', b'ulpfec', b'vnd.oma.group-usage-list+xml', b'vnd.marlin.drm.actiontoken+xml', b'vnd.osgi.bundle', b'vnd.powerbuilder6-s', b'vnd.nato.openxmlformats-package.iepd+zip', b'vnd.noblenet-directory', b'swid+cbor', b'vnd.mif', b'vnd.oma.cab-user-prefs+xml', b'vnd.renlearn.rlprint', b'vnd.ipld.car', b'vnd.cups-postscript', b'gml+xml', b'vnd.acm.addressxfer+json', b'simplesymbolcontainer', b'vnd.pvi.ptid1', b'vnd.3gpp-prose-pc3ach+xml', b'xml', b'vnd.aplextor.warrp+json', b'vnd.ms-wmdrm.meter-resp', b'applefile', b'prs.implied-executable', b'vnd.3gpp.srvcc-ext+xml', b'vnd.uplanet.alert-wbxml', b'vnd.syncml.dmtnds+xml', b'alto-networkmapfilter+json', b'vnd.quark.quarkxpress', b'vnd.windows.devicepairing', b'vnd.antix.game-component', b'xhtml+xml', b'vnd.motorola.flexsuite.ttc', b'vnd.wap.wbxml', b'vnd.apple.keynote', b'vnd.mobius.plc', b'pidf+xml', b'vnd.genomatix.tuxedo', b'vnd.oma.cab-pcc+xml', b'vnd.sycle+xml', b'vnd.uplanet.signal', b'aif+json', b'mads+xml', b'vnd.gpxsee.map+xml', b'vnd.openxmlformats-officedocument.wordprocessingml.template', b'geo+json', b'vnd.scribus', b'tamp-status-query', b'cea', b'vnd.syncml.ds.notification', b'vnd.wfa.wsc', b'vnd.uplanet.bearer-choice', b'mikey', b'vnd.epson.salt', b'vnd.geoplan', b'vnd.espass-espass+zip', b'vnd.semd', b'vnd.xmi+xml', b'vnd.ipld.raw', b'vnd.crick.clicker', b'vnd.openxmlformats-officedocument.spreadsheetml.connections+xml', b'vnd.intu.qbo', b'vnd.iptc.g2.planningitem+xml', b'vnd.oipf.spdiscovery+xml', b'vnd.cab-jscript', b'pkcs7-signature', b'vnd.bekitzur-stech+json', b'vnd.openxmlformats-officedocument.extended-properties+xml', b'vnd.neurolanguage.nlu', b'wspolicy+xml', b'lostsync+xml', b'vnd.radisys.moml+xml', b'vnd.quobject-quoxdocument', b'vnd.cyclonedx+xml', b'cbor-seq', b'vnd.kde.kpresenter', b'vnd.oma.bcast.drm-trigger+xml', b'vnd.evolv.ecig.settings', b'vnd.eclipse.ditto+json', b'vnd.shana.informed.interchange', b'ccmp+xml', b'vnd.cups-raw', b'spdx+json', b'wasm', b'mbms-reception-report+xml', b'edhoc+cbor-seq', b'atomcat+xml', b'sparql-query', b'vnd.3gpp.seal-info+xml', b'vnd.mophun.application', b'vq-rtcpxr', b'dii', b'vnd.hp-hpid', b'vnd.cups-raster', b'vnd.globalplatform.card-content-mgt', b'vnd.anki', b'vnd.radisys.msml-dialog-speech+xml', b'pkcs8', b'vnd.las.las+json', b'vnd.dtg.local.flash', b'vnd.modl', b'mbms-msk-response+xml', b'vnd.lotus-organizer', b'sparql-results+xml', b'vnd.oasis.opendocument.text-master', b'encaprtp', b'vnd.oma.lwm2m+json', b'vnd.3gpp.mcptt-floor-request+xml', b'vnd.recordare.musicxml', b'elm+xml', b'vnd.smintio.portals.archive', b'fdf', b'vnd.1ob', b'vnd.nearst.inv+json', b'vnd.fujitsu.oasys2', b'vnd.ctc-posml', b'vnd.rapid', b'vnd.oipf.contentaccessstreaming+xml', b'vnd.oma.dcdc', b'vnd.afpc.modca-objectcontainer', b'xcon-conference-info-diff+xml', b'mbms-user-service-description+xml', b'vnd.syncml.dm+xml', b'vnd.hyper-item+json', b'vnd.uri-map', b'vnd.collabio.xodocuments.document-template', b'ibe-key-request+xml', b'vnd.afpc.afplinedata-pagedef', b'vnd.spotfire.dxp', b'xml-patch+xml', b'cwt', b'tve-trigger', b'oxps', b'vnd.dart', b'vnd.etsi.tsl.der', b'vnd.dvb.ipdcdftnotifaccess', b'ocsp-request', b'alto-endpointcost+json', b'vnd.syncml.dmtnds+wbxml', b'vnd.xacml+json', b'vnd.tmd.mediaflex.api+xml', b'vnd.dvb.dvbisl+xml', b'vnd.ms-artgalry', b'vnd.trid.tpt', b'vnd.groove-injector', b'session-info', b'vnd.ims.lti.v2.toolsettings+json', b'vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml', b'vnd.motorola.flexsuite', b'vnd.blink-idb-value-wrapper', b'mbms-envelope+xml', b'tnauthlist', b'opc-nodeset+xml', b'pkix-pkipath', b'vnd.fsc.weblaunch', b'mxf', b'vnd.rar', b'vnd.osgi.subsystem', b'load-control+xml', b'xml-dtd', b'rdf+xml', b'vnd.restful+json', b'vnd.cluetrust.cartomobile-config', b'vnd.ims.lis.v2.result+json', b'mpeg4-generic', b'x-x509-ca-ra-cert', b'mathml+xml', b'hl7v2+xml', b'mrb-publish+xml', b'vnd.ezpix-album', b'vnd.ntt-local.file-transfer', b'urc-ressheet+xml', b'mipc', b'vnd.smart.teacher', b'auth-policy+xml', b'vnd.cncf.helm.chart.provenance.v1.prov', b'vnd.ecowin.seriesupdate', b'vnd.ms-wmdrm.lic-resp', b'mpeg4-iod-xmt', b'vnd.openxmlformats-officedocument.themeoverride+xml', b'nlsml+xml', b'vnd.shade-save-file', b'rpki-manifest', b'dcd', b'vnd.coffeescript', b'vnd.openxmlformats-officedocument.wordprocessingml.styles+xml', b'vnd.kidspiration', b'vnd.nokia.catalogs', b'vnd.trueapp', b'vnd.motorola.flexsuite.gotap', b'vnd.apache.arrow.stream', b'vnd.3gpp.ngap', b'vnd.banana-accounting', b'vnd.ms-windows.printerpairing', b'vnd.oipf.ueprofile+xml', b'vnd.nebumind.line', b'vnd.openxmlformats-officedocument.theme+xml', b'kpml-response+xml', b'vnd.ms-works', b'atsc-rdt+json', b'vnd.infotech.project+xml', b'vnd.svd', b'vcard+json', b'reginfo+xml', b'vnd.afpc.foca-charset', b'vnd.ims.imsccv1p1', b'xcap-caps+xml', b'vnd.sealed.net', b'vnd.dm.delegation+xml', b'vnd.yamaha.remote-setup', b'vnd.ericsson.quickcall', b'vnd.dvb.ipdcesgaccess', b'vnd.fujitsu.oasys3', b'vnd.olpc-sugar', b'vnd.apache.thrift.compact', b'vnd.ibm.secure-container', b'vnd.fdsn.mseed', b'vnd.hp-jlyt', b'vnd.3gpp-prose+xml', b'vnd.crick.clicker.keyboard', b'vnd.geogebra.slides', b'vnd.jam', b'vnd.msgpack', b'vnd.nokia.n-gage.ac+xml', b'jscalendar+json', b'vnd.hsl', b'vnd.ntt-local.sip-ta_remote', b'vnd.sbm.cid', b'vnd.nokia.iptv.config+xml', b'vnd.acucorp', b'pkcs12', b'vnd.yamaha.smaf-phrase', b'dns+json', b'vnd.exstream-package', b'vnd.dece.unspecified', b'vnd.openxmlformats-officedocument.presentationml.slideshow.main+xml', b'city+json', b'atomicmail', b'vnd.nokia.landmarkcollection+xml', b'json-patch+json', b'n-triples', b'vnd.oasis.opendocument.text-template', b'sep-exi', b'cnrp+xml', b'vnd.ncd.control', b'vnd.ms-powerpoint.slideshow.macroenabled.12', b'vnd.amazon.mobi8-ebook', b'vnd.fujifilm.fb.docuworks.binder', b'vnd.umajin', b'vnd.uplanet.cacheop', b'mbms-register+xml', b'vnd.bint.med-content', b'vnd.fdsn.seed', b'vnd.openxmlformats-officedocument.spreadsheetml.template.main+xml', b'manifest+json', b'vnd.dvb.notif-container+xml', b'vnd.qualcomm.brew-app-res', b'vnd.groove-identity-message', b'vnd.wmf.bootstrap', b'vnd.obn', b'vnd.3gpp.v2x', b'mp4', b'vnd.oasis.opendocument.graphics', b'vnd.syncml.dm+wbxml', b'news-groupinfo', b'vnd.3gpp.mcvideo-mbms-usage-info+xml', b'watcherinfo+xml', b'vnd.collabio.xodocuments.spreadsheet', b'vnd.doremir.scorecloud-binary-document', b'vnd.gentoo.ebuild', b'cdfx+xml', b'vnd.erofs', b'rtf', b'dssc+xml', b'vnd.etsi.timestamp-token', b'vnd.accpac.simply.aso', b'vnd.openxmlformats-officedocument.spreadsheetml.table+xml', b'vnd.ffsns', b'vnd.syncml.dm.notification', b'vnd.sss-dtf', b'vnd.fujixerox.ddd', b'vnd.biopax.rdf+xml', b'vnd.datalog', b'x-www-form-urlencoded', b'vnd.ecowin.filerequest', b'vnd.kde.kivio', b'simple-message-summary', b'alto-tips+json', b'vnd.intu.qfx', b'mbms-protection-description+xml', b'vnd.uiq.theme', b'vnd.panoply', b'vnd.ldev.productlicensing', b'vnd.openxmlformats-officedocument.custom-properties+xml', b'vnd.wrq-hp3000-labelled', b'cpl+xml', b'vnd.3gpp.s1ap', b'rfc+xml', b'scvp-cv-request', b'vnd.pg.format', b'vnd.belightsoft.lhzl+zip', b'vnd.bpf3', b'atxml', b'vnd.sealed.xls', b'vnd.openxmlformats-officedocument.presentationml.comments+xml', b'relax-ng-compact-syntax', b'emergencycalldata.subscriberinfo+xml', b'vnd.radisys.msml-dialog+xml', b'alto-endpointprop+json', b'rpki-ghostbusters', b'vnd.meridian-slingshot', b'vnd.xfdl.webform', b'ssml+xml', b'resource-lists-diff+xml', b'yang-data+cbor', b'vnd.efi.iso', b'vnd.apple.installer+xml', b'vnd.ms-lrm', b'alto-error+json', b'tamp-apex-update-confirm', b'vnd.3gpp.pic-bw-small', b'vnd.drive+json', b'vnd.oipf.dae.svg+xml', b'vnd.3gpp.mcptt-signed+xml', b'vnd.cups-ppd', b'vnd.amadeus+json', b'vnd.joost.joda-archive', b'vnd.dece.zip', b'vnd.sealed.mht', b'vnd.mobius.mbk', b'vnd.3gpp.mcptt-info+xml', b'vnd.adobe.fxp', b'xcap-diff+xml', b'vnd.iptc.g2.conceptitem+xml', b'vnd.visionary', b'odm+xml', b'vnd.hp-hps', b'td+json', b'yin+xml', b'vnd.nokia.pcd+wbxml', b'vnd.japannet-jpnstore-wakeup', b'edi-consent', b'alto-directory+json', b'vnd.street-stream', b'vnd.japannet-payment-wakeup', b'tetra_isi', b'vnd.collection.next+json', b'vnd.genozip', b'kpml-request+xml', b'vnd.age', b'odx', b'vnd.etsi.overload-control-policy-dataset+xml', b'vnd.ms-excel.sheet.binary.macroenabled.12', b'rtx', b'vnd.crick.clicker.template', b'vnd.software602.filler.form-xml-zip', b'vnd.dxr', b'vnd.denovo.fcselayout-link', b'vnd.3gpp.mcdata-payload', b'mods+xml', b'vnd.dvb.notif-init+xml', b'vnd.mobius.msl', b'vnd.crypto-shade-file', b'vnd.oipf.spdlist+xml', b'soap+xml', b'emergencycalldata.ecall.msd', b'vnd.patientecommsdoc', b'atsc-dwd+xml', b'vnd.3gpp.ussd+xml', b'vnd.bzip3', b'vnd.xmpie.cpkg', b'vnd.nitf', b'vnd.eln+zip', b'vnd.radisys.msml+xml', b'vnd.yamaha.tunnel-udpencap', b'vnd.syncml.dmddf+xml', b'eshop', b'vnd.hp-pclxl', b'clue_info+xml', b'vnd.3gpp.pic-bw-var', b'vnd.3gpp.current-location-discovery+xml', b'vnd.ms-windows.devicepairing', b'spirits-event+xml', b'vnd.openxmlformats-officedocument.wordprocessingml.document.glossary+xml', b'cda+xml', b'vnd.3gpp.seal-group-doc+xml', b'vnd.ah-barcode', b'set-payment', b'vnd.unity', b'vnd.3gpp.mcptt-mbms-usage-info+xml', b'vnd.ms-asf', b'vnd.etsi.iptvueprofile+xml', b'vnd.nokia.conml+wbxml', b'pkcs7-mime', b'ogg', b'mbms-register-response+xml', b'vnd.nato.bindingdataobject+json', b'vnd.xfdl', b'tm+json', b'xenc+xml', b'vnd.gentoo.pkgmetadata+xml', b'sensml+cbor', b'vnd.criticaltools.wbs+xml', b'vnd.gentoo.eclass', b'vnd.nintendo.snes.rom', b'vnd.openxmlformats-officedocument.wordprocessingml.document', b'pkcs10', b'vnd.gentoo.xpak', b'vnd.isac.fcs', b'vnd.yamaha.through-ngn', b'vnd.comicbook+zip', b'vnd.ms-playready.initiator+xml', b'vnd.3gpp.5gsa2x', b'vnd.omads-folder+xml', b'rpki-updown', b'xop+xml', b'vnd.osa.netdeploy', b'vnd.openxmlformats-officedocument.wordprocessingml.comments+xml', b'vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml', b'route-usd+xml', b'vnd.radisys.msml-dialog-fax-sendrecv+xml', b'oda', b'vnd.openxmlformats-officedocument.spreadsheetml.template', b'vnd.clonk.c4group', b'vnd.3gpp-prose-pc8+xml', b'vnd.yaoweme', b'rls-services+xml', b'tlsrpt+json', b'dca-rft', b'vnd.powerbuilder75-s', b'vnd.3gpp.seal-unicast-info+xml', b'cwl+json', b'set-registration', b'andrew-inset', b'tzif-leap', b'scim+json', b'senml-exi', b'scaip+xml', b'vnd.anser-web-certificate-issue-initiation', b'vnd.lotus-approach', b'vnd.3m.post-it-notes', b'merge-patch+json', b'cdmi-capability', b'vnd.triscape.mxs', b'vnd.debian.binary-package', b'vnd.d3m-problem', b'vnd.3gpp.access-transfer-events+xml', b'vnd.audiograph', b'vnd.geonext', b'vnd.ms-fontobject', b'vnd.geogebra.file', b'vnd.xara', b'vnd.cirpack.isdn-ext', b'tzif', b'activemessage', b'vnd.curl', b'alto-endpointpropparams+json', b'sep+xml', b'vnd.wolfram.mathematica.package', b'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml', b'vnd.insors.igm', b'cbor', b'vnd.enliven', b'vnd.3gpp.gmop+xml', b'pdx', b'vnd.intertrust.nncp', b'framework-attributes+xml', b'pkixcmp', b'vnd.sailingtracker.track', b'vnd.canon-cpdl', b'vnd.valve.source.material', b'vnd.novadigm.edx', b'iotp', b'java-archive', b'vnd.sealed.doc', b'vnd.openxmlformats-officedocument.spreadsheetml.revisionheaders+xml', b'tei+xml', b'vnd.artisan+json', b'vnd.google-earth.kmz', b'vnd.picsel', b'vnd.oxli.countgraph', b'alto-tipsparams+json', b'vnd.ezpix-package', b'vnd.etsi.mheg5', b'vnd.radisys.msml-audit+xml', b'riscos', b'raptorfec', b'stratum', b'vnd.vcx', b'vnd.wap.slc', b'vnd.vel+json', b'x-pki-message', b'jsonpath', b'vnd.radisys.msml-dialog-group+xml', b'vnd.httphone', b'vnd.3gpp.mcptt-location-info+xml', b'vnd.piaccess.application-licence', b'pskc+xml', b'vnd.oma.bcast.ltkm', b'vnd.3gpp.mcdata-info+xml', b'vnd.xecrets-encrypted', b'token-introspection+jwt', b'vnd.fujixerox.docuworks.binder', b'logout+jwt', b'vnd.afpc.modca', b'index.cmd', b'sarif+json', b'vnd.oma.drm.risd+xml', b'vnd.blueice.multipass', b'c2pa', b'vnd.kde.karbon', b'vnd.pocketlearn', b'vnd.yamaha.hv-script', b'vnd.fujifilm.fb.jfi+xml', b'vnd.3gpp.srvcc-info+xml', b'vnd.vsf', b'vnd.fujitsu.oasys', b'xcap-att+xml', b'vnd.handheld-entertainment+xml', b'vnd.micrografx.igx', b'vnd.japannet-registration', b'sarif-external-properties+json', b'vnd.openxmlformats-officedocument.presentationml.template.main+xml', b'ld+json', b'vnd.3gpp.mcptt-affiliation-command+xml', b'im-iscomposing+xml', b'zip', b'vnd.3gpp-v2x-local-service-information', b'vnd.dvb.dvbj', b'vnd.syft+json', b'reputon+json', b'vnd.onepagertatx', b'vnd.tml', b'vnd.yamaha.hv-dic', b'3gpphalforms+json', b'vnd.oma.bcast.sgboot', b'vnd.afpc.afplinedata', b'vnd.iptc.g2.newsmessage+xml', b'cose-key-set', b'vnd.publishare-delta-tree', b'vnd.msa-disk-image', b'vnd.xmpie.ppkg', b'vnd.lotus-1-2-3', b'node', b'index.response', b'vnd.hdt', b'vnd.evolv.ecig.profile', b'vnd.data-vision.rdz', b'sru+xml', b'vnd.mdl', b'vnd.openxmlformats-officedocument.presentationml.presentation.main+xml', b'vnd.ms-windows.wsd.oob', b'prs.implied-structure', b'vnd.shana.informed.formtemplate', b'vnd.gnu.taler.exchange+json', b'vnd.immervision-ivu', b'vnd.apache.arrow.file', b'font-tdpfr', b'vnd.d2l.coursepackage1p0+zip', b'vnd.syncml.dmddf+wbxml', b'atsc-held+xml', b'whoispp-response', b'vnd.maxmind.maxmind-db', b'vnd.ga4gh.passport+jwt', b'vnd.epson.esf', b'vnd.accpac.simply.imp', b'vnd.veryant.thin', b'vnd.ibm.electronic-media', b'vnd.openxmlformats-officedocument.presentationml.commentauthors+xml', b'pkix-cert', b'vnd.oipf.dae.xhtml+xml', b'vnd.rainstor.data', b'vnd.llamagraphics.life-balance.desktop', b'vnd.powerbuilder7-s', b'epp+xml', b'vnd.xmpie.dpkg', b'vnd.wap.wmlscriptc', b'cals-1840', b'vnd.oasis.opendocument.formula', b'vnd.oasis.opendocument.chart', b'pem-certificate-chain', b'vnd.las', b'vnd.oma.bcast.sgdu', b'vnd.sealed.tiff', b'vnd.3gpp.mcptt-regroup+xml', b'vnd.dataresource+json', b'efi', b'vnd.irepository.package+xml', b'pkcs8-encrypted', b'dicom+json', b'vnd.wt.stf', b'vnd.groove-help', b'soap+fastinfoset', b'set-payment-initiation', b'xml-external-parsed-entity', b'vnd.oma.bcast.provisioningtrigger', b'route-s-tsid+xml', b'vnd.avalon+json', b'vnd.geogebra.tool', b'vnd.japannet-setstore-wakeup', b'vnd.smart.notebook', b'vnd.nokia.pcd+xml', b'vnd.dece.data', b'vnd.pcos', b'vnd.nintendo.nitro.rom', b'vnd.sealed.3df', b'xcap-ns+xml', b'vnd.dvb.notif-generic+xml', b'st2110-41', b'vnd.radisys.msml-audit-stream+xml', b'sbml+xml', b'x-x509-next-ca-cert', b'vnd.oci.image.manifest.v1+json', b'index.vnd', b'vnd.motorola.flexsuite.fis', b'vnd.cyclonedx+json', b'vnd.japannet-verification-wakeup', b'vnd.syncml+xml', b'vnd.nokia.conml+xml', b'vnd.hhe.lesson-player', b'vnd.oipf.contentaccessdownload+xml', b'oauth-authz-req+jwt', b'vnd.micrografx.flo', b'vnd.bbf.usp.msg', b'vnd.onepagertamp', b'rpki-publication', b'hyperstudio', b'vnd.powerbuilder6', b'vnd.amiga.ami', b'vnd.xmpie.xlim', b'vnd.globalplatform.card-content-mgt-response', b'vnd.dzr', b'vnd.ms-wmdrm.meter-chlg-req', b'vnd.ms-wpl', b'dash-patch+xml', b'vnd.oasis.opendocument.image', b'vnd.apexlang', b'vnd.dbf', b'wordperfect5.1', b'timestamp-query', b'vnd.ims.imsccv1p3', b'metalink4+xml', b'vnd.ecdis-update', b'vnd.etsi.iptvsad-bc+xml', b'prs.implied-document+xml', b'vnd.medicalholodeck.recordxr', b'vnd.kodak-descriptor', b'vnd.kahootz', b'geoxacml+xml', b'vnd.apache.thrift.binary', b'vnd.jsk.isdn-ngn', b'vnd.wv.ssp+xml', b'vnd.cinderella', b'vnd.sealed.ppt', b'aml', b'vnd.fujitsu.oasysgp', b'vnd.lotus-wordpro', b'vnd.cryptii.pipe+json', b'a2l', b'vnd.mdl-mbsdf', b'set-registration-initiation', b'vnd.openxmlformats-officedocument.presentationml.slide+xml', b'vnd.etsi.pstn+xml', b'vnd.sybyl.mol2', b'ccxml+xml', b'vnd.noblenet-sealer', b'vnd.hyper+json', b'vnd.nato.bindingdataobject+xml', b'xcon-conference-info+xml', b'vnd.cups-pdf', b'vnd.nokia.radio-preset', b'whoispp-query', b'vnd.americandynamics.acc', b'samlassertion+xml', b'vnd.minisoft-hp3000-save', b'vnd.medcalcdata', b'vnd.sealed.eml', b'vnd.palm', b'mbms-deregister+xml', b'vnd.commonspace', b'vnd.sealedmedia.softseal.html', b'vnd.is-xpr', b'vnd.fujixerox.docuworks', b'vnd.etsi.mcid+xml', b'ace+cbor', b'vnd.shana.informed.package', b'vnd.openxmlformats-officedocument.presentationml.viewprops+xml', b'pkix-crl', b'missing-blocks+cbor-seq', b'vnd.hc+json', b'jrd+json', b'vnd.3gpp2.sms', b'sgml', b'scvp-vp-request', b'vnd.etsi.cug+xml', b'3gpdash-qoe-report+xml', b'vnd.macports.portpkg', b'vnd.kde.kword', b'vnd.microsoft.windows.thumbnail-cache', b'jwk-set+json', b'vnd.kde.kspread', b'emergencycalldata.legacyesn+json', b'trickle-ice-sdpfrag', b'vnd.oma.bcast.associated-procedure-parameter+xml', b'vnd.s3sms', b'poc-settings+xml', b'vnd.acucobol', b'mac-binhex40', b'vnd.etsi.sci+xml', b'coap-payload', b'provenance+xml', b'vnd.stepmania.package', b'vnd.artsquare', b'vnd.cloanto.rp9', b'vnd.byu.uapi+json', b'concise-problem-details+cbor', b'vnd.think-cell.ppttc+json', b'rdap+json', b'vnd.3gpp.pinapp-info+xml', b'vnd.astraea-software.iota', b'vnd.otps.ct-kip+xml', b'route-apd+xml', b'batch-smtp', b'vnd.grafeq', b'vnd.pt.mundusmundi', b'vnd.marlin.drm.license+xml', b'at+jwt', b'mf4', b'vnd.wmc', b'senml+cbor', b'vnd.fints', b'vnd.nokia.isds-radio-presets', b'cose-key', b'gnap-binding-jws', b'fhir+json', b'mpeg4-iod', b'vnd.crick.clicker.wordbank', b'vnd.nokia.landmark+xml', b'vnd.openxmlformats-officedocument.drawing+xml', b'vnd.stepmania.stepchart', b'emergencycalldata.comment+xml', b'mbms-msk+xml', b'vnd.mobius.txf', b'vnd.android.ota', b'vnd.dvb.ait', b'alto-propmapparams+json', b'samlmetadata+xml', b'vnd.hp-hpgl', b'vnd.canon-lips', b'atfx', b'vnd.ms-wmdrm.lic-chlg-req', b'vnd.vd-study', b'vnd.3gpp.mid-call+xml', b'vnd.tmobile-livetv', b'vnd.onepager', b'vnd.webturbo', b'vnd.afpc.modca-cmtable', b'vnd.oasis.opendocument.graphics-template', b'vnd.gnu.taler.merchant+json', b'dssc+der', b'commonground', b'atom+xml', b'vnd.previewsystems.box', b'vnd.apple.pages', b'mbms-associated-procedure-description+xml', b'zlib', b'msc-mixer+xml', b'vnd.3gpp.mcdata-signalling', b'vnd.tableschema+json', b'passport', b'vnd.ipunplugged.rcprofile', b'vnd.openxmlformats-officedocument.drawingml.diagramcolors+xml', b'ocsp-response', b'vnd.openxmlformats-officedocument.presentationml.presentation', b'vnd.ms-xpsdocument', b'vnd.openstreetmap.data+xml', b'vnd.dreamfactory', b'vnd.familysearch.gedcom+zip', b'vnd.3gpp.mcvideo-regroup+xml', b'news-transmission', b'vnd.capasystems-pg+json', b'ipp', b'vnd.omads-email+xml', b'vnd.datapackage+json', b'vnd.multiad.creator.cif', b'vnd.oma.xcap-directory+xml', b'vnd.uplanet.list', b'vnd.mediastation.cdkey', b'vnd.japannet-registration-wakeup', b'vnd.geospace', b'vnd.ms-powerpoint.addin.macroenabled.12', b'vnd.radisys.msml-audit-conn+xml', b'alto-cdnifilter+json', b'emergencycalldata.providerinfo+xml', b'vnd.etsi.iptvsad-npvr+xml', b'vnd.uplanet.listcmd', b'vnd.commerce-battelle', b'scvp-vp-response', b'cid-edhoc+cbor-seq', b'vnd.bmi', b'dash+xml', b'vnd.claymore', b'vnd.efi.img', b'vnd.oai.workflows+yaml', b'mets+xml', b'vnd.ms-windows.nwprinting.oob', b'vnd.3gpp.state-and-event-info+xml', b'vnd.jisp', b'sieve', b'vnd.bluetooth.ep.oob', b'vnd.ecowin.fileupdate', b'vnd.ipld.dag-cbor', b'vnd.ciedi', b'vnd.shopkick+json', b'vnd.oma.bcast.sgdd+xml', b'alto-costmap+json', b'vnd.airzip.filesecure.azs', b'vnd.coreos.ignition+json', b'vnd.3gpp.mcvideo-location-info+xml', b'vnd.oma.bcast.imd+xml', b'vnd.openxmlformats-officedocument.presentationml.notesslide+xml', b'vnd.liberty-request+xml', b'prs.implied-object+json-seq', b'vnd.oai.workflows', b'prs.implied-object+yaml', b'vnd.veritone.aion+json', b'vnd.3gpp.seal-location-info+xml', b'vnd.ipld.dag-json', b'vnd.motorola.flexsuite.adsi', b'dashdelta', b'vnd.mfmp', b'vnd.osgeo.mapguide.package', b'vnd.mfer', b'vnd.sun.wadl+xml', b'yang', b'fits', b'exi', b'davmount+xml', b'vnd.oma.dcd', b'senml+json', b'lpf+zip', b'senml-etch+cbor', b'vnd.hzn-3d-crossword', b'vnd.dvb.ipdcesgpdd', b'vnd.heroku+json', b'vnd.pwg-multiplexed', b'vnd.imagemeter.image+zip', b'marcxml+xml', b'sbe', b'mosskey-request', b'call-completion', b'vnd.etsi.iptvsad-cod+xml', b'vnd.hp-pcl', b'gnap-binding-rotation-jwsd', b'vnd.ficlab.flb+zip', b'vnd.uplanet.channel-wbxml', b'rlmi+xml', b'vnd.openxmlformats-officedocument.spreadsheetml.comments+xml', b'vnd.3gpp.mcdata-service-config+xml', b'vnd.openxmlformats-officedocument.drawingml.chartshapes+xml', b'vnd.dvb.notif-ia-msglist+xml', b'vnd.vividence.scriptfile', b'vnd.kinar', b'vnd.oftn.l10n+json', b'vnd.oasis.opendocument.formula-template', b'xmpp+xml', b'ibe-pkg-reply+xml', b'example', b'vnd.bluetooth.le.oob', b'vnd.sigrok.session', b'dns-message', b'vnd.music-niff', b'vnd.collection+json', b'xcap-el+xml', b'vnd.ms-3mfdocument', b'geo+json-seq', b'vnd.bpf', b'activity+json', b'vnd.chess-pgn', b'vnd.yamaha.openscoreformat', b'isup', b'vnd.collabio.xodocuments.document', b'vnd.openxmlformats-officedocument.spreadsheetml.sharedstrings+xml', b'vnd.etsi.iptvservice+xml', b'yang-patch+xml', b'vnd.ims.imsccv1p2', b'vnd.sqlite3', b'vnd.amundsen.maze+xml', b'vnd.radisys.msml-dialog-transform+xml', b'vnd.intergeo', b'vnd.belightsoft.lhzd+zip', b'vnd.oma.bcast.sprov+xml', b'vnd.ms-office.activex+xml', b'vnd.mobius.dis', b'vnd.desmume.movie', b'vnd.fuzzysheet', b'vnd.dvb.notif-ia-registration-response+xml', b'vnd.multiad.creator', b'dns', b'mmt-aei+xml', b'private-token-response', b'vnd.3gpp.mcdata-affiliation-command+xml', b'vnd.ims.lti.v2.toolproxy+json', b'vnd.contact.cmsg', b'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml', b'vnd.ims.lti.v2.toolconsumerprofile+json', b'vnd.onepagertatp', b'vnd.lotus-freelance', b'vnd.openxmlformats-officedocument.presentationml.slide', b'cdmi-queue', b'vnd.realvnc.bed', b'vnd.etsi.iptvdiscovery+xml', b'multipart-core', b'vnd.oipf.pae.gem', b'vnd.flographit', b'vnd.font-fontforge-sfd', b'vnd.collabio.xodocuments.presentation-template', b'vnd.ms-project', b'vnd.3gpp.mcdata-msgstore-ctrl-request+xml', b'tamp-update-confirm', b'p21', b'mp21', b'vnd.wolfram.mathematica', b'oblivious-dns-message', b'vnd.motorola.flexsuite.wem', b'vnd.wfa.p2p', b'vnd.cryptomator.vault', b'vnd.infotech.project', b'vnd.f-secure.mobile', b'expect-ct-report+json', b'vnd.loom', b'vnd.openxmlformats-package.core-properties+xml', b'vnd.oma.lwm2m+tlv', b'alto-costmapfilter+json', b'vnd.oma.bcast.smartcard-trigger+xml', b'vnd.fujitsu.oasysprs', b'vnd.ms-excel.addin.macroenabled.12', b'vnd.openxmlformats-officedocument.presentationml.template', b'vnd.3gpp.vae-info+xml', b'emergencycalldata.deviceinfo+xml', b'vnd.fujixerox.art4', b'vnd.3gpp.crs+xml', b'linkset+json', b'vnd.iccprofile', b'vnd.collabio.xodocuments.presentation', b'vnd.adobe.flash.movie', b'vnd.cosmocaller', b'fdt+xml', b'vnd.oma.poc.optimized-progress-report+xml', b'vnd.preminet', b'vnd.swiftview-ics', b'moss-keys', b'cccex', b'prs.plucker', b'vnd.openxmlformats-officedocument.spreadsheetml.dialogsheet+xml', b'vnd.3gpp.gtpc', b'cybercash', b'news-checkgroups', b'voucher-cms+json', b'vnd.openxmlformats-officedocument.spreadsheetml.revisionlog+xml', b'ohttp-keys', b'vnd.collabio.xodocuments.spreadsheet-template', b'vnd.gentics.grd+json', b'vnd.3gpp.pic-bw-large', b'pgp-signature', b'yaml', b'rtploopback', b'vnd.dtg.local', b'vnd.recordare.musicxml+xml', b'captive+json', b'slate', b'vnd.oma-scws-http-response', b'vnd.ecowin.series', b'vnd.oipf.mippvcontrolmessage+xml', b'vnd.shx', b'vnd.wolfram.player', b'vnd.iptc.g2.catalogitem+xml', b'vnd.laszip', b'express', b'vnd.intertrust.digibox', b'parityfec', b'vnd.etsi.asic-e+zip', b'vnd.gov.sk.e-form+zip', b'vnd.oma.bcast.notification+xml', b'msword', b'vnd.maxar.archive.3tz+zip', b'vnd.oasis.opendocument.chart-template', b'vnd.openxmlformats-officedocument.spreadsheetml.tablesinglecells+xml', b'vnd.nato.bindingdataobject+cbor', b'yang-data+json', b'vnd.radisys.msml-dialog-base+xml', b'pkix-attr-cert', b'ace-groupcomm+cbor', b'vnd.nimn', b'vnd.radisys.msml-audit-conf+xml', b'vnd.3gpp2.bcmcsinfo+xml', b'vnd.c3voc.schedule+xml', b'vnd.ms-powerpoint.slide.macroenabled.12', b'calendar+xml', b'gnap-binding-jwsd', b'vnd.openxmlformats-officedocument.spreadsheetml.usernames+xml', b'vnd.proteus.magazine', b'vnd.oma-scws-config', b'vnd.etsi.iptvprofile+xml', b'oscore', b'emma+xml', b'mud+json', b'sdp', b'vnd.dynageo', b'vnd.wap.wmlc', b'vnd.semf', b'vnd.oma-scws-http-request', b'vnd.radisys.msml-conf+xml', b'simple-filter+xml', b'vnd.comicbook-rar', b'vnd.leap+json', b'vnd.sss-cod', b'vnd.afpc.cmoca-cmresource', b'vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml', b'vnd.openxmlformats-officedocument.spreadsheetml.pivotcacherecords+xml', b'patch-ops-error+xml', b'csta+xml', b'prs.alvestrand.titrax-sheet', b'vnd.epson.ssf', b'vnd.fujifilm.fb.docuworks', b'fhir+xml', b'vnd.3gpp.seal-ue-config-info+xml', b'vnd.openxmlformats-officedocument.presentationml.handoutmaster+xml', b'vnd.dir-bi.plate-dl-nosuffix', b'vnd.etsi.iptvcommand+xml', b'vnd.radisys.msml-audit-dialog+xml', b'problem+json', b'aif+cbor', b'vnd.etsi.simservs+xml', b'pls+xml', b'vnd.ms-powerpoint.template.macroenabled.12', b'vnd.openxmlformats-officedocument.wordprocessingml.websettings+xml', b'vnd.document+json', b'vnd.seemail', b'vnd.ms-htmlhelp', b'vnd.immervision-ivp', b'vnd.miele+json', b'vnd.ms-word.document.macroenabled.12', b'tamp-community-update-confirm', b'vnd.uplanet.channel', b'vnd.lotus-notes', b'vnd.motorola.iprm', b'vnd.3gpp.seal-network-qos-management-info+xml', b'vnd.uoml+xml', b'vnd.dvb.ipdcroaming', b'vnd.uplanet.cacheop-wbxml', b'vnd.dpgraph', b'vnd.orange.indata', b'vnd.apache.thrift.json', b'vnd.ecip.rlp', b'x400-bp', b'p2p-overlay+xml', b'octet-stream', b'vnd.filmit.zfc', b'pgp-keys', b'vnd.dvb.iptv.alfec-base', b'dpop+jwt', b'vnd.ms-printdevicecapabilities+xml', b'vnd.openblox.game-binary', b'yang-patch+json', b'smpte336m', b'vnd.ecowin.chart', b'rpki-roa', b'tamp-apex-update', b'ibe-pp-data', b'vnd.uplanet.list-wbxml', b'vnd.dvb.pfr', b'vnd.futoin+cbor', b'prs.vcfbzip2', b'swid+xml', b'x-x509-ca-cert', b'vnd.pagerduty+json', b'vnd.dolby.mobile.2', b'atomdeleted+xml', b'vnd.3gpp.interworking-data', b'vnd.1000minds.decision-model+xml', b'vnd.afpc.foca-codepage', b'jwt', b'vnd.yellowriver-custom-menu', b'vnd.fluxtime.clip', b'vnd.ims.lti.v2.toolsettings.simple+json', b'vnd.ibm.minipay', b'sensml+xml', b'vnd.iso11783-10+zip', b'3gpphal+json', b'vnd.openxmlformats-officedocument.drawingml.diagramdata+xml', b'alto-endpointcostparams+json', b'vnd.ms-powerpoint', b'vnd.openxmlformats-officedocument.presentationml.tablestyles+xml', b'vnd.ntt-local.content-share', b'vnd.pawaafile', b'vnd.eprints.data+xml', b'vnd.citationstyles.style+xml', b'sensml-exi', b'vnd.3gpp.sms+xml', b'vnd.igloader', b'tlsrpt+gzip', b'vnd.omaloc-supl-init', b'vnd.dolby.mobile.1', b'vnd.oma.scidm.messages+xml', b'vnd.hcl-bireports', b'alto-propmap+json', b'timestamped-data', b'cstadata+xml', b'jwk+json', b'moss-signature', b'vnd.ocf+cbor', b'vnd.3gpp.5gsa2x-local-service-information', b'vnd.shp', b'vnd.resilient.logic', b'dvcs', b'vnd.noblenet-web', b'vnd.oasis.opendocument.text-master-template', b'thraud+xml', b'vnd.chipnuts.karaoke-mmd', b'vnd.oipf.cspg-hexbinary', b'vnd.wv.csp+wbxml', b'voicexml+xml', b'vnd.oma.cab-subs-invite+xml', b'vnd.mitsubishi.misty-guard.trustweb', b'held+xml', b'vnd.iptc.g2.newsitem+xml', b'geoxacml+json', b'vnd.framemaker', b'vnd.netfpx', b'vnd.paos.xml', b'vnd.psfs', b'vnd.vectorworks', b'vnd.yamaha.smaf-audio', b'vnd.mobius.mqy', b'nss', b'ppsp-tracker+json', b'vnd.cryptomator.encrypted', b'media-policy-dataset+xml', b'vnd.exstream-empower+zip', b'vnd.dvb.notif-ia-registration-request+xml', b'vnd.sema', b'vnd.ms-cab-compressed', b'vnd.ms-tnef', b'gzip', b'emergencycalldata.veds+xml', b'vnd.3gpp.mcptt-user-profile+xml', b'vnd.ncd.reference', b'cdmi-domain', b'vnd.mermaid', b'vnd.sealedmedia.softseal.pdf', b'vnd.crick.clicker.palette', b'vnd.openxmlformats-officedocument.spreadsheetml.pivottable+xml', b'vnd.nervana', b'vnd.gentoo.gpkg', b'vnd.osgi.dp', b'macwriteii', b'vnd.3gpp.5gnas', b'cdni', b'vnd.ms-officetheme', b'vnd.3gpp.mcvideo-info+xml', b'vnd.openxmlformats-package.digital-signature-xmlsignature+xml', b'yang-sid+json', b'vnd.oma.poc.final-report+xml', b'tamp-sequence-adjust', b'vnd.hal+xml', b'vnd.dece.ttml+xml', b'nasdata', b'sipc', b'vnd.ieee.1905', b'vnd.openxmlformats-officedocument.spreadsheetml.calcchain+xml', b'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml', b'vnd.oma.bcast.stkm', b'vnd.wasmflow.wafl', b'vnd.cluetrust.cartomobile-config-pkg', b'mmt-usd+xml', b'prs.xsf+xml', b'vnd.3gpp.seal-user-profile-info+xml', b'index', b'vnd.openxmlformats-officedocument.presentationml.slidemaster+xml', b'atomsvc+xml', b'vnd.sbm.mid2', b'prs.nprend', b'vnd.century-systems.tcp_stream', b'cwl', b'vnd.pwg-xhtml-print+xml', b'vnd.kde.kontour', b'vnd.visio', b'tamp-update', b'vnd.openxmlformats-package.relationships+xml', b'tamp-community-update', b'vnd.oma.dd2+xml', b'vnd.aristanetworks.swi', b'cwl+yaml', b'vnd.enphase.envoy', b'webpush-options+json', b'vnd.dna', b'alto-updatestreamcontrol+json', b'emergencycalldata.cap+xml', b'vnd.radisys.msml-dialog-fax-detect+xml', b'postscript', b'vnd.etsi.asic-s+zip', b'wita', b'vnd.dvb.esgcontainer', b'vnd.3gpp.pfcp', b'private-token-issuer-directory', b'vnd.openxmlformats-officedocument.drawingml.chart+xml', b'mathml-presentation+xml', b'vnd.3gpp.mc-signalling-ear', b'vnd.sar', b'fastinfoset', b'ace+json', b'vnd.ipfs.ipns-record', b'vnd.3gpp.mcvideo-transmission-request+xml', b'cea-2018+xml', b'vnd.oma.poc.groups+xml', b'zstd', b'vnd.bbf.usp.error', b'atsc-dynamic-event-message', b'xslt+xml', b'vnd.truedoc', b'vnd.oma.lwm2m+cbor', b'vnd.nacamar.ybrid+json', b'qsig', b'vnd.powerbuilder7', b'cms', b'vnd.rs-274x', b'jscontact+json', b'mrb-consumer+xml', b'flexfec', b'vnd.oma.poc.detailed-progress-report+xml', b'jose+json', b'rpki-signed-tal', b'clue+xml', b'vnd.oasis.opendocument.text', b'vnd.etsi.aoc+xml', b'vnd.logipipe.circuit+zip', b'vnd.easykaraoke.cdgdownload', b'vnd.eszigno3+xml', b'geopackage+sqlite3', b'vnd.wordperfect', b'vnd.oipf.userprofile+xml', b'vnd.hal+json', b'vnd.apothekende.reservation+json', b'vnd.siren+json', b'n-quads', b'vnd.freelog.comic', b'vnd.quarantainenet', b'vnd.3lightssoftware.imagescal', b'vnd.xmpie.plan', b'vnd.oasis.opendocument.image-template', b'senml+xml', b'vnd.onepagertamx', b'vnd.3gpp.lpp', b'vnd.3gpp.mcdata-regroup+xml', b'ttml+xml', b'fastsoap', b'vnd.afpc.modca-formdef', b'vnd.mapbox-vector-tile', b'vnd.apple.mpegurl', b'rpki-checklist', b'vnd.openblox.game+xml', b'vnd.ahead.space', b'dots+cbor', b'vnd.openxmlformats-officedocument.presentationml.tags+xml', b'vnd.dvb.iptv.alfec-enhancement', b'vnd.hyperdrive+json', b'taxii+json', b'vnd.3gpp.mcdata-user-profile+xml', b'lost+xml', b'alto-networkmap+json', b'vnd.shana.informed.formdata', b'mathml-content+xml', b'vnd.geometry-explorer', b'vnd.gridmp', b'vnd.3gpp.mcvideo-ue-config+xml', b'vnd.gerber', b'lxf', b'xcap-error+xml', b'vnd.aether.imp', b'vnd.software602.filler.form+xml', b'vnd.japannet-verification', b'vnd.pg.osasli', b'vnd.ecowin.seriesrequest', b'widget', b'vnd.groove-vcard', b'vnd.ims.lti.v2.toolproxy.id+json', b'vnd.mseq', b'emergencycalldata.control+xml', b'vnd.dvb.service', b'vnd.oma.push', b'vnd.3gpp.mcptt-ue-init-config+xml', b'vnd.omads-file+xml', b'yang-data+xml', b'scvp-cv-response', b'vnd.3gpp.mcptt-service-config+xml', b'cdmi-object', b'vnd.cybank', b'jf2feed+json', b'vnd.adobe.xdp+xml', b'vnd.3gpp.mcdata-ue-config+xml', b'vnd.dvb.notif-aggregate-root+xml', b'vnd.ibm.rights-management', b'vnd.oma.poc.invocation-descriptor+xml', b'vnd.oasis.opendocument.base', b'vnd.oma.pal+xml', b'vnd.shootproof+json', b'vnd.ms-excel.template.macroenabled.12', b'vnd.oai.workflows+json', b'marc', b'vnd.openxmlformats-officedocument.vmldrawing', b'coap-group+json', b'pidf-diff+xml', b'xacml+xml', b'sql', b'vnd.musician', b'cellml+xml', b'vnd.groove-tool-template', b'bacnet-xdd+zip', b'vnd.3gpp.sms', b'vnd.nokia.ncd', b'vnd.groove-tool-message', b'json', b'vnd.afpc.modca-overlay', b'vnd.balsamiq.bmpr', b'vnd.3gpp-prose-pc3a+xml', b'its+xml', b'urc-targetdesc+xml', b'vnd.airzip.filesecure.azf', b'1d-interleaved-parityfec', b'trig', b'vnd.spotfire.sfs', b'iges', b'vnd.tao.intent-module-archive', b'vnd.openxmlformats-officedocument.spreadsheetml.externallink+xml', b'vnd.oasis.opendocument.spreadsheet', b'vnd.kenameaapp', b'shf+xml', b'vnd.oma.cab-address-book+xml', b'vnd.etsi.iptvsync+xml', b'vnd.koan', b'vnd.wv.csp+xml', b'vnd.acm.chatbot+json', b'tamp-error', b'cose', b'vnd.ufdl', b'vnd.hydrostatix.sof-data', b'gnap-binding-rotation-jws', b'vnd.wqd', b'epub+zip', b'automationml-aml+xml', b'vnd.eudora.data', b'mosskey-data', b'vnd.oasis.opendocument.text-web', b'dskpp+xml', b'vnd.oasis.opendocument.presentation', b'vnd.onepagertat', b'vnd.sus-calendar', b'vnd.openeye.oeb', b'vnd.openxmlformats-officedocument.spreadsheetml.sheet', b'vnd.ctct.ws+xml', b'gltf-buffer', b'jose', b'mediaservercontrol+xml', b'vnd.ruckus.download', b'vnd.wordlift', b'vnd.rig.cryptonote', b'vnd.oma.cab-feature-handler+xml', b'vnd.mobius.daf', b'vnd.autopackage', b'vnd.3gpp-prose-pc3ch+xml', b'mbms-schedule+xml', b'vnd.3gpp.mcptt-ue-config+xml', b'cose-x509', b'vnd.lotus-screencam', b'vnd.vidsoft.vidconference', b'pvd+json', b'vnd.las.las+xml', b'vnd.futoin+json', b'h224', b'prs.implied-object+json', b'vnd.ms-ims', b'vnd.mason+json', b'xfdf', b'vnd.openxmlformats-officedocument.customxmlproperties+xml', b'linkset', b'vnd.zul', b'vnd.etsi.tsl+xml', b'vnd.mcd', b'index.obj', b'vnd.afpc.modca-mediummap', b'vnd.pmi.widget', b'vnd.openxmlformats-officedocument.presentationml.slideshow', b'conference-info+xml', b'xliff+xml', b'vnd.motorola.flexsuite.kmr', b'vnd.kde.kformula', b'vnd.fujifilm.fb.docuworks.container', b'vnd.opentimestamps.ots', b'dec-dx', b'vnd.epson.quickanime', b'vnd.marlin.drm.conftoken+xml', b'tamp-status-response', b'vnd.afpc.foca-codedfont', b'atf', b'smil+xml', b'vnd.relpipe', b'vnd.kde.kchart', b'vnd.route66.link66+xml', b'urc-uisocketdesc+xml', b'vnd.ms-powerpoint.presentation.macroenabled.12', b'prs.rdf-xml-crypt', b'vnd.openxmlformats-officedocument.presentationml.presprops+xml', b'vnd.adobe.formscentral.fcdt', b'vnd.firemonkeys.cloudcell', b'vnd.intercon.formnet', b'json-seq', b'urc-grpsheet+xml', b'emotionml+xml', b'vnd.japannet-directory-service', b'vnd.bbf.usp.msg+json', b'problem+xml', b'vnd.google-earth.kml+xml', b'vnd.solent.sdkm+xml', b'msc-ivr+xml', b'vnd.hbci', b'vnd.mophun.certificate', b'vnd.openxmlformats-officedocument.wordprocessingml.endnotes+xml', b'vnd.sss-ntf', b'vnd.openxmlformats-officedocument.wordprocessingml.footer+xml', b'vnd.groove-account', b'vnd.d3m-dataset', b'3gpp-ims+xml', b'vnd.openxmlformats-officedocument.drawingml.diagramstyle+xml', b'calendar+json', b'vnd.iptc.g2.packageitem+xml', b'vnd.3gpp2.tcap', b'vnd.evolv.ecig.theme', b'vnd.fujixerox.hbpl', b'xv+xml', b'dicom+xml', b'vemmi', b'srgs', b'elm+json', b'private-token-request', b'vnd.collection.doc+json', b'vnd.ms-word.template.macroenabled.12', b'vnd.uplanet.alert', b'vnd.eu.kasparian.car+json', b'sensml+json', b'vnd.novadigm.edm', b'http', b'vnd.cncf.helm.config.v1+json', b'vnd.dvb.ipdcesgaccess2', b'vnd.verimatrix.vcas', b'vnd.epson.msf', b'vnd.openxmlformats-officedocument.drawingml.diagramlayout+xml', b'vnd.emclient.accessrequest+xml', b'vnd.gentoo.catmetadata+xml', b'vnd.imagemeter.folder+zip', b'vnd.ntt-local.ogw_remote-access', b'secevent+jwt', b'emergencycalldata.serviceinfo+xml', b'beep+xml', b'dialog-info+xml', b'inkml+xml', b'stix+json', b'cfw', b'vnd.ubisoft.webplayer', b'resource-lists+xml', b'vnd.ms-excel.sheet.macroenabled.12', b'vnd.3gpp.mcvideo-affiliation-command+xml', b'clr', b'vnd.businessobjects', b'csrattrs', b'vnd.jcp.javame.midlet-rms', b'vnd.uplanet.bearer-choice-wbxml', b'vnd.yamaha.hv-voice', b'cdmi-container', b'csvm+json', b'atsc-rsat+xml', b'vnd.gentoo.manifest', b'vnd.fujixerox.art-ex', b'prs.cyn', b'vnd.gov.sk.xmldatacontainer+xml', b'timestamp-reply', b'vnd.openxmlformats-officedocument.spreadsheetml.pivotcachedefinition+xml', b'alto-cdni+json', b'vnd.dtg.local.html', b'vnd.fastcopy-disk-image', b'vnd.openxmlformats-officedocument.presentationml.slidelayout+xml', b'prs.cww', b'vnd.api+json', b'mbox', b'vnd.balsamiq.bmml+xml', b'vnd.openxmlformats-officedocument.wordprocessingml.settings+xml', b'edifact', b'vnd.tri.onesource', b'vnd.openxmlformats-officedocument.spreadsheetml.querytable+xml', b'vnd.nokia.landmark+wbxml', b'dicom', b'vcard+xml', b'vnd.msign', b'lgr+xml', b'prs.hpub+zip', b'pgp-encrypted', b'automationml-amlx+zip', b'vnd.openxmlformats-officedocument.presentationml.notesmaster+xml'},
+    b"audio": {b'asc', b'vnd.dra', b'vmr-wb', b'g711-0', b'tetra_acelp', b'lpc', b'vnd.nuera.ecelp9600', b't38', b'aptx', b'telephone-event', b'vnd.ms-playready.media.pya', b'eac3', b'gsm-efr', b'vorbis-config', b'sofa', b'tsvcis', b'evrcwb0', b'smv0', b'dvi4', b'g7291', b'vnd.4sb', b'dsr-es201108', b'melp1200', b'vnd.dolby.pl2', b'vnd.dolby.heaac.1', b'vnd.dolby.mlp', b'3gpp', b'aac', b'clearmode', b'g7221', b'3gpp2', b'g728', b'mpeg', b'uemclip', b'vnd.octel.sbc', b'1d-interleaved-parityfec', b'g726-16', b'mobile-xmf', b'vnd.dlna.adts', b'amr-wb', b'dls', b'fwdred', b'pcma', b'l24', b'melp2400', b'vnd.nokia.mobile-xmf', b'vorbis', b'speex', b'vnd.dvb.file', b'evrcb0', b'flexfec', b'tetra_acelp_bb', b'evrc-qcp', b'vnd.dece.audio', b'l20', b'mp4', b'prs.sid', b'rtx', b'g726-32', b'mpeg4-generic', b'l16', b'vnd.nortel.vbk', b'g726-40', b't140c', b'vnd.rhetorex.32kadpcm', b'vdvi', b'evrcwb', b'vnd.dolby.pl2x', b'g722', b'vnd.nuera.ecelp7470', b'vnd.cns.anp1', b'vnd.celp', b'sp-midi', b'vnd.dolby.mps', b'vnd.presonus.multitrack', b'atrac-advanced-lossless', b'vnd.everad.plj', b'vnd.dolby.heaac.2', b'evrc', b'cn', b'vnd.audiokoz', b'evrcnw', b'basic', b'ac3', b'raptorfec', b'vnd.dolby.pl2z', b'vnd.dts.hd', b'qcelp', b'g723', b'rtploopback', b'rtp-enc-aescm128', b'dsr-es202212', b'gsm', b'vnd.cns.inf1', b'melp600', b'g729d', b'example', b'g729', b'opus', b'tone', b'usac', b'mpa-robust', b'l8', b'amr', b'amr-wb+', b'matroska', b'vnd.digital-winds', b'evrcwb1', b'evrc0', b'dv', b'parityfec', b'vnd.lucent.voice', b'mp4a-latm', b'vnd.cmles.radio-events', b'ulpfec', b'red', b'g719', b'ogg', b'encaprtp', b'evrc1', b'g729e', b'ip-mr_v2.5', b'g726-24', b'evrcb', b'dsr-es202050', b'evrcb1', b'evrcnw1', b'pcmu-wb', b'vnd.nuera.ecelp4800', b'32kadpcm', b'evrcnw0', b'gsm-hr-08', b'vnd.vmx.cvsd', b'bv16', b'atrac-x', b'mpa', b'melp', b'dat12', b'scip', b'pcmu', b'evs', b'vnd.dolby.pulse.1', b'atrac3', b'mhas', b'vnd.dts.uhd', b'vnd.dts', b'vnd.3gpp.iufp', b'vnd.rip', b'vnd.hns.audio', b'vnd.sealedmedia.softseal.mpeg', b'midi-clip', b'smv', b'smv-qcp', b'ilbc', b'flac', b'rtp-midi', b'vnd.cisco.nse', b'dsr-es202211', b'bv32', b'pcma-wb'},
+    b"font": {b'woff2', b'sfnt', b'woff', b'collection', b'ttf', b'otf'},
+    b"image": {b'vnd.zbrush.pcx', b'jxl', b'vnd.dwg', b'vnd.fpx', b'heif', b'vnd.djvu', b'avci', b'vnd.tencent.tap', b'vnd.sealedmedia.softseal.gif', b't38', b'vnd.mix', b'bmp', b'pwg-raster', b'vnd.dxf', b'vnd.valve.source.texture', b'heic', b'jph', b'vnd.wap.wbmp', b'vnd.net-fpx', b'wmf', b'svg+xml', b'jxr', b'jpx', b'jxra', b'example', b'hej2k', b'vnd.dvb.subtitle', b'vnd.fujixerox.edmics-mmr', b'prs.btif', b'hsj2', b'webp', b'vnd.dece.graphic', b'vnd.microsoft.icon', b'jxsc', b'jpm', b'vnd.globalgraphics.pgb', b'jp2', b'vnd.xiff', b'ktx', b'apng', b'avcs', b'vnd.mozilla.apng', b'vnd.fujixerox.edmics-rlc', b'avif', b'vnd.airzip.accelerator.azv', b'jls', b'tiff', b'aces', b'prs.pti', b'png', b'vnd.adobe.photoshop', b'vnd.fastbidsheet', b'dpx', b'heif-sequence', b'jphc', b'naplps', b'fits', b'tiff-fx', b'jxsi', b'gif', b'vnd.radiance', b'ktx2', b'emf', b'dicom-rle', b'jxrs', b'vnd.fst', b'cgm', b'jxss', b'j2c', b'ief', b'jxs', b'g3fax', b'vnd.pco.b16', b'vnd.cns.inf2', b'vnd.ms-modi', b'vnd.sealedmedia.softseal.jpg', b'vnd.sealed.png', b'vnd.svf', b'heic-sequence', b'jpeg'},
+    b"message": {b'example', b'sipfrag', b'ohttp-req', b'external-body', b'global-delivery-status', b'global-headers', b'http', b'imdn+xml', b'vnd.wfa.wsc', b'mls', b'rfc822', b'disposition-notification', b'bhttp', b'global', b'ohttp-res', b'feedback-report', b'cpim', b'global-disposition-notification', b'sip', b'tracking-status', b'partial', b'delivery-status'},
+    b"model": {b'vnd.flatland.3dml', b'x3d+fastinfoset', b'x3d+xml', b'vnd.vtu', b'iges', b'step', b'u3d', b'vrml', b'mesh', b'vnd.valve.source.compiled-map', b'e57', b'prc', b'vnd.rosette.annotated-data-model', b'vnd.mts', b'vnd.cld', b'vnd.sap.vds', b'vnd.gs-gdl', b'vnd.opengex', b'example', b'vnd.parasolid.transmit.text', b'vnd.usdz+zip', b'gltf+json', b'vnd.collada+xml', b'step+xml', b'vnd.gtw', b'vnd.parasolid.transmit.binary', b'vnd.pytha.pyox', b'vnd.dwf', b'vnd.moml+xml', b'x3d-vrml', b'vnd.bary', b'3mf', b'jt', b'obj', b'stl', b'vnd.usda', b'step-xml+zip', b'gltf-binary', b'mtl', b'step+zip', b'vnd.gdl'},
+    b"multipart": {b'header-set', b'parallel', b'encrypted', b'appledouble', b'related', b'mixed', b'signed', b'example', b'report', b'alternative', b'vnd.bint.med-plus', b'x-mixed-replace', b'digest', b'byteranges', b'voice-message', b'multilingual', b'form-data'},
+    b"text": {b'prs.prop.logic', b'jcr-cnd', b'1d-interleaved-parityfec', b'red', b'prs.lines.tag', b'vnd.sosi', b'raptorfec', b'provenance-notation', b'vnd.iptc.newsml', b'plain', b'vnd.in3d.spot', b'vnd.abc', b'prs.fallenstein.rst', b'vnd.fmi.flexstor', b'vnd.a', b'rtploopback', b'vnd.latex-z', b'mizar', b'cache-manifest', b'csv-schema', b'vnd.debian.copyright', b'vnd.wap.sl', b'vnd.motorola.reflex', b'rtp-enc-aescm128', b'vnd.familysearch.gedcom', b'vnd.curl', b'csv', b'example', b'vnd.dvb.subtitle', b'sgml', b'flexfec', b'grammar-ref-list', b'spdx', b'hl7v2', b'cql', b'rfc822-headers', b'markdown', b'n3', b'html', b'ulpfec', b'xml', b'rtx', b'richtext', b'rtf', b'cql-expression', b'encaprtp', b'vnd.sun.j2me.app-descriptor', b'xml-external-parsed-entity', b'javascript', b'gff3', b't140', b'vnd.wap.wml', b'vnd.ascii-art', b'fhirpath', b'vnd.wap.si', b'vcard', b'uri-list', b'vnd.zoo.kcl', b'vnd.exchangeable', b'vnd.net2phone.commcenter.command', b'enriched', b'vnd.gml', b'calendar', b'vnd.ms-mediapackage', b'vtt', b'cql-identifier', b'shaclc', b'vnd.wap.wmlscript', b'wgsl', b'vnd.radisys.msml-basic-layout', b'vnd.hans', b'tab-separated-values', b'turtle', b'vnd.hgl', b'parityfec', b'prs.texi', b'vnd.graphviz', b'vnd.esmertec.theme-descriptor', b'dns', b'parameters', b'vnd.dmclientscript', b'vnd.ficlab.flt', b'vnd.iptc.nitf', b'strings', b'vnd.in3d.3dml', b'vnd.fly', b'vnd.trolltech.linguist', b'vnd.senx.warpscript', b'fwdred', b'troff', b'shex', b'css'},
+    b"video": {b'1d-interleaved-parityfec', b'ogg', b'vnd.sealed.swf', b'mp1s', b'raptorfec', b'vnd.iptvforum.1dparityfec-2005', b'vnd.motorola.videop', b'evc', b'vnd.youtube.yt', b'rtploopback', b'vnd.nokia.interleaved-multimedia', b'vp9', b'vnd.directv.mpeg-tts', b'mp2p', b'mp2t', b'raw', b'h263-2000', b'scip', b'pointer', b'vnd.directv.mpeg', b'rtp-enc-aescm128', b'3gpp2', b'example', b'vc2', b'flexfec', b'vnd.dece.mp4', b'vnd.motorola.video', b'smpte292m', b'vnd.dvb.file', b'ulpfec', b'vnd.vivo', b'iso.segment', b'vnd.dlna.mpeg-tts', b'rtx', b'vp8', b'encaprtp', b'3gpp', b'dv', b'av1', b'mj2', b'h265', b'jpeg2000', b'mpeg', b'vnd.sealedmedia.softseal.mov', b'mp4', b'vnd.iptvforum.2dparityfec-2005', b'h263', b'vnd.sealed.mpeg1', b'nv', b'vnd.objectvideo', b'vnd.mpegurl', b'vnd.fvt', b'h266', b'h263-1998', b'vnd.dece.pd', b'vc1', b'vnd.iptvforum.ttsavc', b'vnd.dece.hd', b'vnd.sealed.mpeg4', b'h264-rcdo', b'smpte291', b'vnd.nokia.mp4vr', b'h264-svc', b'vnd.uvvu.mp4', b'3gpp-tt', b'matroska', b'vnd.iptvforum.2dparityfec-1010', b'vnd.radgamettools.smacker', b'ffv1', b'vnd.iptvforum.ttsmpeg2', b'parityfec', b'celb', b'vnd.ms-playready.media.pyv', b'vnd.iptvforum.1dparityfec-1010', b'vnd.radgamettools.bink', b'vnd.dece.video', b'vnd.dece.mobile', b'mpv', b'mpeg4-generic', b'jxsv', b'vnd.dece.sd', b'bmpeg', b'h264', b'jpeg', b'vnd.cctv', b'matroska-3d', b'vnd.hns.video', b'quicktime', b'mp4v-es', b'bt656', b'h261', b'vnd.nokia.videovoip'},
+}
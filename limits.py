@@ -0,0 +1,52 @@
+"""
+Bounds on what a request may hold, so that requests that are going to be rejected anyway are rejected cheaply.
+Each limit is checked as soon as the bytes that break it have been seen, and has its own reason for the rejection.
+"""
+
+from dataclasses import dataclass
+from typing import Final
+
+_MAX_BODY_SIZE: Final[int] = 2**30
+_MAX_PARAMETERS: Final[int] = 100  # Parameters of a Content-Type or Content-Disposition, with continuations counted once
+_MAX_BOUNDARY_LENGTH: Final[int] = 1024  # RFC 2046 caps boundaries at 70 characters; clients don't always listen.
+_MAX_HEADER_FIELDS: Final[int] = 100  # Fields in any one header block
+_MAX_HEADER_BLOCK_BYTES: Final[int] = 2**16  # Bytes of any one header block, the CRLF that ends it included
+_MAX_MULTIPART_DEPTH: Final[int] = 8  # Multipart bodies nested in one another, counting the outermost
+_MAX_MULTIPART_PARTS: Final[int] = 2**14  # Parts at every level of nesting together
+_MAX_MULTIPART_HEADER_BYTES: Final[int] = 2**22  # Bytes of part header blocks at every level of nesting together
+
+
+class LimitExceeded(ValueError):
+    """
+    Raised when a request goes past one of its Limits. The message is the reason the client is given.
+    """
+
+    def __init__(self, reason: str, status: int = 400) -> None:
+        super().__init__(reason, status)
+        self.reason: str = reason
+        self.status: int = status
+
+    def __str__(self) -> str:
+        return self.reason
+
+
+@dataclass(frozen=True)
+class Limits:
+    max_body_size: int = _MAX_BODY_SIZE
+    max_parameters: int = _MAX_PARAMETERS
+    max_boundary_length: int = _MAX_BOUNDARY_LENGTH
+    max_header_fields: int = _MAX_HEADER_FIELDS
+    max_header_block_bytes: int = _MAX_HEADER_BLOCK_BYTES
+    max_multipart_depth: int = _MAX_MULTIPART_DEPTH
+    max_multipart_parts: int = _MAX_MULTIPART_PARTS
+    max_multipart_header_bytes: int = _MAX_MULTIPART_HEADER_BYTES
+
+    def check_body_size(self, size: int) -> None:
+        """
+        Takes as input a body's Content-Length, or the number of bytes of it read so far.
+        """
+        if size > self.max_body_size:
+            raise LimitExceeded("Body too large!", 413)
+
+
+DEFAULT_LIMITS: Final[Limits] = Limits()
@@ -1,8 +1,11 @@
+import functools
 import re
-from typing import Final, TypeGuard
-from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Final, Mapping, TypeGuard
+from dataclasses import dataclass, field
 
-from mime_type import MIME_TOP_LEVEL_TYPES, MIME_SUBTYPES
+from limits import DEFAULT_LIMITS, LimitExceeded, Limits
+from mime_type import is_registered_subtype, is_registered_type
 
 
 # RFC 5234
@@ -21,7 +24,7 @@ _TCHAR_RE: Final[str] = rf"(?:[!#$%&'*+\-.^_`|~]|{_DIGIT_RE}|{_ALPHA_RE})"
 
 # RFC 9110
 # token          = 1*tchar
-_TOKEN_RE: Final[str] = rf"(?:{_TCHAR_RE}+)"
+TOKEN_RE: Final[str] = rf"(?:{_TCHAR_RE}+)"
 
 # RFC 9110
 # qdtext         = HTAB / SP / %x21 / %x23-5B / %x5D-7E / obs-text
@@ -37,23 +40,23 @@ _QUOTED_PAIR_RE: Final[str] = rf"(?:\\(?:[\t ]|{_VCHAR_RE}))"
 
 # RFC 9110
 # quoted-string  = DQUOTE *( qdtext / quoted-pair ) DQUOTE
-_QUOTED_STRING_RE: Final[str] = rf'(?:"(?:{_QDTEXT_RE}|{_QUOTED_PAIR_RE})*")'
+QUOTED_STRING_RE: Final[str] = rf'(?:"(?:{_QDTEXT_RE}|{_QUOTED_PAIR_RE})*")'
 
 # RFC 9110
 # parameter-value = ( token / quoted-string )
-_PARAMETER_VALUE_RE: Final[str] = rf"(?:{_TOKEN_RE}|{_QUOTED_STRING_RE})"
+_PARAMETER_VALUE_RE: Final[str] = rf"(?:{TOKEN_RE}|{QUOTED_STRING_RE})"
 
 # RFC 9110
 #  OWS            = *( SP / HTAB )
-_OWS_RE: Final[str] = r"(?:[ \t]*)"
+OWS_RE: Final[str] = r"(?:[ \t]*)"
 
 # RFC 9110
 #  parameter-name  = token
-_PARAMETER_NAME_RE: Final[str] = _TOKEN_RE
+_PARAMETER_NAME_RE: Final[str] = TOKEN_RE
 
 # RFC 9110 (a little modified)
 # parameter       = parameter-name "=" parameter-value
-_PARAMETER_RE: Final[str] = rf"(?:{_OWS_RE};{_OWS_RE}(?:({_PARAMETER_NAME_RE})=({_PARAMETER_VALUE_RE}))?)"
+_PARAMETER_RE: Final[str] = rf"(?:{OWS_RE};{OWS_RE}(?:({_PARAMETER_NAME_RE})=({_PARAMETER_VALUE_RE}))?)"
 
 # RFC 9110 (a little modified)
 # parameters      = *( OWS ";" OWS [ parameter ] )
@@ -61,11 +64,11 @@ _PARAMETERS_RE: Final[str] = rf"(?:(?:{_PARAMETER_RE})*)"
 
 # RFC 9110
 # type       = token
-_TYPE_RE: Final[str] = _TOKEN_RE
+_TYPE_RE: Final[str] = TOKEN_RE
 
 # RFC 9110
 # subtype    = token
-_SUBTYPE_RE: Final[str] = _TOKEN_RE
+_SUBTYPE_RE: Final[str] = TOKEN_RE
 
 # RFC 9110
 # media-type = type "/" subtype parameters
@@ -73,8 +76,39 @@ _MEDIA_TYPE_RE: Final[str] = (
     rf"(?:(?P<type>{_TYPE_RE})/(?P<subtype>{_SUBTYPE_RE})(?P<parameters>{_PARAMETERS_RE}))"
 )
 
-_PARAMETER_PAT: Final[re.Pattern[bytes]] = re.compile(_PARAMETER_RE.encode("ascii"))
-_MEDIA_TYPE_PAT: Final[re.Pattern[bytes]] = re.compile(_MEDIA_TYPE_RE.encode("ascii"))
+# Matching all of a media type against _MEDIA_TYPE_RE can take exponential time with Python's backtracking engine,
+# because the OWS on either side of each ";" can split the spaces between them any which way: it takes seconds to
+# reject "a/b" followed by a few dozen "; " and a stray byte. So it's only documentation. The scanners below step
+# through the same language a parameter at a time instead, with patterns that can only match a string one way, so
+# that a failed match gives back each byte at most once.
+
+# RFC 9110
+# quoted-string, unrolled so that qdtext and quoted-pair never compete for a byte (which also makes it faster)
+QUOTED_STRING_UNROLLED_RE: Final[str] = rf'(?:"{_QDTEXT_RE}*(?:{_QUOTED_PAIR_RE}{_QDTEXT_RE}*)*")'
+
+_TYPE_SUBTYPE_PAT: Final[re.Pattern[bytes]] = re.compile(rf"{_TYPE_RE}/{_SUBTYPE_RE}".encode("ascii"))
+_PARAMETER_PAT: Final[re.Pattern[bytes]] = re.compile(
+    rf"{OWS_RE};{OWS_RE}(?:({_PARAMETER_NAME_RE})=({TOKEN_RE}|{QUOTED_STRING_UNROLLED_RE}))?".encode("ascii")
+)
+
+
+def _scan_parameters(data: bytes, pos: int, end: int) -> int:
+    """
+    Returns the index just past the parameters at the start of data[pos:end], as _PARAMETERS_RE would match them.
+    """
+    while (m := _PARAMETER_PAT.match(data, pos, end)) is not None:
+        pos = m.end()
+    return pos
+
+
+def _match_media_type(data: bytes) -> int | None:
+    """
+    Matches all of data against _MEDIA_TYPE_RE. Returns the index just past the subtype, or None if it doesn't match.
+    """
+    m: re.Match[bytes] | None = _TYPE_SUBTYPE_PAT.match(data)
+    if m is None or _scan_parameters(data, m.end(), len(data)) != len(data):
+        return None
+    return m.end()
 
 
 def is_bytes_list(l: list) -> TypeGuard[list[bytes]]:
@@ -83,41 +117,72 @@ def is_bytes_list(l: list) -> TypeGuard[list[bytes]]:
 
 _MAX_CONTINUATION_INDEX: Final[int] = 100  # Picked arbitrarily. Feel free to increase if necessary.
 
+_CONTINUATION_KEY_PAT: Final[re.Pattern[bytes]] = re.compile(rb"(?P<key>.*)\*(?P<index>\d+)")
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class MediaType:
+    """
+    Immutable, so that parse_media_type can hand the same one to every caller that parses the same value.
+    """
+
     type_: bytes
     subtype: bytes
-    parameters: dict[bytes, bytes]
+    parameters: Mapping[bytes, bytes]
+    # The serialized form with every parameter but the boundary dropped, which is what requests are forwarded with
+    boundary_only: bytes = field(init=False, repr=False, compare=False)
 
-    def __post_init__(self):
-        if self.type_ not in MIME_TOP_LEVEL_TYPES:
+    def __post_init__(self) -> None:
+        if not is_registered_type(self.type_):
             raise ValueError("Unrecognized MIME type.")
-        if self.subtype not in MIME_SUBTYPES[self.type_]:
+        if not is_registered_subtype(self.type_, self.subtype):
             raise ValueError("Unrecognized MIME subtype.")
+        # A read-only copy, so that the dict passed in can't change it afterwards
+        object.__setattr__(self, "parameters", MappingProxyType(dict(self.parameters)))
+        boundary: bytes | None = self.parameters.get(b"boundary")
+        object.__setattr__(self, "boundary_only", self.type_ + b"/" + self.subtype + (b"" if boundary is None else b"; boundary=" + boundary))
+
+    def __hash__(self) -> int:
+        # Equal mappings can list their parameters in different orders, so the hash can't depend on it.
+        return hash((self.type_, self.subtype, frozenset(self.parameters.items())))
+
+    def __reduce__(self) -> tuple[type["MediaType"], tuple[bytes, bytes, dict[bytes, bytes]]]:
+        # Read-only mappings can't be pickled, so a MediaType is rebuilt from a plain dict.
+        return MediaType, (self.type_, self.subtype, dict(self.parameters))
 
     def serialize(self) -> bytes:
         return self.type_ + b"/" + self.subtype + b"".join(b"; " + k + b"=" + v for k, v in self.parameters.items())
 
 
-def parse_media_type_parameters(data: bytes) -> dict[bytes, bytes]:
-    raw_params: list[tuple[bytes, bytes]] = []
-    while len(data) > 0:
-        m = re.match(_PARAMETER_PAT, data)
-        assert m is not None
-        raw_params.append((m[1], m[2]))
-        data = data[m.end() :]
-
+def parse_media_type_parameters(data: bytes, start: int = 0, end: int | None = None, limits: Limits = DEFAULT_LIMITS) -> dict[bytes, bytes]:
+    """
+    Parses the parameters in data[start:end], without copying the rest of the buffer at each step.
+    Parameters are counted against the limit as they are parsed, with the pieces of a continued one counted once.
+    """
+    if end is None:
+        end = len(data)
     # Parse RFC 2231-style continuations in parameters.
     params_with_continuation: dict[bytes, list[bytes | None] | bytes] = {}
-    for raw_key, raw_value in raw_params:
+    pos: int = start
+    while pos < end:
+        m: re.Match[bytes] | None = _PARAMETER_PAT.match(data, pos, end)
+        if m is None:
+            raise ValueError("Invalid parameters!")
+        pos = m.end()
+        # The grammar allows empty parameters (e.g. "a/b;;c=d"), so skip over them.
+        if m[1] is None:
+            continue
+        raw_key: bytes = m[1]
+        raw_value: bytes = m[2]
         if raw_value.startswith(b'"') and raw_value.endswith(b'"'):
             raw_value = raw_value[1:-1]
         # Note: RFC 2231 requires that the first digit be nonzero. We relax this on the input side, but not on the output side.
-        m = re.fullmatch(rb"\A(?P<key>.*)\*(?P<index>\d+)\Z", raw_key)
-        if m is not None:
-            key: bytes = m["key"]
-            index: int = int(m["index"])
+        continuation_m: re.Match[bytes] | None = _CONTINUATION_KEY_PAT.fullmatch(raw_key)
+        key: bytes = raw_key if continuation_m is None else continuation_m["key"]
+        if key not in params_with_continuation and len(params_with_continuation) >= limits.max_parameters:
+            raise LimitExceeded("Too many Content-Type parameters!")
+        if continuation_m is not None:
+            index: int = int(continuation_m["index"])
 
             if key not in params_with_continuation:
                 params_with_continuation[key] = []
@@ -150,22 +215,51 @@ def parse_media_type_parameters(data: bytes) -> dict[bytes, bytes]:
     return params
 
 
-def parse_media_type(media_type: bytes) -> MediaType:
+def _parse_media_type(media_type: bytes, limits: Limits) -> MediaType:
+    subtype_end: int | None = _match_media_type(media_type)
+    if subtype_end is None:
+        raise ValueError("Media type does not parse!")
+
+    # Case-insensitivity specified in RFC 9110 8.3.1
+    type_: bytes
+    subtype: bytes
+    type_, subtype = media_type[:subtype_end].lower().split(b"/")
+
+    parameters: dict[bytes, bytes] = parse_media_type_parameters(media_type, subtype_end, len(media_type), limits)
+    if len(parameters.get(b"boundary", b"")) > limits.max_boundary_length:
+        raise LimitExceeded("Boundary too long!")
+    return MediaType(type_, subtype, parameters)
+
+
+# A handful of Content-Type values make up most traffic, so parses are cached by value. Longer values are rare, and
+# would let a few requests pin a lot of memory, so they're parsed every time. Values that are rejected aren't cached.
+_MEDIA_TYPE_CACHE_SIZE: Final[int] = 1024
+_MEDIA_TYPE_CACHE_MAX_LENGTH: Final[int] = 1024
+
+_parse_media_type_cached: "functools._lru_cache_wrapper[MediaType]" = functools.lru_cache(maxsize=_MEDIA_TYPE_CACHE_SIZE)(_parse_media_type)
+
+
+def parse_media_type(media_type: bytes, limits: Limits = DEFAULT_LIMITS) -> MediaType:
     """
     Takes as input the value of a Content-Type header.
     Spits out the type, subtype, and a list of key:value pairs corresponding to the parameters.
+    Parsing a value that was parsed recently, with the same limits, just returns the same MediaType again.
     """
+    if len(media_type) > _MEDIA_TYPE_CACHE_MAX_LENGTH:
+        return _parse_media_type(media_type, limits)
+    return _parse_media_type_cached(media_type, limits)
 
-    m: re.Match[bytes] | None = re.fullmatch(_MEDIA_TYPE_PAT, media_type)
-    if m is None:
-        raise ValueError("Media type does not parse!")
 
-    # Case-insensitivity specified in RFC 9110 8.3.1
-    type_: bytes = m["type"].lower()
-    subtype: bytes = m["subtype"].lower()
-    parameter_bytes: bytes = m["parameters"]
+def set_media_type_cache_size(size: int) -> None:
+    """
+    Replaces the cache of parsed media types with an empty one that holds at most size of them (0 turns caching off).
+    """
+    global _parse_media_type_cached
+    _parse_media_type_cached = functools.lru_cache(maxsize=size)(_parse_media_type)
 
-    return MediaType(type_, subtype, parse_media_type_parameters(parameter_bytes))
+
+def media_type_cache_info() -> "functools._CacheInfo":
+    return _parse_media_type_cached.cache_info()
 
 # RFC 5234
 # CRLF        =  %d13.10
@@ -186,89 +280,169 @@ _FIELD_VALUE_RE: Final[str] = rf"(?:{_FIELD_CONTENT_RE}*)"
 
 # RFC 9110
 # field-name     = token
-_FIELD_NAME_RE: Final[str] = _TOKEN_RE
+_FIELD_NAME_RE: Final[str] = TOKEN_RE
 
 # RFC 9112
 # field-line   = field-name ":" OWS field-value OWS
-_FIELD_LINE_RE: Final[str] = rf"(?:(?P<name>{_FIELD_NAME_RE}):{_OWS_RE}(?P<value>{_FIELD_VALUE_RE}){_OWS_RE})"
+_FIELD_LINE_RE: Final[str] = rf"(?:(?P<name>{_FIELD_NAME_RE}):{OWS_RE}(?P<value>{_FIELD_VALUE_RE}){OWS_RE})"
+
+# As with media types, _FIELD_LINE_RE nests quantifiers, so it's only documentation. A field-value is the longest run of
+# field-vchars, spaces and tabs that ends in a field-vchar, so it and the OWS after it are together just the longest run
+# of those characters, which this pattern matches with no backtracking; parse_header strips the OWS back off.
+_FIELD_LINE_PAT: Final[re.Pattern[bytes]] = re.compile(rf"({_FIELD_NAME_RE}):{OWS_RE}((?:[ \t]|{_FIELD_VCHAR_RE})*)".encode("ascii"))
 
-_FIELD_LINE_PAT: re.Pattern[bytes] = re.compile(_FIELD_LINE_RE.encode("ascii"))
 
-def parse_header(data: bytes) -> tuple[tuple[bytes, bytes], bytes]:
+def parse_header(data: bytes, pos: int = 0, end: int | None = None) -> tuple[tuple[bytes, bytes], int]:
     """
-    Takes as input a byte string that begins with an HTTP header.
-    Parses the header, and returns the remaining data.
+    Takes as input a buffer in which data[pos:end] begins with an HTTP header.
+    Parses the header, and returns the index just past it.
     """
-    m: re.Match[bytes] | None = re.match(_FIELD_LINE_PAT, data)
+    if end is None:
+        end = len(data)
+    m: re.Match[bytes] | None = _FIELD_LINE_PAT.match(data, pos, end)
     if m is None:
         raise ValueError("Invalid header!")
-    return (m["name"], m["value"]), data[m.end():]
+    return (m[1], m[2].rstrip(b" \t")), m.end()
 
 
-def parse_headers(data: bytes) -> tuple[dict[bytes, bytes], bytes]:
+def parse_headers(
+    data: bytes,
+    pos: int = 0,
+    end: int | None = None,
+    lowercase_values: bool = True,
+    limits: Limits = DEFAULT_LIMITS,
+) -> tuple[dict[bytes, bytes], int]:
+    """
+    Takes as input a buffer in which data[pos:end] begins with a header block.
+    Parses the headers, and returns the index just past the CRLF that ends them.
+    Names are always lowercased; pass lowercase_values=False to keep values (e.g. boundaries) as they are.
+    """
+    if end is None:
+        end = len(data)
+    start: int = pos
     headers: dict[bytes, bytes] = {}
     while True:
         try:
-            (key, value), data = parse_header(data)
+            (key, value), pos = parse_header(data, pos, end)
         except ValueError:
             break
         key = key.lower()
-        value = value.lower()
+        if lowercase_values:
+            value = value.lower()
         if key in headers:
             raise ValueError("Duplicate header!")
+        if len(headers) >= limits.max_header_fields:
+            raise LimitExceeded("Too many header fields!")
         headers[key] = value
-        if len(data) < 2 or data[:2] != b"\r\n":
+        if not data.startswith(b"\r\n", pos, end):
             raise ValueError("Header missing CRLF!")
-        data = data[2:]
-    if len(data) < 2 or data[:2] != b"\r\n":
+        pos += len(b"\r\n")
+        if pos - start > limits.max_header_block_bytes:
+            raise LimitExceeded("Header block too large!")
+    if not data.startswith(b"\r\n", pos, end):
         raise ValueError("Missing CRLF after headers!")
-    return headers, data[2:]
+    pos += len(b"\r\n")
+    if pos - start > limits.max_header_block_bytes:
+        raise LimitExceeded("Header block too large!")
+    return headers, pos
+
+
+# Multipart subtypes that get normalized. Outside of multipart/form-data, parts follow the generic rules of RFC 2046.
+MULTIPART_SUBTYPES: Final[tuple[bytes, ...]] = (b"form-data", b"mixed", b"related", b"alternative", b"byteranges")
+
+# Content-Disposition types allowed in parts of multipart/form-data (RFC 7578), and of the other subtypes (RFC 2183)
+_FORM_DATA_DISPOSITION_TYPES: Final[tuple[bytes, ...]] = (b"form-data",)
+_MIME_DISPOSITION_TYPES: Final[tuple[bytes, ...]] = (b"inline", b"attachment")
+
+# RFC 2045 (with msg-id loosened to any visible characters between the angle brackets)
+# id := "Content-ID" ":" msg-id
+_CONTENT_ID_PAT: Final[re.Pattern[bytes]] = re.compile(rb"<[\x21-\x3b\x3d\x3f-\x7e]+>")
+
+# RFC 9110 (parts of multipart/byteranges always carry a range-resp)
+# Content-Range = range-unit SP ( range-resp / unsatisfied-range )
+# range-resp    = incl-range "/" ( complete-length / "*" )
+# incl-range    = first-pos "-" last-pos
+_CONTENT_RANGE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"bytes ([0-9]+)-([0-9]+)/([0-9]+|\*)")
+
+# RFC 2045 (without ietf-token and x-token, since nothing downstream would know what to do with them)
+# mechanism := "7bit" / "8bit" / "binary" / "quoted-printable" / "base64"
+_CONTENT_TRANSFER_ENCODINGS: Final[tuple[bytes, ...]] = (b"7bit", b"8bit", b"binary", b"quoted-printable", b"base64")
 
 
 @dataclass
 class MultipartContentDisposition:
     name: bytes | None = None
     filename: bytes | None = None
+    type_: bytes = b"form-data"
 
     def serialize(self) -> bytes:
-        result: bytes = b'form-data'
+        result: bytes = self.type_
         if self.name is not None:
             result += b'; name="' + self.name + b'"'
         if self.filename is not None:
             result += b'; filename="' + self.filename + b'"'
         return result
 
-def parse_multipart_content_disposition(data: bytes) -> MultipartContentDisposition:
-    if not data.startswith(b"form-data"):
+def parse_multipart_content_disposition(
+    data: bytes,
+    types: tuple[bytes, ...] = _FORM_DATA_DISPOSITION_TYPES,
+    limits: Limits = DEFAULT_LIMITS,
+) -> MultipartContentDisposition:
+    for type_ in types:
+        if data.startswith(type_):
+            break
+    else:
         raise ValueError("Unrecognized Content-Disposition!")
-    data = data[len(b"form-data"):]
 
-    params: dict[bytes, bytes] = parse_media_type_parameters(data)
+    params: dict[bytes, bytes] = parse_media_type_parameters(data, len(type_), len(data), limits)
     name: bytes | None = params.get(b"name")
     filename: bytes | None = params.get(b"filename")
-    return MultipartContentDisposition(name, filename)
+    return MultipartContentDisposition(name, filename, type_)
 
         
 
 @dataclass
 class MultipartSubpart:
     boundary: bytes
-    content_disposition: MultipartContentDisposition
+    content_disposition: MultipartContentDisposition | None  # Only optional outside of multipart/form-data
     content_type: MediaType
-    data: bytes
+    data: bytes | memoryview  # parse_multipart_body hands out views into the body, so part data is never copied.
+    # These are only kept outside of multipart/form-data.
+    content_id: bytes | None = None
+    content_range: bytes | None = None
+    content_transfer_encoding: bytes | None = None
 
     def __post_init__(self):
-        if b"\r\n--" + self.boundary in self.data:
+        # Views only come from parse_multipart_body, which cuts data at delimiters, so they're already known to be clean.
+        if isinstance(self.data, bytes) and b"\r\n--" + self.boundary in self.data:
             raise ValueError(f"Boundary present in multipart data: {self.data!r}")
 
+    def serialize_header_pieces(self) -> list[bytes | memoryview]:
+        """
+        Returns the pieces of the serialized subpart up to its data.
+        """
+        pieces: list[bytes | memoryview] = [b"--", self.boundary, b"\r\nContent-Type: ", self.content_type.serialize()]
+        if self.content_disposition is not None:
+            pieces += [b"\r\nContent-Disposition: ", self.content_disposition.serialize()]
+        if self.content_id is not None:
+            pieces += [b"\r\nContent-ID: ", self.content_id]
+        if self.content_range is not None:
+            pieces += [b"\r\nContent-Range: ", self.content_range]
+        if self.content_transfer_encoding is not None:
+            pieces += [b"\r\nContent-Transfer-Encoding: ", self.content_transfer_encoding]
+        pieces.append(b"\r\n\r\n")
+        return pieces
+
+    def serialize_pieces(self) -> list[bytes | memoryview]:
+        """
+        Returns the pieces of the serialized subpart, so that callers can join many subparts in one go.
+        """
+        pieces: list[bytes | memoryview] = self.serialize_header_pieces()
+        pieces.append(self.data)
+        return pieces
+
     def serialize(self) -> bytes:
-        result: bytes = b""
-        result += b"--" + self.boundary + b"\r\n"
-        result += b"Content-Type: " + self.content_type.serialize() + b"\r\n"
-        result += b"Content-Disposition: " + self.content_disposition.serialize() + b"\r\n"
-        result += b"\r\n"
-        result += self.data
-        return result
+        return b"".join(self.serialize_pieces())
 
 # RFC 5322
 # text            =   %d1-9 /            ; Characters excluding CR
@@ -302,81 +476,739 @@ _OCTET_RE: Final[str] = rf"[\x00-\xff]"
 _EPILOGUE_RE: Final[str] = _DISCARD_TEXT_RE
 
 
-def make_dash_boundary_re(boundary: str) -> str:
-    # RFC 2046
-    # dash-boundary := "--" boundary
-    return rf"(?:--{boundary})"
-
-def make_multipart_body_prefix_re(boundary: str) -> str:
-    dash_boundary_re: str = make_dash_boundary_re(boundary)
-
-    # RFC 2046
-    # multipart-body := [preamble CRLF]
-    #                   dash-boundary transport-padding CRLF
-    #                   body-part *encapsulation
-    #                   close-delimiter transport-padding
-    #                   [CRLF epilogue]
-    return rf"(?:(?:{_PREAMBLE_RE}{_CRLF_RE})?{dash_boundary_re}{_TRANSPORT_PADDING_RE}{_CRLF_RE})"
+_TEXT_PAT: Final[re.Pattern[bytes]] = re.compile(rf"{_TEXT_RE}*".encode("ascii"))
+_TRANSPORT_PADDING_PAT: Final[re.Pattern[bytes]] = re.compile(_TRANSPORT_PADDING_RE.encode("ascii"))
 
-def make_multipart_body_suffix_re(boundary: str) -> str:
-    dash_boundary_re: str = make_dash_boundary_re(boundary)
+_BOUNDARY_MATCHER_CACHE_SIZE: Final[int] = 256  # Browsers pick a fresh boundary per request, so this mostly helps replays and retries.
 
-    # RFC 2046
-    # delimiter := CRLF dash-boundary
-    delimiter_re: str = rf"(?:{_CRLF_RE}{dash_boundary_re})"
 
-    # RFC 2046
-    # close-delimiter := delimiter "--"
-    close_delimiter_re: str = rf"(?:{delimiter_re}--)"
-
-    # RFC 2046
-    # multipart-body := [preamble CRLF]
-    #                   dash-boundary transport-padding CRLF
-    #                   body-part *encapsulation
-    #                   close-delimiter transport-padding
-    #                   [CRLF epilogue]
-    return rf"(?:{close_delimiter_re}{_TRANSPORT_PADDING_RE}(?:{_CRLF_RE}{_EPILOGUE_RE}))"
-
-def parse_multipart_subpart(boundary: str, data: bytes) -> MultipartSubpart:
-    headers, data = parse_headers(data)
+class BoundaryMatcher:
+    """
+    Finds the pieces of a multipart body that depend on its boundary, using plain byte comparisons.
+    The boundary is never interpolated into a regex, so it may contain any characters.
+    """
 
-    if b"content-disposition" not in headers:
+    def __init__(self, boundary: str) -> None:
+        self.boundary: bytes = boundary.encode("ascii")
+        # RFC 2046
+        # dash-boundary := "--" boundary
+        self.dash_boundary: bytes = b"--" + self.boundary
+        # RFC 2046
+        # delimiter := CRLF dash-boundary
+        self.delimiter: bytes = b"\r\n" + self.dash_boundary
+        # RFC 2046
+        # close-delimiter := delimiter "--"
+        self.close_delimiter: bytes = self.delimiter + b"--"
+
+    def is_dash_boundary_line(self, line: bytes) -> bool:
+        """
+        Checks whether a line (without its CRLF) is `dash-boundary transport-padding`.
+        """
+        return line.startswith(self.dash_boundary) and _TRANSPORT_PADDING_PAT.fullmatch(line, len(self.dash_boundary)) is not None
+
+    def match_prefix(self, data: bytes) -> int:
+        """
+        Matches the part of a multipart body that comes before the first body part.
+        Returns the index just past it.
+        """
+        # RFC 2046
+        # multipart-body := [preamble CRLF]
+        #                   dash-boundary transport-padding CRLF
+        #                   body-part *encapsulation
+        #                   close-delimiter transport-padding
+        #                   [CRLF epilogue]
+        # Note: The first dash-boundary line that can start the body does, so a preamble never swallows body parts.
+        #       This means a dash-boundary line starts the body if it is the first line, or if it follows an empty line.
+        pos: int = 0
+        is_candidate: bool = True
+        while True:
+            end: int = data.find(b"\r\n", pos)
+            if end == -1:
+                raise ValueError("Couldn't parse multipart body prefix!")
+            if is_candidate and self.is_dash_boundary_line(data[pos:end]):
+                return end + len(b"\r\n")
+            if _TEXT_PAT.fullmatch(data, pos, end) is None:
+                raise ValueError("Couldn't parse multipart body prefix!")
+            is_candidate = end == pos
+            pos = end + len(b"\r\n")
+
+    def find_delimiter(self, data: bytes, start: int = 0) -> int:
+        """
+        Returns the index of the first delimiter in data at or after start, or -1 if there isn't one.
+        """
+        return data.find(self.delimiter, start)
+
+
+@functools.lru_cache(maxsize=_BOUNDARY_MATCHER_CACHE_SIZE)
+def get_boundary_matcher(boundary: str) -> BoundaryMatcher:
+    return BoundaryMatcher(boundary)
+
+
+def parse_multipart_subpart(
+    boundary: str,
+    data: bytes,
+    start: int = 0,
+    end: int | None = None,
+    subtype: bytes = b"form-data",
+    limits: Limits = DEFAULT_LIMITS,
+) -> MultipartSubpart:
+    """
+    Parses the subpart in data[start:end] of a multipart body with the given subtype. Its data is a view into the buffer.
+    If the subpart is a multipart body itself, its Content-Type keeps just the boundary, exactly as it was.
+    """
+    if end is None:
+        end = len(data)
+    # Values are lowercased here rather than in parse_headers, since a nested boundary has to keep its case.
+    headers, data_start = parse_headers(data, start, end, lowercase_values=False, limits=limits)
+
+    content_disposition: MultipartContentDisposition | None = None
+    if b"content-disposition" in headers:
+        types: tuple[bytes, ...] = _FORM_DATA_DISPOSITION_TYPES if subtype == b"form-data" else _MIME_DISPOSITION_TYPES
+        content_disposition = parse_multipart_content_disposition(headers[b"content-disposition"].lower(), types, limits)
+    elif subtype == b"form-data":
         raise ValueError("Chunk is missing Content-Disposition!")
-    content_disposition: MultipartContentDisposition = parse_multipart_content_disposition(headers[b"content-disposition"])
 
     content_type: MediaType
     if b"content-type" in headers:
-        content_type = parse_media_type(headers[b"content-type"])
+        content_type = parse_media_type(headers[b"content-type"].lower(), limits)
+        if content_type.type_ == b"multipart":
+            raw_boundary: bytes | None = parse_media_type(headers[b"content-type"], limits).parameters.get(b"boundary")
+            if raw_boundary is None:
+                raise ValueError("Missing boundary parameter!")
+            content_type = MediaType(content_type.type_, content_type.subtype, {b"boundary": raw_boundary})
     else:
-        content_type = MediaType(b"text", b"plain", {})
-
-    return MultipartSubpart(boundary.encode("ascii"), content_disposition, content_type, data)
-
-
-def parse_multipart_body(boundary: str, data: bytes) -> list[MultipartSubpart]:
+        content_type = parse_media_type(b"text/plain", limits)
+
+    subpart: MultipartSubpart = MultipartSubpart(boundary.encode("ascii"), content_disposition, content_type, memoryview(data)[data_start:end])
+    if subtype == b"form-data":
+        return subpart
+
+    if b"content-id" in headers:
+        if _CONTENT_ID_PAT.fullmatch(headers[b"content-id"]) is None:
+            raise ValueError("Malformed Content-ID!")
+        subpart.content_id = headers[b"content-id"]
+    if subtype == b"byteranges":
+        if b"content-range" not in headers:
+            raise ValueError("Chunk is missing Content-Range!")
+        m: re.Match[bytes] | None = _CONTENT_RANGE_PAT.fullmatch(headers[b"content-range"].lower())
+        if m is None or int(m[1]) > int(m[2]) or (m[3] != b"*" and int(m[2]) >= int(m[3])):
+            raise ValueError("Malformed Content-Range!")
+        subpart.content_range = b"bytes %d-%d/%s" % (int(m[1]), int(m[2]), m[3] if m[3] == b"*" else b"%d" % int(m[3]))
+    if b"content-transfer-encoding" in headers:
+        content_transfer_encoding: bytes = headers[b"content-transfer-encoding"].lower()
+        if content_transfer_encoding not in _CONTENT_TRANSFER_ENCODINGS:
+            raise ValueError("Unrecognized Content-Transfer-Encoding!")
+        subpart.content_transfer_encoding = content_transfer_encoding
+    return subpart
+
+
+def parse_multipart_body(boundary: str, data: bytes, subtype: bytes = b"form-data", limits: Limits = DEFAULT_LIMITS) -> list[MultipartSubpart]:
     """
     Parses a multipart body. Returns the pieces of the multipart message, and the remaining unparsed bytes.
+    Parts that are multipart bodies themselves are left as they are.
     """
-    prefix_re: bytes = make_multipart_body_prefix_re(boundary).encode("ascii")
-    m: re.Match[bytes] | None = re.match(prefix_re, data)
-    
-    if m is None:
-        raise ValueError("Couldn't parse multipart body prefix!")
-    data = data[m.end():]
-    
-    raw_subparts: list[bytes] = data.split(b"\r\n--" + boundary.encode("ascii"))
-    raw_subparts[0] = b"\r\n" + raw_subparts[0] # First chunk won't have CRLF prefix, so add one on
+    matcher: BoundaryMatcher = get_boundary_matcher(boundary)
     result: list[MultipartSubpart] = []
-    for subpart in raw_subparts:
-        if subpart in (b"--", b"--\r\n"):
+    # The first subpart won't have a CRLF prefix, so it starts right after the prefix.
+    start: int = matcher.match_prefix(data)
+    end: int = matcher.find_delimiter(data, start)
+    while True:
+        if end == -1:
+            end = len(data)
+        subpart: MultipartSubpart = parse_multipart_subpart(boundary, data, start, end, subtype, limits)
+        if len(result) >= limits.max_multipart_parts:
+            raise LimitExceeded("Too many parts in multipart body!")
+        result.append(subpart)
+        if end == len(data):
+            break
+
+        start = end + len(matcher.delimiter)
+        end = matcher.find_delimiter(data, start)
+        subpart_end: int = len(data) if end == -1 else end
+        # The close delimiter is only recognized when the whole subpart is "--" or "--\r\n".
+        if data[start:min(subpart_end, start + len(b"--\r\n") + 1)] in (b"--", b"--\r\n"):
             break
-        if not subpart.startswith(b"\r\n"):
-            raise ValueError(f"Missing CRLF in {subpart!r}!")
-        subpart = subpart[len(b"\r\n"):]
-        result.append(parse_multipart_subpart(boundary, subpart))
+        if not data.startswith(b"\r\n", start, subpart_end):
+            raise ValueError(f"Missing CRLF in {data[start:min(subpart_end, start + len(matcher.delimiter))]!r}!")
+        start += len(b"\r\n")
 
     return result
 
 
-def normalize_multipart_body(boundary: str, data: bytes) -> bytes:
-    return b"\r\n".join(map(MultipartSubpart.serialize, parse_multipart_body(boundary, data))) + b"\r\n--" + boundary.encode("ascii") + b"--"
+# What parse_multipart_subpart and MultipartSubpart.serialize_header_pieces turn a part's headers into, in
+# multipart/form-data, when they'd come out the same after being parsed again: header values come out lowercased, so
+# these only match lowercase. A Content-Type parameter name with a "*" could be an RFC 2231 continuation, and only one
+# parameter is allowed so that there's no need to check for duplicates; either way, parts like that take the rewrite.
+_LOWERCASE_TCHAR_RE: Final[str] = r"[!#$%&'*+\-.^_`|~0-9a-z]"
+_LOWERCASE_TOKEN_RE: Final[str] = rf"(?:{_LOWERCASE_TCHAR_RE}+)"
+_LOWERCASE_PARAMETER_NAME_RE: Final[str] = r"(?:[!#$%&'+\-.^_`|~0-9a-z]+)"
+_LOWERCASE_QDTEXT_RE: Final[str] = r"[\t \x21\x23-\x40\x5b\x5d-\x7e]"
+_LOWERCASE_QUOTED_PAIR_RE: Final[str] = r"(?:\\[\t \x21-\x40\x5b-\x7e])"
+_LOWERCASE_QUOTED_STRING_RE: Final[str] = rf'(?:"{_LOWERCASE_QDTEXT_RE}*(?:{_LOWERCASE_QUOTED_PAIR_RE}{_LOWERCASE_QDTEXT_RE}*)*")'
+_CANONICAL_FORM_DATA_HEADERS_PAT: Final[re.Pattern[bytes]] = re.compile(
+    (
+        rf"\r\nContent-Type: (?P<type>{_LOWERCASE_TOKEN_RE})/(?P<subtype>{_LOWERCASE_TOKEN_RE})"
+        rf"(?:; (?P<parameter>{_LOWERCASE_PARAMETER_NAME_RE})=(?P<value>{_LOWERCASE_TOKEN_RE}))?"
+        rf"\r\nContent-Disposition: form-data(?:; name=(?P<name>{_LOWERCASE_QUOTED_STRING_RE}))?(?:; filename=(?P<filename>{_LOWERCASE_QUOTED_STRING_RE}))?"
+        r"\r\n\r\n"
+    ).encode("ascii")
+)
+
+
+def is_canonical_multipart_body(boundary: str, data: bytes, subtype: bytes = b"form-data", limits: Limits = DEFAULT_LIMITS) -> bool:
+    """
+    Checks, in one pass over the bytes as they are, whether normalize_multipart_body would give back data unchanged.
+    Each part's header block is matched in place, and nothing is parsed or built, so no part or media type is allocated.
+    Only multipart/form-data bodies whose parts have no Content-Type parameters beyond one plain token pass; a False
+    just means the body takes the full rewrite. Bodies with nested multipart parts, and bodies that would be rejected,
+    are never canonical.
+    """
+    if subtype != b"form-data" or limits.max_header_fields < 2:
+        return False
+    matcher: BoundaryMatcher = get_boundary_matcher(boundary)
+    # A canonical body has no preamble, transport padding, or epilogue, so it's parts and delimiters all the way through.
+    if not data.startswith(matcher.dash_boundary):
+        return False
+    pos: int = len(matcher.dash_boundary)  # Where the current part's header block starts, CRLF first
+    part_count: int = 0
+    data_bytes: int = 0
+    while True:
+        m: re.Match[bytes] | None = _CANONICAL_FORM_DATA_HEADERS_PAT.match(data, pos)
+        if m is None or m.end() - pos - len(b"\r\n") > limits.max_header_block_bytes:
+            return False
+        part_count += 1
+        if part_count > limits.max_multipart_parts:
+            return False
+        type_: bytes = m["type"]
+        if type_ == b"multipart" or not is_registered_type(type_) or not is_registered_subtype(type_, m["subtype"]):
+            return False
+        if m["parameter"] is not None and (
+            limits.max_parameters < 1 or (m["parameter"] == b"boundary" and len(m["value"]) > limits.max_boundary_length)
+        ):
+            return False
+        if (m.start("name") != -1) + (m.start("filename") != -1) > limits.max_parameters:
+            return False
+        # Matching headers hold no delimiter, except one that starts at their final CRLF.
+        end: int = matcher.find_delimiter(data, m.end() - len(b"\r\n"))
+        if end < m.end():
+            return False
+        data_bytes += end - m.end()
+        if data.startswith(matcher.close_delimiter, end):
+            return end + len(matcher.close_delimiter) == len(data) and len(data) - data_bytes <= limits.max_multipart_header_bytes
+        pos = end + len(matcher.delimiter)
+
+
+# Every part parsed copies the rest of the normalizer's buffer, so whole bodies are fed to it a chunk at a time.
+_NORMALIZE_CHUNK_SIZE: Final[int] = 2**16
+
+
+def normalize_multipart_body(
+    boundary: str,
+    data: bytes,
+    subtype: bytes = b"form-data",
+    limits: Limits = DEFAULT_LIMITS,
+) -> bytes:
+    """
+    Normalizes a multipart body, and any parts of it that are multipart bodies themselves.
+    Preambles, epilogues, and transport padding are dropped, and each part's headers are re-serialized in a fixed order.
+    A body that's canonical already is returned as it is.
+    """
+    if subtype not in MULTIPART_SUBTYPES:
+        raise ValueError("Unsupported multipart subtype!")
+    if is_canonical_multipart_body(boundary, data, subtype, limits):
+        return data
+    # Most bodies have no nested parts, and those can be put back together straight from the flat parse.
+    # Everything that isn't part data counts against the header limit here, so that a body passing it surely fits.
+    subparts: list[MultipartSubpart] = parse_multipart_body(boundary, data, subtype, limits)
+    if (
+        len(data) - sum(len(subpart.data) for subpart in subparts) <= limits.max_multipart_header_bytes
+        and all(subpart.content_type.type_ != b"multipart" for subpart in subparts)
+    ):
+        flat_pieces: list[bytes | memoryview] = []
+        for subpart in subparts:
+            if len(flat_pieces) > 0:
+                flat_pieces.append(b"\r\n")
+            flat_pieces.extend(subpart.serialize_pieces())
+        flat_pieces.append(get_boundary_matcher(boundary).close_delimiter)
+        return b"".join(flat_pieces)
+
+    normalizer: MultipartBodyNormalizer = MultipartBodyNormalizer(boundary, subtype, limits)
+    # Output pieces can be views into the normalizer's buffer, so they're joined as they come to let each buffer go.
+    pieces: list[bytes] = []
+    for start in range(0, len(data), _NORMALIZE_CHUNK_SIZE):
+        pieces.append(b"".join(normalizer.feed(data[start : start + _NORMALIZE_CHUNK_SIZE])))
+    pieces.append(b"".join(normalizer.finish()))
+    return b"".join(pieces)
+
+
+@dataclass
+class _MultipartLevel:
+    """
+    Where a MultipartBodyNormalizer is in one of the multipart bodies it's inside of.
+    """
+
+    boundary: str
+    subtype: bytes
+    matcher: BoundaryMatcher
+    state: int
+    search_start: int = 0  # Where to resume looking for the delimiter/end of headers in the buffer
+    line_is_candidate: bool = True  # Whether the current preamble line may be the dash-boundary line
+    line_started: bool = False  # Whether part of the current preamble line was already discarded
+    part_count: int = 0
+    in_file_part: bool = False
+    # For a nested body, the position of the delimiter that ends the part it's in, once found, and how far there's
+    # known to be none. Positions count bytes fed, so that rewriting the front of the buffer doesn't move them.
+    end: int | None = None
+    scanned: int = 0
+
+
+class MultipartBodyNormalizer:
+    """
+    Incremental version of normalize_multipart_body.
+    Feed it the body in chunks, and it hands back normalized chunks as soon as they are known.
+    Parts that are multipart bodies themselves are normalized as they go by, keeping a stack of the bodies it's inside of.
+    Only the current header block (or preamble line prefix) and a boundary's worth of part data per body are ever buffered.
+    """
+
+    _PREAMBLE: Final[int] = 0
+    _AFTER_DELIMITER: Final[int] = 1
+    _HEADERS: Final[int] = 2
+    _DATA: Final[int] = 3
+    _CLOSED: Final[int] = 4
+
+    def __init__(
+        self,
+        boundary: str,
+        subtype: bytes = b"form-data",
+        limits: Limits = DEFAULT_LIMITS,
+    ) -> None:
+        if subtype not in MULTIPART_SUBTYPES:
+            raise ValueError("Unsupported multipart subtype!")
+        self.boundary: str = boundary
+        self.subtype: bytes = subtype
+        self.limits: Limits = limits
+        self.part_count: int = 0  # Parts at every level of nesting
+        self.header_bytes: int = 0  # Bytes of part header blocks at every level of nesting
+        self.file_data_size: int = 0  # Bytes of output that were data of parts with a filename, i.e. uploaded files
+        # The bodies being parsed, outermost first. Only the innermost one is looking at the buffer.
+        self._levels: list[_MultipartLevel] = [_MultipartLevel(boundary, subtype, get_boundary_matcher(boundary), self._PREAMBLE)]
+        self._buf: bytes = b""
+        self._fed: int = 0  # Bytes fed so far, i.e. the position of the end of the buffer
+        self._finished: bool = False
+
+    def feed(self, data: bytes) -> list[bytes | memoryview]:
+        """
+        Takes as input the next chunk of the body.
+        Returns the normalized output that this chunk made available.
+        """
+        if self._finished:
+            raise ValueError("Data fed after end of body!")
+        if len(self._levels) == 1 and self._levels[0].state == self._CLOSED:
+            return []
+        self._buf += data
+        self._fed += len(data)
+        return self._advance(eof=False)
+
+    def finish(self) -> list[bytes | memoryview]:
+        """
+        Signals the end of the body, and returns the rest of the normalized output.
+        """
+        if self._finished:
+            raise ValueError("Body already finished!")
+        self._finished = True
+        return self._advance(eof=True)
+
+    def _advance(self, eof: bool) -> list[bytes | memoryview]:
+        result: list[bytes | memoryview] = []
+        while True:
+            level: _MultipartLevel = self._levels[-1]
+            # The innermost body only gets to see the part of the buffer that's inside of it.
+            end, part_ends = self._find_innermost_end(eof)
+            rest: bytes = self._buf[end:]
+            self._buf = self._buf[:end]
+            body_ends: bool = eof or part_ends
+            if self._advance_level(level, body_ends, result):
+                self._buf += rest
+                continue
+            if not body_ends:
+                self._buf += rest
+                return result
+
+            # Like the outermost body, a nested one may be missing its close delimiter.
+            if level.state == self._DATA:
+                self._emit_data(level, self._buf, result)
+            result.append(level.matcher.close_delimiter)
+            self._buf = rest
+            if len(self._levels) == 1:
+                return result
+            self._levels.pop()
+
+    def _find_innermost_end(self, eof: bool) -> tuple[int, bool]:
+        """
+        Returns how much of the buffer is inside the innermost body, and whether the part holding it ends there.
+        A nested body ends at the next delimiter of the body around it, unless that body ends first.
+        Each body's delimiter is only searched for once, and only as far as the body around it goes.
+        """
+        end: int = len(self._buf)
+        part_ends: bool = False
+        buf_start: int = self._fed - len(self._buf)
+        for outer, level in zip(self._levels, self._levels[1:]):
+            delimiter: bytes = outer.matcher.delimiter
+            if level.end is None:
+                start: int = max(0, level.scanned - buf_start)
+                stop: int = min(len(self._buf), end + len(delimiter) - 1)
+                index: int = self._buf.find(delimiter, start, stop)
+                if index != -1:
+                    level.end = buf_start + index
+                else:
+                    level.scanned = buf_start + max(start, stop - len(delimiter) + 1)
+            if level.end is not None and level.end - buf_start <= end:
+                end = level.end - buf_start
+                part_ends = True
+            elif not part_ends and not eof:
+                # Hold back anything that could be the start of the delimiter.
+                end = min(end, max(0, len(self._buf) - len(delimiter) + 1))
+        return end, part_ends
+
+    def _advance_level(self, level: _MultipartLevel, eof: bool, result: list[bytes | memoryview]) -> bool:
+        """
+        Runs the state machine of the innermost body over the buffer.
+        Returns whether it stopped because it came across a nested body.
+        """
+        while True:
+            if level.state == self._PREAMBLE:
+                if not self._scan_preamble(level, eof):
+                    return False
+                # The first subpart is missing its CRLF, so add one on.
+                self._buf = b"\r\n" + self._buf
+                level.state = self._AFTER_DELIMITER
+            elif level.state == self._AFTER_DELIMITER:
+                if not self._scan_after_delimiter(level, eof):
+                    return False
+            elif level.state == self._HEADERS:
+                if not self._scan_headers(level, eof, result):
+                    return False
+                if self._levels[-1] is not level:
+                    return True
+            elif level.state == self._DATA:
+                self._scan_data(level, result)
+                if level.state == self._DATA:
+                    return False
+            else:
+                self._buf = b""
+                return False
+
+    def _scan_preamble(self, level: _MultipartLevel, eof: bool) -> bool:
+        while True:
+            end: int = self._buf.find(b"\r\n")
+            line: bytes = self._buf
+            kept: bytes = b""
+            if end != -1:
+                line = self._buf[:end]
+            elif line.endswith(b"\r"):
+                # A trailing CR could be the start of the line's CRLF, so keep it around.
+                line, kept = line[:-1], b"\r"
+
+            if level.line_is_candidate and not level.line_started:
+                if level.matcher.is_dash_boundary_line(line):
+                    if end != -1:
+                        self._buf = self._buf[end + len(b"\r\n") :]
+                        return True
+                    # Transport padding is discarded anyway, so there's no reason to hold onto it.
+                    self._buf = level.matcher.dash_boundary + kept
+                    break
+                if end == -1 and level.matcher.dash_boundary.startswith(line):
+                    break
+
+            if _TEXT_PAT.fullmatch(line) is None:
+                raise ValueError("Couldn't parse multipart body prefix!")
+            if end == -1:
+                level.line_started = level.line_started or len(line) > 0
+                self._buf = kept
+                break
+            level.line_is_candidate = len(line) == 0 and not level.line_started
+            level.line_started = False
+            self._buf = self._buf[end + len(b"\r\n") :]
+        if eof:
+            raise ValueError("Couldn't parse multipart body prefix!")
+        return False
+
+    def _scan_after_delimiter(self, level: _MultipartLevel, eof: bool) -> bool:
+        if len(self._buf) < len(b"\r\n") and not eof:
+            return False
+        if self._buf.startswith(b"\r\n"):
+            # After the first part, that CRLF could also begin a delimiter, which ends an empty part for other parsers.
+            if level.part_count > 0 and self._buf.startswith(level.matcher.delimiter):
+                raise ValueError("Part starts with a boundary!")
+            if level.part_count > 0 and level.matcher.delimiter.startswith(self._buf) and not eof:
+                return False
+            self._buf = self._buf[len(b"\r\n") :]
+            level.search_start = 0
+            level.state = self._HEADERS
+            return True
+        if self._buf.startswith(b"--"):
+            # The close delimiter is only recognized when the whole subpart is "--" or "--\r\n".
+            rest: bytes = self._buf[len(b"--") :]
+            if len(rest) < len(b"\r\n") + len(level.matcher.delimiter) and not eof:
+                return False
+            if rest.startswith(level.matcher.delimiter) or rest.startswith(b"\r\n" + level.matcher.delimiter) or (eof and rest in (b"", b"\r\n")):
+                self._buf = b""
+                level.state = self._CLOSED
+                return True
+        raise ValueError(f"Missing CRLF in {self._buf[:len(b'--') + len(level.matcher.delimiter)]!r}!")
+
+    def _scan_headers(self, level: _MultipartLevel, eof: bool, result: list[bytes | memoryview]) -> bool:
+        delimiter: bytes = level.matcher.delimiter
+        delimiter_index: int = level.matcher.find_delimiter(self._buf, level.search_start)
+        headers_end: int = -1
+        if self._buf.startswith(b"\r\n"):
+            headers_end = len(b"\r\n")
+        else:
+            blank_line_index: int = self._buf.find(b"\r\n\r\n", level.search_start)
+            if blank_line_index != -1:
+                headers_end = blank_line_index + len(b"\r\n\r\n")
+
+        part_end: int
+        consumed: int
+        next_state: int
+        if delimiter_index != -1:
+            # The whole subpart is in the buffer.
+            part_end, consumed, next_state = delimiter_index, delimiter_index + len(delimiter), self._AFTER_DELIMITER
+        elif headers_end != -1:
+            # The final CRLF of the headers could still turn out to begin a delimiter.
+            if len(self._buf) < headers_end - len(b"\r\n") + len(delimiter) and not eof:
+                return False
+            part_end, consumed, next_state = headers_end, headers_end, self._DATA
+        elif eof:
+            part_end, consumed, next_state = len(self._buf), len(self._buf), self._CLOSED
+        else:
+            if len(self._buf) > self.limits.max_header_block_bytes:
+                raise LimitExceeded("Header block too large!")
+            if self.header_bytes + len(self._buf) > self.limits.max_multipart_header_bytes:
+                raise LimitExceeded("Too much header data in multipart body!")
+            level.search_start = max(0, len(self._buf) - len(delimiter) + 1)
+            return False
+
+        subpart: MultipartSubpart = parse_multipart_subpart(level.boundary, self._buf, 0, part_end, level.subtype, self.limits)
+        data_start: int = part_end - len(subpart.data)
+        self.header_bytes += data_start
+        if self.header_bytes > self.limits.max_multipart_header_bytes:
+            raise LimitExceeded("Too much header data in multipart body!")
+        self._emit_subpart(level, subpart, result)
+        if subpart.content_type.type_ == b"multipart":
+            # The nested body takes over the buffer, up to where this part ends.
+            self._buf = self._buf[data_start:]
+            level.state = self._DATA
+            self._push_level(subpart)
+            return True
+        self._buf = self._buf[consumed:]
+        level.search_start = 0
+        level.state = next_state
+        return True
+
+    def _scan_data(self, level: _MultipartLevel, result: list[bytes | memoryview]) -> None:
+        delimiter_index: int = level.matcher.find_delimiter(self._buf)
+        if delimiter_index == -1:
+            # Hold back anything that could be the start of a delimiter.
+            flush_end: int = max(0, len(self._buf) - len(level.matcher.delimiter) + 1)
+            if flush_end > 0:
+                self._emit_data(level, self._buf[:flush_end], result)
+                self._buf = self._buf[flush_end:]
+            return
+        if delimiter_index > 0:
+            self._emit_data(level, self._buf[:delimiter_index], result)
+        self._buf = self._buf[delimiter_index + len(level.matcher.delimiter) :]
+        level.state = self._AFTER_DELIMITER
+
+    def _push_level(self, subpart: MultipartSubpart) -> None:
+        if len(self._levels) >= self.limits.max_multipart_depth:
+            raise LimitExceeded("Multipart body nested too deeply!")
+        if subpart.content_type.subtype not in MULTIPART_SUBTYPES:
+            raise ValueError("Unsupported multipart subtype!")
+        boundary: str = subpart.content_type.parameters[b"boundary"].decode("ascii")
+        matcher: BoundaryMatcher = get_boundary_matcher(boundary)
+        for level in self._levels:
+            # Otherwise one body's delimiter would start with the other's, and where the part ends would be ambiguous.
+            if matcher.dash_boundary.startswith(level.matcher.dash_boundary) or level.matcher.dash_boundary.startswith(matcher.dash_boundary):
+                raise ValueError("Nested boundary collides with an enclosing one!")
+        self._levels.append(_MultipartLevel(boundary, subpart.content_type.subtype, matcher, self._PREAMBLE))
+
+    def _emit_subpart(self, level: _MultipartLevel, subpart: MultipartSubpart, result: list[bytes | memoryview]) -> None:
+        if self.part_count >= self.limits.max_multipart_parts:
+            raise LimitExceeded("Too many parts in multipart body!")
+        if level.part_count > 0:
+            result.append(b"\r\n")
+        level.part_count += 1
+        self.part_count += 1
+        if subpart.content_type.type_ == b"multipart":
+            # A nested body is normalized as it's parsed, so just the headers go out now.
+            result.extend(subpart.serialize_header_pieces())
+            level.in_file_part = False
+            return
+        result.extend(subpart.serialize_pieces())
+        level.in_file_part = subpart.content_disposition is not None and subpart.content_disposition.filename is not None
+        if level.in_file_part:
+            self.file_data_size += len(subpart.data)
+
+    def _emit_data(self, level: _MultipartLevel, data: bytes, result: list[bytes | memoryview]) -> None:
+        result.append(data)
+        if level.in_file_part:
+            self.file_data_size += len(data)
+
+
+# WHATWG URL Standard, application/x-www-form-urlencoded
+# The serializer leaves these bytes as they are, turns space into "+", and percent-encodes everything else.
+_URLENCODED_SAFE_RE: Final[str] = r"[*\-.0-9A-Z_a-z]"
+
+_MALFORMED_ESCAPE_PAT: Final[re.Pattern[bytes]] = re.compile(rb"%(?![0-9A-Fa-f]{2})")
+# Escapes the serializer wouldn't have produced (lowercase hex, or escaped safe bytes or spaces),
+# and runs of raw bytes that it would have escaped. "+", "&", and "=" are left alone.
+# Browsers serialize forms this way already, so usually nothing matches and the whole body is scanned in C.
+_NONCANONICAL_ESCAPE_RE: Final[str] = r"%(?:[a-f][0-9A-Fa-f]|[0-9A-F][a-f]|2[0ADE]|3[0-9]|4[1-9A-F]|5[0-9AF]|6[1-9A-F]|7[0-9A])"
+_NONCANONICAL_PAT: Final[re.Pattern[bytes]] = re.compile(rf"{_NONCANONICAL_ESCAPE_RE}|[^*\-.0-9A-Z_a-z+&=%]+".encode("ascii"))
+# Separately, these are much quicker to scan for, which matters since they usually aren't there.
+_NONCANONICAL_ESCAPE_PAT: Final[re.Pattern[bytes]] = re.compile(_NONCANONICAL_ESCAPE_RE.encode("ascii"))
+_URLENCODED_RAW_BYTES: Final[bytes] = b"*-.0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz+&=%"
+
+
+def _serialize_urlencoded_byte(byte: int) -> bytes:
+    if re.fullmatch(_URLENCODED_SAFE_RE.encode("ascii"), bytes([byte])) is not None:
+        return bytes([byte])
+    if byte == ord(" "):
+        return b"+"
+    return b"%%%02X" % byte
+
+
+# Every spelling of every escape, mapped to its canonical form
+_CANONICAL_ESCAPES: Final[dict[bytes, bytes]] = {
+    b"%" + spelling: _serialize_urlencoded_byte(byte)
+    for byte in range(256)
+    for spelling in (b"%02X" % byte, b"%02x" % byte, b"%X%x" % divmod(byte, 16), b"%x%X" % divmod(byte, 16))
+}
+
+
+def _canonicalize_match(m: re.Match[bytes]) -> bytes:
+    canonical: bytes | None = _CANONICAL_ESCAPES.get(m[0])
+    if canonical is not None:
+        return canonical
+    # A run of raw bytes to escape. "%" only ever starts a triplet here, so the replace can't match across two escapes.
+    return ("%" + m[0].hex("%")).upper().encode("ascii").replace(b"%20", b"+")
+
+
+def canonicalize_urlencoded(data: bytes) -> bytes:
+    """
+    Re-encodes urlencoded text so that equal names and values are spelled the same.
+    Escapes of safe bytes are decoded, other escapes are uppercased, and unsafe raw bytes are escaped.
+    "+", "&", and "=" are left as they are, so this can be applied to a whole body, or any piece not splitting an escape.
+    """
+    if _MALFORMED_ESCAPE_PAT.search(data) is not None:
+        raise ValueError("Malformed percent-escape!")
+    if _NONCANONICAL_ESCAPE_PAT.search(data) is None and len(data.translate(None, _URLENCODED_RAW_BYTES)) == 0:
+        return data
+    return _NONCANONICAL_PAT.sub(_canonicalize_match, data)
+
+
+def normalize_urlencoded_body(data: bytes) -> bytes:
+    """
+    Normalizes an application/x-www-form-urlencoded body.
+    Escapes are canonicalized, empty pairs are dropped, names without a value get an "=", and "=" in values is escaped.
+    Repeated names (checkbox groups, multiple selects) are kept, in order, as multipart/form-data keeps repeated parts.
+    Raises ValueError on malformed escapes and empty names.
+    """
+    normalizer: UrlencodedBodyNormalizer = UrlencodedBodyNormalizer()
+    return b"".join(normalizer.feed(data) + normalizer.finish())
+
+
+class UrlencodedBodyNormalizer:
+    """
+    Incremental version of normalize_urlencoded_body.
+    Whole pairs in each chunk are handled in one go; values are streamed out, so only a partial name is ever buffered.
+    """
+
+    def __init__(self) -> None:
+        self.pair_count: int = 0
+        self._buf: bytes = b""
+        self._in_value: bool = False  # Whether the buffer continues the value of a pair that's already been started
+        self._finished: bool = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Takes as input the next chunk of the body.
+        Returns the normalized output that this chunk made available.
+        """
+        if self._finished:
+            raise ValueError("Data fed after end of body!")
+        self._buf += data
+        return self._advance(eof=False)
+
+    def finish(self) -> list[bytes]:
+        """
+        Signals the end of the body, and returns the rest of the normalized output.
+        """
+        if self._finished:
+            raise ValueError("Body already finished!")
+        self._finished = True
+        return self._advance(eof=True)
+
+    def _advance(self, eof: bool) -> list[bytes]:
+        result: list[bytes] = []
+        buf: bytes = self._buf
+        pos: int = 0
+        if self._in_value:
+            value_end: int = buf.find(b"&")
+            if value_end == -1:
+                self._buf = self._emit_value_prefix(buf, eof, result)
+                return result
+            result.append(canonicalize_urlencoded(buf[:value_end]).replace(b"=", b"%3D"))
+            self._in_value = False
+            pos = value_end + len(b"&")
+
+        pairs_end: int = buf.rfind(b"&", pos)
+        if pairs_end != -1:
+            self._emit_pairs(canonicalize_urlencoded(buf[pos:pairs_end]).split(b"&"), result)
+            pos = pairs_end + len(b"&")
+
+        name_end: int = buf.find(b"=", pos)
+        if name_end != -1:
+            # The name is complete, so start the pair, and send out as much of its value as is known.
+            self._emit_pairs([canonicalize_urlencoded(buf[pos:name_end]) + b"="], result)
+            self._in_value = True
+            self._buf = self._emit_value_prefix(buf[name_end + len(b"=") :], eof, result)
+        elif eof:
+            self._emit_pairs([canonicalize_urlencoded(buf[pos:])], result)
+            self._buf = b""
+        else:
+            self._buf = buf[pos:]
+        return result
+
+    def _emit_value_prefix(self, data: bytes, eof: bool, result: list[bytes]) -> bytes:
+        """
+        Emits all of data that can't be part of an unfinished escape, and returns the rest.
+        """
+        end: int = len(data)
+        if not eof:
+            escape_start: int = data.rfind(b"%", max(0, len(data) - len(b"%XX") + 1))
+            if escape_start != -1:
+                end = escape_start
+        if end > 0:
+            result.append(canonicalize_urlencoded(data[:end]).replace(b"=", b"%3D"))
+        return data[end:]
+
+    def _emit_pairs(self, pairs: list[bytes], result: list[bytes]) -> None:
+        # Each pair here is canonicalized, and either whole or just its name and "=".
+        # Bodies can have hundreds of thousands of pairs, so the common case is checked a list at a time.
+        if b"" in pairs:
+            pairs = [pair for pair in pairs if len(pair) > 0]
+            if len(pairs) == 0:
+                return
+        partitions: list[tuple[bytes, bytes, bytes]] = [pair.partition(b"=") for pair in pairs]
+        if b"" in [name for name, _, _ in partitions]:
+            raise ValueError("Empty name in urlencoded body!")
+        # Unless every pair has exactly one "=", add the missing ones, and escape any further ones as part of the value.
+        if sum(pair.count(b"=") for pair in pairs) != len(pairs) or b"" in [equals for _, equals, _ in partitions]:
+            pairs = [name + b"=" + value.replace(b"=", b"%3D") for name, _, value in partitions]
+
+        if self.pair_count > 0:
+            result.append(b"&")
+        result.append(b"&".join(pairs))
+        self.pair_count += len(pairs)
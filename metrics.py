@@ -0,0 +1,138 @@
+"""
+In-process metrics, rendered in the Prometheus text exposition format.
+Each worker process keeps its own, so with several workers a scrape sees whichever worker answered it.
+"""
+
+import bisect
+from typing import Final
+
+# Upper bounds of the latency histogram buckets, in seconds
+_LATENCY_BUCKETS: Final[tuple[float, ...]] = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds of the buckets for small counts, like parts per body
+_COUNT_BUCKETS: Final[tuple[float, ...]] = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 1024)
+
+_CONTENT_TYPE: Final[str] = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if len(names) == 0:
+        return ""
+    escaped: list[str] = [v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values]
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines: list[str] = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    A value that's set, rather than counted here, like the size of a cache or statistics kept elsewhere.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (), metric_type: str = "gauge") -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.metric_type: str = metric_type
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str) -> None:
+        self._values[label_values] = value
+
+    def render(self) -> list[str]:
+        lines: list[str] = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], label_names: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.buckets: tuple[float, ...] = buckets
+        self.label_names: tuple[str, ...] = label_names
+        # Per label set: (non-cumulative bucket counts, with one extra for +Inf; sum of observations)
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series: tuple[list[int], list[float]] | None = self._values.get(label_values)
+        if series is None:
+            series = ([0] * (len(self.buckets) + 1), [0.0])
+            self._values[label_values] = series
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines: list[str] = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self._values.items()):
+            cumulative: int = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels: str = _format_labels((*self.label_names, "le"), (*label_values, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class ProxyMetrics:
+    """
+    Everything the proxy records.
+    Stages are read_body (waiting on the client), parse_media_type, normalize, upstream (until the response headers), relay, and total.
+    """
+
+    content_type: Final[str] = _CONTENT_TYPE
+
+    def __init__(self) -> None:
+        self.requests: Counter = Counter("normalizer_requests_total", "Requests handled.")
+        self.rejections: Counter = Counter("normalizer_rejections_total", "Requests the proxy answered itself instead of forwarding, by reason.", ("reason",))
+        self.stage_seconds: Histogram = Histogram("normalizer_stage_seconds", "Time spent in each stage of handling a request.", _LATENCY_BUCKETS, ("stage",))
+        self.body_bytes: Counter = Counter("normalizer_body_bytes_total", "Request body bytes read from clients (in) and sent upstream (out).", ("direction",))
+        self.multipart_parts: Histogram = Histogram("normalizer_multipart_parts", "Parts per multipart body.", _COUNT_BUCKETS)
+        self.content_type_parameters: Histogram = Histogram("normalizer_content_type_parameters", "Parameters per Content-Type header.", _COUNT_BUCKETS)
+        self.cache_lookups: Counter = Counter("normalizer_body_cache_lookups_total", "Body cache lookups, by whether they hit.", ("result",))
+        # Kept by the media type parser itself, and copied in on each scrape; the lookups only ever go up, so they're a counter.
+        self.media_type_cache_lookups: Gauge = Gauge(
+            "normalizer_media_type_cache_lookups_total", "Lookups in the cache of parsed Content-Type values, by whether they hit.", ("result",), "counter"
+        )
+        self.media_type_cache_entries: Gauge = Gauge("normalizer_media_type_cache_entries", "Parsed Content-Type values cached.")
+        self.canonical_checks: Counter = Counter("normalizer_canonical_checks_total", "Multipart bodies checked for being canonical already, by whether they were.", ("result",))
+
+    def render(self) -> bytes:
+        lines: list[str] = []
+        for metric in (
+            self.requests,
+            self.rejections,
+            self.stage_seconds,
+            self.body_bytes,
+            self.multipart_parts,
+            self.content_type_parameters,
+            self.cache_lookups,
+            self.canonical_checks,
+            self.media_type_cache_lookups,
+            self.media_type_cache_entries,
+        ):
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
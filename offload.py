@@ -0,0 +1,83 @@
+"""
+Runs normalization of large bodies in an executor, so that it can't stall the event loop.
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Any, Callable, TypeVar
+
+from json_body import JsonBodyNormalizer
+from media_type import MultipartBodyNormalizer, UrlencodedBodyNormalizer
+
+_T = TypeVar("_T")
+
+BodyNormalizer = MultipartBodyNormalizer | UrlencodedBodyNormalizer | JsonBodyNormalizer
+
+
+def feed_normalizer(normalizer: BodyNormalizer, data: bytes, eof: bool) -> tuple[BodyNormalizer, bytes]:
+    """
+    Feeds a batch of body data to a normalizer, finishing it if eof is set.
+    Returns the updated normalizer along with its output, since in a process pool it's a copy that gets updated.
+    """
+    pieces: list[bytes | memoryview] = normalizer.feed(data)
+    if eof:
+        pieces += normalizer.finish()
+    return normalizer, b"".join(pieces)
+
+
+class Offloader:
+    """
+    Submits work to an executor, allowing at most max_pending jobs to be queued or running at once.
+    Callers beyond that wait for a slot, which pushes back on the clients whose bodies they are reading.
+    If executor is a process pool, thread_executor (when given) takes the normalizers whose state grows with the body,
+    so that state is updated in place instead of being shipped to a process and back for every batch.
+    """
+
+    def __init__(
+        self,
+        executor: concurrent.futures.Executor,
+        max_pending: int,
+        timeout: float,
+        thread_executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        self.executor: concurrent.futures.Executor = executor
+        self.thread_executor: concurrent.futures.Executor | None = thread_executor
+        self.timeout: float = timeout
+        self._slots: asyncio.Semaphore = asyncio.Semaphore(max_pending)
+
+    async def run(self, f: Callable[..., _T], *args: Any) -> _T:
+        """
+        Runs f(*args) in the executor.
+        Raises TimeoutError if no slot frees up in time, or if the job itself takes too long.
+        If the caller is cancelled (e.g. because the client went away), a job that hasn't started yet is dropped.
+        """
+        return await self._run(self.executor, f, *args)
+
+    async def feed(self, normalizer: BodyNormalizer, data: bytes, eof: bool) -> tuple[BodyNormalizer, bytes]:
+        """
+        Runs feed_normalizer(normalizer, data, eof) like run does.
+        A JSON normalizer keeps the keys of every open object to catch duplicates, so it goes to the thread executor if there is one.
+        """
+        if isinstance(normalizer, JsonBodyNormalizer) and self.thread_executor is not None:
+            return await self._run(self.thread_executor, feed_normalizer, normalizer, data, eof)
+        return await self._run(self.executor, feed_normalizer, normalizer, data, eof)
+
+    async def _run(self, executor: concurrent.futures.Executor, f: Callable[..., _T], *args: Any) -> _T:
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except TimeoutError:
+            raise TimeoutError("Offload pool is saturated!")
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            future: concurrent.futures.Future[_T] = executor.submit(f, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A job that is already running can't be cancelled, so only free its slot once it's really done.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except TimeoutError:
+            raise TimeoutError("Offloaded job took too long!")
@@ -0,0 +1,58 @@
+"""
+A sampling profiler for explaining slow requests after the fact.
+A background thread periodically records the event loop thread's stack.
+When a request turns out to be slow, the samples taken while it was in flight are summarized.
+Since the event loop is shared, the samples show what the worker was busy with, which isn't necessarily that request.
+"""
+
+import collections
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Final
+
+_MAX_REPORTED_STACKS: Final[int] = 5
+_MAX_STACK_DEPTH: Final[int] = 32
+
+_Stack = tuple[tuple[str, str, int], ...]  # (filename, function, line) for each frame, innermost last
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float, history: float) -> None:
+        self.thread_id: int = thread_id
+        self.interval: float = interval
+        self._samples: collections.deque[tuple[float, _Stack]] = collections.deque(maxlen=max(1, int(history / interval)))
+        self._stop: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame: FrameType | None = sys._current_frames().get(self.thread_id)
+            stack: list[tuple[str, str, int]] = []
+            while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+                stack.append((frame.f_code.co_filename, frame.f_code.co_name, frame.f_lineno))
+                frame = frame.f_back
+            stack.reverse()
+            self._samples.append((time.monotonic(), tuple(stack)))
+
+    def report(self, start: float, end: float) -> str:
+        """
+        Summarizes the samples taken between two time.monotonic() readings, most common stacks first.
+        """
+        # Appends happen on another thread, so work from a copy.
+        stacks: collections.Counter[_Stack] = collections.Counter(stack for t, stack in list(self._samples) if start <= t <= end)
+        total: int = sum(stacks.values())
+        if total == 0:
+            return "no samples"
+        lines: list[str] = [f"{total} samples"]
+        for stack, count in stacks.most_common(_MAX_REPORTED_STACKS):
+            lines.append(f"{count / total:6.1%} " + ";".join(f"{filename}:{function}:{line}" for filename, function, line in stack))
+        return "\n".join(lines)
@@ -1,73 +1,774 @@
+import argparse
+import concurrent.futures
+import dataclasses
+import functools
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
 import aiohttp
 import aiohttp.web
 from aiohttp.web_protocol import RequestPayloadError
 from aiohttp.abc import CIMultiDict
+from typing import AsyncIterator, Final
 from yarl import URL
 
-from media_type import parse_media_type, normalize_multipart_body, MediaType
+from body_cache import BodyCache, CachedResult, create_cache_file, remove_cache_file
+from json_body import JsonBodyNormalizer
+from launcher import Supervisor, bind_listen_socket
+from limits import LimitExceeded, Limits
+from media_type import (
+    MULTIPART_SUBTYPES,
+    is_canonical_multipart_body,
+    media_type_cache_info,
+    parse_media_type,
+    set_media_type_cache_size,
+    MediaType,
+    MultipartBodyNormalizer,
+    UrlencodedBodyNormalizer,
+)
+from metrics import ProxyMetrics
+from offload import BodyNormalizer, Offloader, feed_normalizer
+from sampler import StackSampler
+from spool import MemoryBudget, SpooledBody
 
-# Change this:
+# Defaults for the command-line options. Each can also be set with the environment variable in its --help.
+_LISTEN_HOST: str = "0.0.0.0"
+_LISTEN_PORT: int = 8999
 _HOST: str = "localhost"
-# And this:
 _PORT: int = 8000
+_WORKERS: int = 1
+# Seconds a worker waits for in-flight requests when shutting down
+_SHUTDOWN_TIMEOUT: float = 60.0
+# Bodies are normalized on the event loop up to this many bytes; the rest goes to the offload pool.
+_OFFLOAD_THRESHOLD: int = 2**20
+_OFFLOAD_EXECUTOR: str = "process"
+_OFFLOAD_WORKERS: int = 2
+# Offloaded batches that may be queued or running at once, per server worker
+_OFFLOAD_MAX_PENDING: int = 4
+# Seconds to wait for an offload slot, and then for the batch to be normalized
+_OFFLOAD_TIMEOUT: float = 30.0
+
+# Spooling is off by default, so bodies stream straight through.
+_SPOOL: bool = False
+# Bytes of uploaded file data per request kept in memory before the rest of the body is written to disk
+_SPOOL_THRESHOLD: int = 2**20
+# Bytes of spooled bodies held in memory at once, across all requests; each worker gets an equal share.
+_MEMORY_BUDGET: int = 2**26
+# Directory for spool files ("" means the system's temporary directory)
+_SPOOL_DIR: str = ""
+
+# Limits on JSON bodies: nesting depth, bytes in any one string, and values and keys in the whole body
+_JSON_MAX_DEPTH: int = 64
+_JSON_MAX_STRING_LENGTH: int = 2**20
+_JSON_MAX_TOKENS: int = 2**24
+
+# Limits on multipart bodies: nesting depth, and parts and bytes of part headers at every level together
+_MULTIPART_MAX_DEPTH: int = 8
+_MULTIPART_MAX_PARTS: int = 2**14
+_MULTIPART_MAX_HEADER_BYTES: int = 2**22
+# Limits on each part of a multipart body: fields and bytes in its header block
+_MULTIPART_MAX_PART_HEADER_FIELDS: int = 100
+_MULTIPART_MAX_PART_HEADER_BYTES: int = 2**16
+
+# Limits on any request: body bytes (checked against Content-Length before reading), Content-Type parameters, and
+# characters in a boundary
+_MAX_BODY_SIZE: int = 2**30
+_MAX_CONTENT_TYPE_PARAMETERS: int = 100
+_MAX_BOUNDARY_LENGTH: int = 1024
+
+# multipart/form-data bodies whose Content-Length is at most this are read whole and checked for being canonical already; those
+# that are get forwarded as they came, without being rebuilt (0 turns the check off).
+_CANONICAL_MAX_SIZE: int = 2**16
+
+# The cache of normalized bodies is off by default. When on, bodies whose Content-Length is at most the entry size are
+# read whole and looked up by hash before being normalized.
+_CACHE_SIZE: int = 0
+_CACHE_MAX_ENTRY_SIZE: int = 2**20
+# File the cache is shared through by the workers ("" means a temporary file, removed on exit)
+_CACHE_PATH: str = ""
+
+# Parsed Content-Type values cached per process, for the requests' own and their parts' (0 turns the cache off)
+_MEDIA_TYPE_CACHE_SIZE: int = 1024
+
+# Upstream connection pool: simultaneous connections in all and to any one host (0 means no limit), seconds an idle
+# connection is kept for reuse, and seconds a resolved upstream address is cached for (0 turns the DNS cache off)
+_POOL_LIMIT: int = 100
+_POOL_LIMIT_PER_HOST: int = 0
+_POOL_KEEPALIVE_TIMEOUT: float = 15.0
+_POOL_DNS_CACHE_TTL: int = 10
+
+# Path the metrics are served on, instead of being proxied ("" turns the endpoint off)
+_METRICS_PATH: str = "/metrics"
+# Requests taking at least this many seconds get a stack sampling report on stderr (0 turns the sampler off)
+_SLOW_REQUEST_THRESHOLD: float = 0.0
+
+# Seconds between stack samples, and seconds of samples kept, when the sampler is on
+_SAMPLE_INTERVAL: float = 0.01
+_SAMPLE_HISTORY: float = 60.0
+
+# Offloaded work is handed over in batches of at least this many bytes, to amortize the trip to the pool.
+_OFFLOAD_BATCH_SIZE: int = 2**20
+
+# Size of the pieces upstream responses are relayed in
+_RESPONSE_CHUNK_SIZE: int = 2**16
+
+# Hop-by-hop headers that describe the upstream connection, not the response
+_UNRELAYED_RESPONSE_HEADERS: Final[tuple[str, ...]] = ("Connection", "Keep-Alive", "Transfer-Encoding")
+
+_UPSTREAM_SESSION: Final[aiohttp.web.AppKey[aiohttp.ClientSession]] = aiohttp.web.AppKey("upstream_session", aiohttp.ClientSession)
+
+
+@dataclass
+class ServerConfig:
+    """
+    Each field is a command-line option (--listen-host for listen_host) and an environment variable (NORMALIZER_LISTEN_HOST).
+    """
+
+    listen_host: str = field(default=_LISTEN_HOST, metadata={"help": "address to listen on"})
+    listen_port: int = field(default=_LISTEN_PORT, metadata={"help": "port to listen on"})
+    upstream_host: str = field(default=_HOST, metadata={"help": "host to forward requests to"})
+    upstream_port: int = field(default=_PORT, metadata={"help": "port to forward requests to"})
+    workers: int = field(default=_WORKERS, metadata={"help": "number of worker processes"})
+    pool_limit: int = field(default=_POOL_LIMIT, metadata={"help": "simultaneous upstream connections per worker (0 for no limit)"})
+    pool_limit_per_host: int = field(default=_POOL_LIMIT_PER_HOST, metadata={"help": "simultaneous connections per worker to any one upstream host (0 for no limit)"})
+    pool_keepalive_timeout: float = field(default=_POOL_KEEPALIVE_TIMEOUT, metadata={"help": "seconds an idle upstream connection is kept for reuse"})
+    pool_dns_cache_ttl: int = field(default=_POOL_DNS_CACHE_TTL, metadata={"help": "seconds a resolved upstream address is cached for (0 to turn off)"})
+    reuse_port: bool = field(default=False, metadata={"help": "have each worker bind its own SO_REUSEPORT socket, instead of sharing one"})
+    shutdown_timeout: float = field(default=_SHUTDOWN_TIMEOUT, metadata={"help": "seconds to wait for in-flight requests on shutdown or reload"})
+    offload_threshold: int = field(default=_OFFLOAD_THRESHOLD, metadata={"help": "bytes of each body normalized on the event loop before the rest is offloaded"})
+    offload_executor: str = field(default=_OFFLOAD_EXECUTOR, metadata={"help": "where offloaded normalization runs", "choices": ("process", "thread")})
+    offload_workers: int = field(default=_OFFLOAD_WORKERS, metadata={"help": "processes or threads in each worker's offload pool"})
+    offload_max_pending: int = field(default=_OFFLOAD_MAX_PENDING, metadata={"help": "offloaded batches queued or running at once; further bodies wait"})
+    offload_timeout: float = field(default=_OFFLOAD_TIMEOUT, metadata={"help": "seconds to wait for an offload slot, and for each offloaded batch"})
+    spool: bool = field(default=_SPOOL, metadata={"help": "read and normalize each whole body before forwarding it, instead of streaming it"})
+    spool_threshold: int = field(default=_SPOOL_THRESHOLD, metadata={"help": "bytes of uploaded file data per request kept in memory before spooling to disk"})
+    memory_budget: int = field(default=_MEMORY_BUDGET, metadata={"help": "bytes of spooled bodies held in memory at once, split evenly between the workers; the rest go to disk"})
+    spool_dir: str = field(default=_SPOOL_DIR, metadata={"help": "directory for spool files (empty for the system default)"})
+    json_max_depth: int = field(default=_JSON_MAX_DEPTH, metadata={"help": "deepest nesting of arrays and objects allowed in a JSON body"})
+    json_max_string_length: int = field(default=_JSON_MAX_STRING_LENGTH, metadata={"help": "most bytes allowed in any one string of a JSON body"})
+    json_max_tokens: int = field(default=_JSON_MAX_TOKENS, metadata={"help": "most values and keys allowed in a JSON body"})
+    multipart_max_depth: int = field(default=_MULTIPART_MAX_DEPTH, metadata={"help": "multipart bodies allowed inside one another, counting the outermost"})
+    multipart_max_parts: int = field(default=_MULTIPART_MAX_PARTS, metadata={"help": "most parts allowed in a multipart body, counting nested ones"})
+    multipart_max_header_bytes: int = field(default=_MULTIPART_MAX_HEADER_BYTES, metadata={"help": "most bytes of part headers allowed in a multipart body, counting nested ones"})
+    multipart_max_part_header_fields: int = field(default=_MULTIPART_MAX_PART_HEADER_FIELDS, metadata={"help": "most header fields allowed in one part of a multipart body"})
+    multipart_max_part_header_bytes: int = field(default=_MULTIPART_MAX_PART_HEADER_BYTES, metadata={"help": "most bytes allowed in the header block of one part of a multipart body"})
+    max_body_size: int = field(default=_MAX_BODY_SIZE, metadata={"help": "most bytes allowed in a request body; a larger Content-Length is rejected before reading"})
+    max_content_type_parameters: int = field(default=_MAX_CONTENT_TYPE_PARAMETERS, metadata={"help": "most parameters allowed in a Content-Type or a part's Content-Disposition, counting continued ones once"})
+    max_boundary_length: int = field(default=_MAX_BOUNDARY_LENGTH, metadata={"help": "most characters allowed in a multipart boundary"})
+    canonical_max_size: int = field(default=_CANONICAL_MAX_SIZE, metadata={"help": "largest multipart/form-data body, by Content-Length, checked for being canonical already and then forwarded as it came (0 to turn off)"})
+    cache_size: int = field(default=_CACHE_SIZE, metadata={"help": "bytes of normalized bodies and rejections cached, shared by all workers (0 to turn off)"})
+    cache_max_entry_size: int = field(default=_CACHE_MAX_ENTRY_SIZE, metadata={"help": "largest body, before and after normalization, that gets cached"})
+    cache_path: str = field(default=_CACHE_PATH, metadata={"help": "file the cache is kept in, emptied on startup (empty for a temporary file)"})
+    media_type_cache_size: int = field(default=_MEDIA_TYPE_CACHE_SIZE, metadata={"help": "parsed Content-Type values cached in each process (0 to turn off)"})
+    metrics_path: str = field(default=_METRICS_PATH, metadata={"help": "path to serve Prometheus metrics on instead of proxying (empty to turn off)"})
+    slow_request_threshold: float = field(default=_SLOW_REQUEST_THRESHOLD, metadata={"help": "seconds after which a request gets a stack sampling report on stderr (0 to turn off)"})
+
+    def limits(self) -> Limits:
+        return Limits(
+            max_body_size=self.max_body_size,
+            max_parameters=self.max_content_type_parameters,
+            max_boundary_length=self.max_boundary_length,
+            max_header_fields=self.multipart_max_part_header_fields,
+            max_header_block_bytes=self.multipart_max_part_header_bytes,
+            max_multipart_depth=self.multipart_max_depth,
+            max_multipart_parts=self.multipart_max_parts,
+            max_multipart_header_bytes=self.multipart_max_header_bytes,
+        )
+
+
+_CONFIG: Final[aiohttp.web.AppKey[ServerConfig]] = aiohttp.web.AppKey("config", ServerConfig)
+_OFFLOADER: Final[aiohttp.web.AppKey[Offloader]] = aiohttp.web.AppKey("offloader", Offloader)
+_MEMORY_BUDGET_KEY: Final[aiohttp.web.AppKey[MemoryBudget]] = aiohttp.web.AppKey("memory_budget", MemoryBudget)
+_METRICS: Final[aiohttp.web.AppKey[ProxyMetrics]] = aiohttp.web.AppKey("metrics", ProxyMetrics)
+_SAMPLER: Final[aiohttp.web.AppKey[StackSampler]] = aiohttp.web.AppKey("sampler", StackSampler)
+_BODY_CACHE: Final[aiohttp.web.AppKey[BodyCache]] = aiohttp.web.AppKey("body_cache", BodyCache)
+_LIMITS: Final[aiohttp.web.AppKey[Limits]] = aiohttp.web.AppKey("limits", Limits)
+
+
+@dataclass
+class RequestProgress:
+    """
+    What is learned about a request while handling it, for respond's decisions and for the metrics.
+    Body errors are recorded before being raised, so that respond can tell them apart from upstream errors.
+    """
+
+    errors: list[Exception] = field(default_factory=list)
+    file_data_size: int = 0  # Bytes of uploaded file data normalized so far
+    bytes_in: int = 0
+    bytes_out: int = 0
+    part_count: int | None = None  # Only set for multipart bodies
+    parameter_count: int | None = None  # Only set when there's a Content-Type
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    relayed: bool = False  # Whether the response came from upstream, rather than being a rejection
+    malformed_reason: str = "Malformed multipart body."  # What to tell the client if the normalizer rejects the body
+    cache_hit: bool | None = None  # Only set when the body went through the cache
+    canonical: bool | None = None  # Only set when the body was checked for being canonical already
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+
+async def upstream_session(app: aiohttp.web.Application) -> AsyncIterator[None]:
+    """
+    Keeps one pooled ClientSession open for the lifetime of the app, so upstream connections get reused across requests.
+    """
+    config: ServerConfig = app[_CONFIG]
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+        limit=config.pool_limit,
+        limit_per_host=config.pool_limit_per_host,
+        keepalive_timeout=config.pool_keepalive_timeout,
+        use_dns_cache=config.pool_dns_cache_ttl > 0,
+        ttl_dns_cache=config.pool_dns_cache_ttl,
+    )
+    # Responses are relayed byte-for-byte, Content-Encoding and all, so don't decompress them. For the same reason,
+    # only the client's own Accept-Encoding goes upstream, rather than the one aiohttp would add for requests without.
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False, skip_auto_headers=("Accept-Encoding",)) as session:
+        app[_UPSTREAM_SESSION] = session
+        yield
+
+
+async def offload_pool(app: aiohttp.web.Application) -> AsyncIterator[None]:
+    """
+    Keeps the pool that large bodies are normalized in open for the lifetime of the app.
+    """
+    config: ServerConfig = app[_CONFIG]
+    executor: concurrent.futures.Executor
+    thread_executor: concurrent.futures.Executor | None = None
+    if config.offload_executor == "process":
+        executor = concurrent.futures.ProcessPoolExecutor(
+            config.offload_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=set_media_type_cache_size,
+            initargs=(config.media_type_cache_size,),
+        )
+        thread_executor = concurrent.futures.ThreadPoolExecutor(config.offload_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(config.offload_workers)
+    app[_OFFLOADER] = Offloader(executor, config.offload_max_pending, config.offload_timeout, thread_executor)
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+    if thread_executor is not None:
+        thread_executor.shutdown(wait=False, cancel_futures=True)
+
+async def body_cache(app: aiohttp.web.Application) -> AsyncIterator[None]:
+    """
+    Keeps this worker's handle on the shared body cache open for the lifetime of the app, if the cache is on.
+    """
+    config: ServerConfig = app[_CONFIG]
+    if config.cache_size <= 0:
+        yield
+        return
+    cache: BodyCache = BodyCache(config.cache_path, config.cache_size, config.cache_max_entry_size)
+    app[_BODY_CACHE] = cache
+    yield
+    cache.close()
+
+
+async def stack_sampler(app: aiohttp.web.Application) -> AsyncIterator[None]:
+    """
+    Samples the event loop's stack for the lifetime of the app, if slow requests are to be reported.
+    """
+    config: ServerConfig = app[_CONFIG]
+    if config.slow_request_threshold <= 0:
+        yield
+        return
+    sampler: StackSampler = StackSampler(threading.get_ident(), _SAMPLE_INTERVAL, _SAMPLE_HISTORY)
+    app[_SAMPLER] = sampler
+    sampler.start()
+    yield
+    sampler.stop()
+
+
+async def read_chunks(content: aiohttp.StreamReader, progress: RequestProgress, limits: Limits) -> AsyncIterator[bytes]:
+    """
+    Yields the request body as it arrives, timing the waits for it.
+    A body without a Content-Length is only checked against the size limit here, as it arrives.
+    """
+    while True:
+        start: float = time.monotonic()
+        chunk: bytes = await content.readany()
+        progress.add_time("read_body", time.monotonic() - start)
+        if len(chunk) == 0:
+            return
+        progress.bytes_in += len(chunk)
+        limits.check_body_size(progress.bytes_in)
+        yield chunk
+
+
+async def forward_body(content: aiohttp.StreamReader, progress: RequestProgress, limits: Limits) -> AsyncIterator[bytes]:
+    """
+    Passes the request body through as it arrives.
+    """
+    try:
+        async for chunk in read_chunks(content, progress, limits):
+            progress.bytes_out += len(chunk)
+            yield chunk
+    except (RequestPayloadError, LimitExceeded) as e:
+        progress.errors.append(e)
+        raise
+
+
+async def normalize_stream(
+    normalizer: BodyNormalizer,
+    content: aiohttp.StreamReader,
+    progress: RequestProgress,
+    limits: Limits,
+    offloader: Offloader,
+    offload_threshold: int,
+) -> AsyncIterator[bytes]:
+    """
+    Normalizes a body as it arrives, without ever holding the whole thing in memory.
+    The first offload_threshold bytes are normalized right here; anything past that is batched up and sent to the offloader.
+    """
+    bytes_read: int = 0
+    batch: list[bytes] = []
+    batch_size: int = 0
+    output: bytes
+    try:
+        async for chunk in read_chunks(content, progress, limits):
+            bytes_read += len(chunk)
+            start: float = time.monotonic()
+            if bytes_read <= offload_threshold:
+                # The normalizer hands back many small pieces; send them upstream as one chunk.
+                output = b"".join(normalizer.feed(chunk))
+            else:
+                batch.append(chunk)
+                batch_size += len(chunk)
+                if batch_size < _OFFLOAD_BATCH_SIZE:
+                    continue
+                normalizer, output = await offloader.feed(normalizer, b"".join(batch), False)
+                batch.clear()
+                batch_size = 0
+            progress.add_time("normalize", time.monotonic() - start)
+            if isinstance(normalizer, MultipartBodyNormalizer):
+                progress.file_data_size = normalizer.file_data_size
+            progress.bytes_out += len(output)
+            yield output
+        start = time.monotonic()
+        if bytes_read <= offload_threshold:
+            output = b"".join(normalizer.finish())
+        else:
+            normalizer, output = await offloader.feed(normalizer, b"".join(batch), True)
+        progress.add_time("normalize", time.monotonic() - start)
+        if isinstance(normalizer, MultipartBodyNormalizer):
+            progress.part_count = normalizer.part_count
+        progress.bytes_out += len(output)
+        yield output
+    except (RequestPayloadError, ValueError, TimeoutError) as e:
+        progress.errors.append(e)
+        raise
+
 
-async def respond(request) -> aiohttp.web.Response:
+async def normalize_whole(
+    normalizer: BodyNormalizer,
+    content_type: bytes,
+    content: aiohttp.StreamReader,
+    progress: RequestProgress,
+    limits: Limits,
+    cache: BodyCache | None,
+    check_canonical: bool,
+    offloader: Offloader,
+    offload_threshold: int,
+) -> bytes:
+    """
+    Reads a whole (small) body and normalizes it, unless it's canonical already, or the cache has the result for an
+    identical one. A canonical body is handed back as it came, without being rebuilt or cached.
+    Rejections are cached too, and raised again with the reason they were first given.
+    """
+    output: bytes
     try:
-        body: bytes = await request.content.read()
-    except RequestPayloadError:
+        body: bytes = b"".join([chunk async for chunk in read_chunks(content, progress, limits)])
+        start: float = time.monotonic()
+        if check_canonical and isinstance(normalizer, MultipartBodyNormalizer):
+            if len(body) <= offload_threshold:
+                progress.canonical = is_canonical_multipart_body(normalizer.boundary, body, normalizer.subtype, normalizer.limits)
+            else:
+                progress.canonical = await offloader.run(is_canonical_multipart_body, normalizer.boundary, body, normalizer.subtype, normalizer.limits)
+            progress.add_time("canonical_check", time.monotonic() - start)
+        key: bytes | None = None
+        cached: CachedResult | None = None
+        if progress.canonical:
+            output = body
+        elif cache is not None:
+            start = time.monotonic()
+            key = cache.key(content_type, body)
+            cached = await cache.get(key)
+            progress.add_time("cache", time.monotonic() - start)
+            progress.cache_hit = cached is not None
+        if cached is not None:
+            if cached.normalized is None:
+                progress.malformed_reason = cached.reason or progress.malformed_reason
+                raise ValueError(progress.malformed_reason)
+            output = cached.normalized
+        elif not progress.canonical:
+            start = time.monotonic()
+            try:
+                if len(body) <= offload_threshold:
+                    normalizer, output = feed_normalizer(normalizer, body, True)
+                else:
+                    normalizer, output = await offloader.feed(normalizer, body, True)
+            except LimitExceeded:
+                raise
+            except ValueError:
+                if cache is not None and key is not None:
+                    cache.put(key, CachedResult(None, progress.malformed_reason))
+                raise
+            finally:
+                progress.add_time("normalize", time.monotonic() - start)
+            if isinstance(normalizer, MultipartBodyNormalizer):
+                progress.part_count = normalizer.part_count
+                progress.file_data_size = normalizer.file_data_size
+            if cache is not None and key is not None:
+                cache.put(key, CachedResult(output, None))
+    except (RequestPayloadError, ValueError, TimeoutError) as e:
+        progress.errors.append(e)
+        raise
+    progress.bytes_out += len(output)
+    return output
+
+
+async def spool_body(body: AsyncIterator[bytes], progress: RequestProgress, spooled: SpooledBody, spool_threshold: int) -> None:
+    """
+    Reads a whole body into spooled, sending it to disk once the request has uploaded more than spool_threshold bytes of files.
+    """
+    async for chunk in body:
+        await spooled.write(chunk, spill=progress.file_data_size > spool_threshold)
+
+
+def body_error_response(progress: RequestProgress) -> aiohttp.web.Response | None:
+    """
+    Returns the response for a request whose body couldn't be read or normalized, if that's what happened.
+    """
+    if any(isinstance(e, RequestPayloadError) for e in progress.errors):
         return aiohttp.web.Response(status=400, reason="Bad message body.")
+    for e in progress.errors:
+        if isinstance(e, LimitExceeded):
+            return aiohttp.web.Response(status=e.status, reason=e.reason)
+    if any(isinstance(e, TimeoutError) for e in progress.errors):
+        return aiohttp.web.Response(status=503, reason="Body normalization timed out.")
+    if len(progress.errors) > 0:
+        return aiohttp.web.Response(status=400, reason=progress.malformed_reason)
+    return None
+
+
+async def respond(request: aiohttp.web.Request) -> aiohttp.web.StreamResponse:
+    """
+    Handles a request to be proxied, recording its metrics.
+    """
+    metrics: ProxyMetrics = request.app[_METRICS]
+    progress: RequestProgress = RequestProgress()
+    start: float = time.monotonic()
+    try:
+        response: aiohttp.web.StreamResponse = await proxy(request, progress)
+        if not progress.relayed:
+            metrics.rejections.inc(response.reason)
+        return response
+    finally:
+        end: float = time.monotonic()
+        metrics.requests.inc()
+        metrics.stage_seconds.observe(end - start, "total")
+        for stage, seconds in progress.stage_seconds.items():
+            metrics.stage_seconds.observe(seconds, stage)
+        metrics.body_bytes.inc("in", amount=progress.bytes_in)
+        metrics.body_bytes.inc("out", amount=progress.bytes_out)
+        if progress.part_count is not None:
+            metrics.multipart_parts.observe(progress.part_count)
+        if progress.parameter_count is not None:
+            metrics.content_type_parameters.observe(progress.parameter_count)
+        if progress.cache_hit is not None:
+            metrics.cache_lookups.inc("hit" if progress.cache_hit else "miss")
+        if progress.canonical is not None:
+            metrics.canonical_checks.inc("hit" if progress.canonical else "miss")
+
+        sampler: StackSampler | None = request.app.get(_SAMPLER)
+        if sampler is not None and end - start >= request.app[_CONFIG].slow_request_threshold:
+            print(f"Slow request: {request.method} {request.path} took {end - start:.3f}s\n{sampler.report(start, end)}", file=sys.stderr)
 
+
+async def proxy(request: aiohttp.web.Request, progress: RequestProgress) -> aiohttp.web.StreamResponse:
+    config: ServerConfig = request.app[_CONFIG]
+    limits: Limits = request.app[_LIMITS]
+    # Rejected before anything else is looked at, and before any of the body is read
+    if request.content_length is not None:
+        try:
+            limits.check_body_size(request.content_length)
+        except LimitExceeded as e:
+            return aiohttp.web.Response(status=e.status, reason=e.reason)
     headers: CIMultiDict = CIMultiDict()
     headers.extend(request.headers)
+    # The body is streamed, so let aiohttp redo the framing: a body passed through as it is keeps its Content-Length,
+    # and one that's normalized has it dropped below, since normalization can change its length.
+    headers.popall("Transfer-Encoding", None)
+
+    body: AsyncIterator[bytes] | None = forward_body(request.content, progress, limits) if request.can_read_body else None
+    normalizer: BodyNormalizer | None = None
 
     if "Content-Type" in request.headers:
         orig_ct: str = request.headers["Content-Type"]
         if not orig_ct.isascii():
             return aiohttp.web.Response(status=400, reason="Non-ASCII bytes in Content-Type.")
+        start: float = time.monotonic()
         try:
-            media_type: MediaType = parse_media_type(orig_ct.encode("ascii"))
+            media_type: MediaType = parse_media_type(orig_ct.encode("ascii"), limits)
+        except LimitExceeded as e:
+            return aiohttp.web.Response(status=e.status, reason=e.reason)
         except ValueError:
             return aiohttp.web.Response(status=400, reason="Bad Content-Type.")
+        finally:
+            progress.add_time("parse_media_type", time.monotonic() - start)
+        progress.parameter_count = len(media_type.parameters)
 
         raw_boundary: bytes | None = media_type.parameters.get(b"boundary")
-        if raw_boundary is None:
-            return aiohttp.web.Response(status=400, reason="Missing boundary parameter!")
-        if not raw_boundary.isascii():
-            return aiohttp.web.Response(status=400, reason="Boundary is not ASCII!")
+        if media_type.type_ == b"multipart":
+            if raw_boundary is None:
+                return aiohttp.web.Response(status=400, reason="Missing boundary parameter!")
+            if not raw_boundary.isascii():
+                return aiohttp.web.Response(status=400, reason="Boundary is not ASCII!")
 
-        for k, v in media_type.parameters.items():
-            if k != b"boundary":
-                del media_type.parameters[k]
+        headers["Content-Type"] = media_type.boundary_only.decode("ascii")
 
-        headers["Content-Type"] = media_type.serialize().decode("ascii")
-
-        if media_type.type_ == b"multipart" and media_type.subtype == b"form-data":
-            try:
-                body = normalize_multipart_body(raw_boundary.decode("ascii"), body)
-            except ValueError:
-                return aiohttp.web.Response(status=400, reason="Malformed multipart body.")
+        if media_type.type_ == b"multipart" and media_type.subtype in MULTIPART_SUBTYPES and raw_boundary is not None:
+            normalizer = MultipartBodyNormalizer(raw_boundary.decode("ascii"), media_type.subtype, limits)
+        elif media_type.type_ == b"application" and media_type.subtype == b"x-www-form-urlencoded":
+            normalizer = UrlencodedBodyNormalizer()
+            progress.malformed_reason = "Malformed urlencoded body."
+        elif media_type.type_ == b"application" and (media_type.subtype == b"json" or media_type.subtype.endswith(b"+json")):
+            normalizer = JsonBodyNormalizer(config.json_max_depth, config.json_max_string_length, config.json_max_tokens)
+            progress.malformed_reason = "Malformed JSON body."
+        if normalizer is not None:
+            headers.popall("Content-Length", None)
+            body = normalize_stream(
+                normalizer,
+                request.content,
+                progress,
+                limits,
+                request.app[_OFFLOADER],
+                config.offload_threshold,
+            )
 
     try:
-        url: URL = request.url.with_host(_HOST).with_port(_PORT)
+        url: URL = request.url.with_host(config.upstream_host).with_port(config.upstream_port)
     except ValueError:
         return aiohttp.web.Response(status=400, reason="Invalid URL.")
 
-    async with aiohttp.ClientSession() as session:
-        async with session.request(
+    cache: BodyCache | None = request.app.get(_BODY_CACHE)
+    if cache is not None and (request.content_length is None or request.content_length > config.cache_max_entry_size):
+        cache = None
+    # Small form-data bodies are read whole, so they can be forwarded as they came if they're canonical already.
+    check_canonical: bool = (
+        isinstance(normalizer, MultipartBodyNormalizer)
+        and normalizer.subtype == b"form-data"
+        and request.content_length is not None
+        and request.content_length <= config.canonical_max_size
+    )
+    if normalizer is not None and (cache is not None or check_canonical):
+        try:
+            output: bytes = await normalize_whole(
+                normalizer,
+                headers["Content-Type"].encode("ascii"),
+                request.content,
+                progress,
+                limits,
+                cache,
+                check_canonical,
+                request.app[_OFFLOADER],
+                config.offload_threshold,
+            )
+        except (RequestPayloadError, ValueError, TimeoutError):
+            error_response: aiohttp.web.Response | None = body_error_response(progress)
+            if error_response is None:
+                raise
+            return error_response
+        # Sent as bytes, so upstream gets a Content-Length.
+        return await forward(request, url, headers, output, progress)
+
+    if config.spool and body is not None:
+        spooled: SpooledBody = SpooledBody(request.app[_MEMORY_BUDGET_KEY], config.spool_dir or None)
+        try:
+            try:
+                await spool_body(body, progress, spooled, config.spool_threshold)
+            except (RequestPayloadError, ValueError, TimeoutError):
+                error_response = body_error_response(progress)
+                if error_response is None:
+                    raise
+                return error_response
+            # The whole body is known now, so upstream can be told its length up front.
+            headers["Content-Length"] = str(spooled.size)
+            return await forward(request, url, headers, spooled.chunks(), progress)
+        finally:
+            await spooled.close()
+    return await forward(request, url, headers, body, progress)
+
+
+async def forward(
+    request: aiohttp.web.Request,
+    url: URL,
+    headers: CIMultiDict,
+    body: AsyncIterator[bytes] | bytes | None,
+    progress: RequestProgress,
+) -> aiohttp.web.StreamResponse:
+    """
+    Sends the request upstream, and relays the response back.
+    """
+    start: float = time.monotonic()
+    try:
+        async with request.app[_UPSTREAM_SESSION].request(
             method=request.method,
             url=url,
             headers=headers,
             data=body,
         ) as response:
-            return aiohttp.web.Response(
-                body=(await response.read()),
+            progress.add_time("upstream", time.monotonic() - start)
+            start = time.monotonic()
+            relayed_headers: CIMultiDict = CIMultiDict(response.headers)
+            for header in _UNRELAYED_RESPONSE_HEADERS:
+                relayed_headers.popall(header, None)
+            result: aiohttp.web.StreamResponse = aiohttp.web.StreamResponse(
                 status=response.status,
-                headers=response.headers,
+                reason=response.reason,
+                headers=relayed_headers,
             )
+            progress.relayed = True
+            await result.prepare(request)
+            async for chunk in response.content.iter_chunked(_RESPONSE_CHUNK_SIZE):
+                await result.write(chunk)
+            await result.write_eof()
+            progress.add_time("relay", time.monotonic() - start)
+            return result
+    except (aiohttp.ClientError, RequestPayloadError, ValueError, TimeoutError):
+        # A bad body aborts the upstream request partway through; report it the same way as before streaming.
+        error_response: aiohttp.web.Response | None = body_error_response(progress)
+        if error_response is None:
+            raise
+        return error_response
     return aiohttp.web.Response(status=500, reason="This should never happen!")
         
 
-app = aiohttp.web.Application()
-app.add_routes([aiohttp.web.route("*", "/{unused_required_name:.*}", respond)])
+async def serve_metrics(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    if request.method != "GET":
+        return aiohttp.web.Response(status=405, reason="Method Not Allowed", headers={"Allow": "GET"})
+    metrics: ProxyMetrics = request.app[_METRICS]
+    info: functools._CacheInfo = media_type_cache_info()
+    metrics.media_type_cache_lookups.set(info.hits, "hit")
+    metrics.media_type_cache_lookups.set(info.misses, "miss")
+    metrics.media_type_cache_entries.set(info.currsize)
+    return aiohttp.web.Response(body=metrics.render(), headers={"Content-Type": metrics.content_type})
+
+
+def make_app(config: ServerConfig) -> aiohttp.web.Application:
+    app: aiohttp.web.Application = aiohttp.web.Application()
+    app[_CONFIG] = config
+    app[_LIMITS] = config.limits()
+    set_media_type_cache_size(config.media_type_cache_size)
+    # Each worker only knows its own spooled bodies, so it gets its share of the budget.
+    app[_MEMORY_BUDGET_KEY] = MemoryBudget(config.memory_budget // config.workers)
+    app[_METRICS] = ProxyMetrics()
+    app.cleanup_ctx.append(upstream_session)
+    app.cleanup_ctx.append(offload_pool)
+    app.cleanup_ctx.append(body_cache)
+    app.cleanup_ctx.append(stack_sampler)
+    if config.metrics_path != "":
+        # Registered first, and for every method, so that the catch-all proxy route never gets it.
+        app.add_routes([aiohttp.web.route("*", config.metrics_path, serve_metrics)])
+    app.add_routes([aiohttp.web.route("*", "/{unused_required_name:.*}", respond)])
+    return app
+
+
+def run_worker(config: ServerConfig, sock: socket.socket | None) -> None:
+    """
+    Serves requests in this process until SIGTERM or SIGINT, then finishes the in-flight ones.
+    """
+    app: aiohttp.web.Application = make_app(config)
+    if sock is not None:
+        aiohttp.web.run_app(app, sock=sock, shutdown_timeout=config.shutdown_timeout, handler_cancellation=True)
+    else:
+        aiohttp.web.run_app(
+            app,
+            host=config.listen_host,
+            port=config.listen_port,
+            reuse_port=config.reuse_port,
+            shutdown_timeout=config.shutdown_timeout,
+            # Lets a client that goes away cancel its offloaded work.
+            handler_cancellation=True,
+        )
+
+
+def worker_command(config: ServerConfig, sock: socket.socket | None) -> list[str]:
+    command: list[str] = [sys.executable, os.path.abspath(__file__)]
+    for f in dataclasses.fields(config):
+        value: object = getattr(config, f.name)
+        if f.name == "workers":
+            value = 1
+        elif f.name == "reuse_port":
+            value = sock is None
+        option: str = "--" + f.name.replace("_", "-")
+        if isinstance(value, bool):
+            command.append(option if value else "--no-" + option[len("--") :])
+        else:
+            command += [option, str(value)]
+    if sock is not None:
+        command += ["--worker-fd", str(sock.fileno())]
+    return command
+
+
+def parse_args(argv: list[str]) -> tuple[ServerConfig, int | None]:
+    """
+    Builds the server configuration from the command line, falling back to environment variables, then to the defaults.
+    Also returns the inherited listening socket's file descriptor, if this is a worker process.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="HTTP request normalizing reverse proxy.")
+    for f in dataclasses.fields(ServerConfig):
+        env_name: str = "NORMALIZER_" + f.name.upper()
+        default: object = f.default
+        if env_name in os.environ:
+            default = os.environ[env_name] not in ("", "0") if f.type is bool else f.type(os.environ[env_name])
+        help_text: str = f"{f.metadata['help']} ({env_name}, default: {f.default})"
+        option: str = "--" + f.name.replace("_", "-")
+        if f.type is bool:
+            parser.add_argument(option, action=argparse.BooleanOptionalAction, default=default, help=help_text)
+        else:
+            parser.add_argument(option, type=f.type, default=default, choices=f.metadata.get("choices"), help=help_text)
+    parser.add_argument("--worker-fd", type=int, help=argparse.SUPPRESS)
+    args: argparse.Namespace = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    config: ServerConfig = ServerConfig(**{f.name: getattr(args, f.name) for f in dataclasses.fields(ServerConfig)})
+    return config, args.worker_fd
+
+
+def main() -> None:
+    config, worker_fd = parse_args(sys.argv[1:])
+
+    if worker_fd is not None:
+        # Only the supervisor reloads; a hangup on the terminal shouldn't take the workers down with it.
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        run_worker(config, socket.socket(fileno=worker_fd))
+        return
+
+    # The cache starts out empty, so that results from an older configuration are never served. Results from older code
+    # can't be either, even after a reload, since the code's version is part of every key.
+    temporary_cache: bool = config.cache_size > 0 and config.cache_path == ""
+    if config.cache_size > 0:
+        config = dataclasses.replace(config, cache_path=create_cache_file(config.cache_path))
+    try:
+        if config.workers == 1:
+            run_worker(config, None)
+        else:
+            # Normalization is CPU-bound Python, so one process per core is what lets throughput scale.
+            sock: socket.socket | None = None if config.reuse_port else bind_listen_socket(config.listen_host, config.listen_port)
+            print(f"======== Running {config.workers} workers on http://{config.listen_host}:{config.listen_port} ========", file=sys.stderr)
+            Supervisor(worker_command(config, sock), config.workers, config.shutdown_timeout, sock).run()
+    finally:
+        if temporary_cache:
+            remove_cache_file(config.cache_path)
+
 
-aiohttp.web.run_app(app, port=8999)
+if __name__ == "__main__":
+    main()
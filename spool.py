@@ -0,0 +1,98 @@
+"""
+Buffers whole request bodies before they are forwarded, so that a slow upstream doesn't hold client connections open.
+Bodies are kept in memory while a shared budget allows it, and written to a temporary file past that.
+The file is only ever touched from the event loop's executor, so a slow disk stalls the body's own request, not the loop.
+"""
+
+import asyncio
+import os
+import tempfile
+from typing import IO, AsyncIterator, Final
+
+# Size of the pieces spooled files are read back in
+_READ_CHUNK_SIZE: Final[int] = 2**16
+
+
+class MemoryBudget:
+    """
+    Bytes of spooled bodies that may be held in memory at once, shared by every request in the process.
+    Each worker process has its own, so the server splits its whole budget evenly between them.
+    Only meant to be used from the event loop thread.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.used: int = 0
+
+    def reserve(self, size: int) -> bool:
+        if self.used + size > self.limit:
+            return False
+        self.used += size
+        return True
+
+    def release(self, size: int) -> None:
+        self.used -= size
+
+
+class SpooledBody:
+    """
+    An append-only body: a head held in memory, followed by a tail in an anonymous temporary file.
+    Once anything has gone to the file, everything after it does too, so the order of the body is kept.
+    """
+
+    def __init__(self, budget: MemoryBudget, directory: str | None = None) -> None:
+        self.budget: MemoryBudget = budget
+        self.directory: str | None = directory
+        self.size: int = 0
+        self._head: list[bytes] = []
+        self._reserved: int = 0
+        self._file: IO[bytes] | None = None
+        self._file_size: int = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    async def write(self, data: bytes, spill: bool = False) -> None:
+        """
+        Appends data to the body.
+        It goes to disk if spill is set, if the memory budget is used up, or if earlier data already went to disk.
+        """
+        if len(data) == 0:
+            return
+        self.size += len(data)
+        if self._file is None and not spill and self.budget.reserve(len(data)):
+            self._reserved += len(data)
+            self._head.append(data)
+            return
+        self._file_size += len(data)
+        await asyncio.get_running_loop().run_in_executor(None, self._write_file, data)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Yields the body back in order.
+        The file part is read with pread rather than through a mapping: copying out of a mapping holds the GIL while
+        the pages fault in, which would stall the event loop as surely as reading on it.
+        """
+        for chunk in self._head:
+            yield chunk
+        if self._file is None:
+            return
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._file.flush)
+        fd: int = self._file.fileno()
+        for start in range(0, self._file_size, _READ_CHUNK_SIZE):
+            yield await loop.run_in_executor(None, os.pread, fd, _READ_CHUNK_SIZE, start)
+
+    async def close(self) -> None:
+        self.budget.release(self._reserved)
+        self._reserved = 0
+        self._head = []
+        if self._file is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._file.close)
+            self._file = None
+
+    def _write_file(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+        self._file.write(data)